@@ -0,0 +1,245 @@
+"""Benchmarks of the zarrs and default zarr-python codec pipelines.
+
+Each case is benchmarked with both pipelines in the same benchmark group, so they
+can be compared with ``--benchmark-group-by=group``.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+from functools import partial
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pytest
+import zarr
+from zarr.codecs import (
+    BloscCodec,
+    BytesCodec,
+    GzipCodec,
+    ShardingCodec,
+    TransposeCodec,
+    ZstdCodec,
+)
+from zarr.storage import FsspecStore, LocalStore
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Generator
+
+    from pytest_benchmark.fixture import BenchmarkFixture
+    from zarr.abc.codec import Codec
+
+PIPELINES = {
+    "zarrs": "zarrs.ZarrsCodecPipeline",
+    "zarr": "zarr.core.codec_pipeline.BatchedCodecPipeline",
+}
+
+SHAPE = (1024, 1024)
+
+# Factories of the codecs of an array given its chunk shape, with the shard shape as
+# the array chunk shape for sharding
+CODECS: dict[str, Callable[[tuple[int, ...]], list[Codec]]] = {
+    "blosc": lambda chunks: [BytesCodec(), BloscCodec()],
+    "zstd": lambda chunks: [BytesCodec(), ZstdCodec()],
+    "gzip": lambda chunks: [BytesCodec(), GzipCodec()],
+    "transpose": lambda chunks: [TransposeCodec(order=(1, 0)), BytesCodec()],
+    "sharding": lambda chunks: [
+        ShardingCodec(chunk_shape=chunks, codecs=[BytesCodec(), BloscCodec()])
+    ],
+}
+CHUNK_SIZES = [32, 256]
+DTYPES = ["uint8", "float64"]
+SHARDS_PER_DIM = 4
+
+
+class _RangeRequestHandler(SimpleHTTPRequestHandler):
+    """Serve files with support for single byte range requests."""
+
+    def send_head(self):
+        range_header = self.headers.get("Range")
+        match = range_header and re.fullmatch(r"bytes=(\d*)-(\d*)", range_header)
+        if not match:
+            return super().send_head()
+        path = Path(self.translate_path(self.path))
+        try:
+            f = path.open("rb")  # noqa: SIM115
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return None
+        size = f.seek(0, 2)
+        start, end = match.groups()
+        if start:
+            start, end = int(start), min(int(end) if end else size - 1, size - 1)
+        else:
+            start, end = max(size - int(end), 0), size - 1
+        f.seek(start)
+        self.send_response(HTTPStatus.PARTIAL_CONTENT)
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        self._range_length = end - start + 1
+        return f
+
+    def copyfile(self, source, outputfile):
+        range_length = getattr(self, "_range_length", None)
+        if range_length is None:
+            return super().copyfile(source, outputfile)
+        outputfile.write(source.read(range_length))
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope="session")
+def data_dir(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    return tmp_path_factory.mktemp("benchmarks")
+
+
+@pytest.fixture(scope="session")
+def http_url(data_dir: Path) -> Generator[str, None, None]:
+    handler = partial(_RangeRequestHandler, directory=str(data_dir))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    thread.join()
+
+
+def array_name(codec: str, chunk_size: int, dtype: str) -> str:
+    return f"{codec}-{chunk_size}-{dtype}.zarr"
+
+
+def create_array(path: Path, codec: str, chunk_size: int, dtype: str) -> zarr.Array:
+    """Create an array in ``path`` with the default zarr-python codec pipeline."""
+    chunks = (chunk_size,) * len(SHAPE)
+    if codec == "sharding":
+        # the array chunks are shards of inner chunks
+        array_chunks = tuple(
+            min(chunk * SHARDS_PER_DIM, size) for chunk, size in zip(chunks, SHAPE)
+        )
+    else:
+        array_chunks = chunks
+    with zarr.config.set({"codec_pipeline.path": PIPELINES["zarr"]}):
+        return zarr.create(
+            SHAPE,
+            store=LocalStore(root=path),
+            chunks=array_chunks,
+            dtype=dtype,
+            codecs=CODECS[codec](chunks),
+            fill_value=0,
+        )
+
+
+@pytest.fixture(scope="session")
+def populate_array(data_dir: Path) -> Callable[[str, int, str], Path]:
+    """Returns a function writing an array to the data directory once per session."""
+    populated: set[str] = set()
+
+    def populate(codec: str, chunk_size: int, dtype: str) -> Path:
+        name = array_name(codec, chunk_size, dtype)
+        path = data_dir / name
+        if name not in populated:
+            arr = create_array(path, codec, chunk_size, dtype)
+            rng = np.random.default_rng(0)
+            # compressible data, with a random component so chunks are not uniform
+            data = np.arange(np.prod(SHAPE)).reshape(SHAPE) % 251
+            data = data + rng.integers(0, 4, SHAPE)
+            with zarr.config.set({"codec_pipeline.path": PIPELINES["zarr"]}):
+                arr[:] = data.astype(dtype)
+            populated.add(name)
+        return path
+
+    return populate
+
+
+def open_array(store: str, path: Path, http_url: str, pipeline: str) -> zarr.Array:
+    """Open an array with a codec pipeline, which is chosen when the array is opened."""
+    with zarr.config.set({"codec_pipeline.path": PIPELINES[pipeline]}):
+        if store == "local":
+            return zarr.open_array(LocalStore(root=path, read_only=True))
+        if store == "http":
+            return zarr.open_array(
+                FsspecStore.from_url(f"{http_url}/{path.name}", read_only=True)
+            )
+    raise AssertionError
+
+
+SELECTIONS: dict[str, Callable[[zarr.Array], np.ndarray]] = {
+    "full": lambda arr: arr[:],
+    "partial": lambda arr: arr[100:300, 50:700],
+    # an orthogonal selection of every 7th row
+    "fancy": lambda arr: arr.oindex[np.arange(0, SHAPE[0], 7), :],
+}
+
+
+@pytest.fixture(params=list(PIPELINES))
+def pipeline(request: pytest.FixtureRequest) -> str:
+    return request.param
+
+
+@pytest.fixture(params=list(CODECS))
+def codec(request: pytest.FixtureRequest) -> str:
+    return request.param
+
+
+@pytest.fixture(params=CHUNK_SIZES)
+def chunk_size(request: pytest.FixtureRequest) -> int:
+    return request.param
+
+
+@pytest.fixture(params=DTYPES)
+def dtype(request: pytest.FixtureRequest) -> str:
+    return request.param
+
+
+def case_group(*parts: object) -> str:
+    return "-".join(map(str, parts))
+
+
+@pytest.mark.parametrize("store", ["local", "http"])
+@pytest.mark.parametrize("selection", list(SELECTIONS))
+def test_read(  # noqa: PLR0917
+    benchmark: BenchmarkFixture,
+    populate_array: Callable[[str, int, str], Path],
+    http_url: str,
+    pipeline: str,
+    codec: str,
+    chunk_size: int,
+    dtype: str,
+    selection: str,
+    store: str,
+) -> None:
+    path = populate_array(codec, chunk_size, dtype)
+    arr = open_array(store, path, http_url, pipeline)
+    benchmark.group = case_group("read", store, codec, chunk_size, dtype, selection)
+    benchmark.extra_info["pipeline"] = pipeline
+    result = benchmark(SELECTIONS[selection], arr)
+    expected = SELECTIONS[selection](open_array(store, path, http_url, "zarr"))
+    np.testing.assert_array_equal(result, expected)
+
+
+def test_write(  # noqa: PLR0917
+    benchmark: BenchmarkFixture,
+    tmp_path: Path,
+    pipeline: str,
+    codec: str,
+    chunk_size: int,
+    dtype: str,
+) -> None:
+    path = tmp_path / array_name(codec, chunk_size, dtype)
+    create_array(path, codec, chunk_size, dtype)
+    arr = open_array("local", path, "", pipeline)
+    data = (np.arange(np.prod(SHAPE)).reshape(SHAPE) % 251).astype(dtype)
+    benchmark.group = case_group("write", "local", codec, chunk_size, dtype)
+    benchmark.extra_info["pipeline"] = pipeline
+
+    def write() -> None:
+        arr[:] = data
+
+    benchmark(write)
+    np.testing.assert_array_equal(arr[:], data)
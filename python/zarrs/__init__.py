@@ -1,6 +1,7 @@
 from zarr.registry import register_pipeline
 
 from ._internal import __version__
+from .pipeline import PythonFallbackError
 from .pipeline import ZarrsCodecPipeline as _ZarrsCodecPipeline
 from .utils import CollapsedDimensionError, DiscontiguousArrayError
 
@@ -16,5 +17,6 @@ __all__ = [
     "ZarrsCodecPipeline",
     "DiscontiguousArrayError",
     "CollapsedDimensionError",
+    "PythonFallbackError",
     "__version__",
 ]
@@ -11,6 +11,11 @@ class Basic:
     def __new__(cls, byte_interface: typing.Any, chunk_spec: typing.Any): ...
     ...
 
+class CancellationToken:
+    def __new__(cls): ...
+    def cancel(self) -> None: ...
+    def cancelled(self) -> builtins.bool: ...
+
 class CodecPipelineImpl:
     def __new__(
         cls,
@@ -21,16 +26,103 @@ class CodecPipelineImpl:
         chunk_concurrent_minimum: builtins.int | None = None,
         chunk_concurrent_maximum: builtins.int | None = None,
         num_threads: builtins.int | None = None,
+        thread_pool_group: builtins.str | None = None,
+        private_thread_pool: builtins.bool | None = None,
+        io_concurrency: builtins.int | None = None,
+        decoded_chunk_cache_size: builtins.int | None = None,
+        partial_decoder_cache_size: builtins.int | None = None,
+        partial_encoding: builtins.bool | None = None,
+        autotune_concurrency: builtins.bool | None = None,
+        collect_stats: builtins.bool | None = None,
     ): ...
     def retrieve_chunks_and_apply_index(
         self,
         chunk_descriptions: typing.Sequence[WithSubset],
         value: numpy.typing.NDArray[typing.Any],
+        *,
+        cancellation_token: CancellationToken | None = None,
+        timeout: builtins.float | None = None,
+    ) -> None: ...
+    def retrieve_chunks_and_apply_index_async(
+        self,
+        chunk_descriptions: typing.Sequence[WithSubset],
+        value: numpy.typing.NDArray[typing.Any],
+        callback: typing.Any,
+        *,
+        cancellation_token: CancellationToken | None = None,
+        timeout: builtins.float | None = None,
+    ) -> None: ...
+    def decoded_chunk_cache_info(self) -> builtins.dict[builtins.str, builtins.int]: ...
+    def partial_decoder_cache_info(
+        self,
+    ) -> builtins.dict[builtins.str, builtins.int]: ...
+    def stats(self) -> builtins.dict[builtins.str, builtins.int] | None: ...
+    def reset_stats(self) -> None: ...
+    def shares_thread_pool(self, other: CodecPipelineImpl) -> builtins.bool: ...
+    def autotune_concurrency_info(
+        self,
+    ) -> builtins.dict[builtins.str, builtins.int] | None: ...
+    def compute_encoded_size(
+        self, byte_length: builtins.int, chunk_spec: typing.Any
+    ) -> builtins.int: ...
+    def decode(
+        self,
+        chunks: typing.Sequence[
+            tuple[
+                numpy.typing.NDArray[typing.Any],
+                typing.Any,
+                numpy.typing.NDArray[typing.Any],
+            ]
+        ],
+        *,
+        cancellation_token: CancellationToken | None = None,
+        timeout: builtins.float | None = None,
+    ) -> None: ...
+    def decode_async(
+        self,
+        chunks: typing.Sequence[
+            tuple[
+                numpy.typing.NDArray[typing.Any],
+                typing.Any,
+                numpy.typing.NDArray[typing.Any],
+            ]
+        ],
+        callback: typing.Any,
+        *,
+        cancellation_token: CancellationToken | None = None,
+        timeout: builtins.float | None = None,
+    ) -> None: ...
+    def encode(
+        self,
+        chunks: typing.Sequence[tuple[numpy.typing.NDArray[typing.Any], typing.Any]],
+        *,
+        cancellation_token: CancellationToken | None = None,
+        timeout: builtins.float | None = None,
+    ) -> builtins.list[builtins.bytes]: ...
+    def encode_async(
+        self,
+        chunks: typing.Sequence[tuple[numpy.typing.NDArray[typing.Any], typing.Any]],
+        callback: typing.Any,
+        *,
+        cancellation_token: CancellationToken | None = None,
+        timeout: builtins.float | None = None,
     ) -> None: ...
     def store_chunks_with_indices(
         self,
         chunk_descriptions: typing.Sequence[WithSubset],
         value: numpy.typing.NDArray[typing.Any],
+        *,
+        cancellation_token: CancellationToken | None = None,
+        timeout: builtins.float | None = None,
+    ) -> None: ...
+    def store_chunks_with_indices_async(
+        self,
+        chunk_descriptions: typing.Sequence[WithSubset],
+        value: numpy.typing.NDArray[typing.Any],
+        callback: typing.Any,
+        *,
+        cancellation_token: CancellationToken | None = None,
+        timeout: builtins.float | None = None,
     ) -> None: ...
 
 class FilesystemStoreConfig:
@@ -39,16 +131,44 @@ class FilesystemStoreConfig:
 class HttpStoreConfig:
     endpoint: builtins.str
 
+class MemoryStoreConfig:
+    ...
+
+class S3StoreConfig:
+    bucket: builtins.str
+    root: builtins.str
+    endpoint: builtins.str | None
+    region: builtins.str | None
+    anonymous: builtins.bool
+
 class WithSubset:
     def __new__(
         cls,
         item: Basic,
-        chunk_subset: typing.Sequence[slice],
-        subset: typing.Sequence[slice],
+        chunk_subset: typing.Sequence[slice | typing.Sequence[builtins.int]],
+        subset: typing.Sequence[slice | typing.Sequence[builtins.int]],
         shape: typing.Sequence[builtins.int],
     ): ...
-    ...
+    @staticmethod
+    def batch(
+        store: typing.Any,
+        chunk_spec: typing.Any,
+        paths: typing.Sequence[builtins.str],
+        chunk_subsets: typing.Sequence[
+            typing.Sequence[slice | typing.Sequence[builtins.int]]
+        ],
+        subsets: typing.Sequence[
+            typing.Sequence[slice | typing.Sequence[builtins.int]]
+        ],
+        shape: typing.Sequence[builtins.int],
+    ) -> builtins.list[WithSubset]: ...
+
+class ZipStoreConfig:
+    path: builtins.str
 
 class StoreConfig(Enum):
     Filesystem = auto()
     Http = auto()
+    Memory = auto()
+    S3 = auto()
+    Zip = auto()
@@ -1,10 +1,12 @@
 from __future__ import annotations
 
 import asyncio
+import contextlib
 import json
 import re
-from dataclasses import dataclass
-from typing import TYPE_CHECKING, TypedDict
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, ClassVar, TypedDict
 
 import numpy as np
 from zarr.abc.codec import Codec, CodecPipeline
@@ -12,7 +14,7 @@ from zarr.core import BatchedCodecPipeline
 from zarr.core.config import config
 
 if TYPE_CHECKING:
-    from collections.abc import Generator, Iterable, Iterator
+    from collections.abc import Awaitable, Callable, Generator, Iterable, Iterator
     from typing import Any, Self
 
     from zarr.abc.store import ByteGetter, ByteSetter
@@ -22,7 +24,9 @@ if TYPE_CHECKING:
     from zarr.core.common import ChunkCoords
     from zarr.core.indexing import SelectorTuple
 
-from ._internal import CodecPipelineImpl, codec_metadata_v2_to_v3
+    from ._internal import WithSubset
+
+from ._internal import CancellationToken, CodecPipelineImpl, codec_metadata_v2_to_v3
 from .utils import (
     CollapsedDimensionError,
     DiscontiguousArrayError,
@@ -39,6 +43,24 @@ class UnsupportedMetadataError(Exception):
     pass
 
 
+class PythonFallbackError(Exception):
+    """Raised in strict mode rather than falling back to the Python codec pipeline."""
+
+
+FALLBACK_REASONS: dict[type[Exception], str] = {
+    UnsupportedMetadataError: "unsupported_metadata",
+    UnsupportedDataTypeError: "unsupported_data_type",
+    FillValueNoneError: "fill_value_none",
+    DiscontiguousArrayError: "discontiguous_array",
+    CollapsedDimensionError: "collapsed_dimension",
+}
+
+
+# https://github.com/LDeakin/zarrs/blob/0532fe983b7b42b59dbf84e50a2fe5e6f7bad4ce/zarrs_metadata/src/v2_to_v3.rs#L289-L293 for VSUMm
+# Further, our pipeline does not support variable-length objects due to limitations on decode_into, so object/np.dtypes.StringDType is also out
+UNSUPPORTED_DTYPE_KINDS = frozenset({"V", "S", "U", "M", "m", "O", "T"})
+
+
 def get_codec_pipeline_impl(codec_metadata_json: str) -> CodecPipelineImpl | None:
     try:
         return CodecPipelineImpl(
@@ -52,6 +74,20 @@ def get_codec_pipeline_impl(codec_metadata_json: str) -> CodecPipelineImpl | Non
                 "codec_pipeline.chunk_concurrent_maximum", None
             ),
             num_threads=config.get("threading.max_workers", None),
+            thread_pool_group=config.get("codec_pipeline.thread_pool_group", None),
+            private_thread_pool=config.get("codec_pipeline.private_thread_pool", None),
+            io_concurrency=config.get("codec_pipeline.io_concurrency", None),
+            decoded_chunk_cache_size=config.get(
+                "codec_pipeline.decoded_chunk_cache_size", None
+            ),
+            partial_decoder_cache_size=config.get(
+                "codec_pipeline.partial_decoder_cache_size", None
+            ),
+            partial_encoding=config.get("codec_pipeline.partial_encoding", None),
+            autotune_concurrency=config.get(
+                "codec_pipeline.autotune_concurrency", None
+            ),
+            collect_stats=config.get("codec_pipeline.collect_stats", None),
         )
     except TypeError as e:
         if re.match(r"codec (delta|zlib) is not supported", str(e)):
@@ -60,6 +96,85 @@ def get_codec_pipeline_impl(codec_metadata_json: str) -> CodecPipelineImpl | Non
             raise e
 
 
+async def run_in_thread_pool(method: Callable[..., None], *args: Any) -> Any:
+    """Await an asynchronous ``CodecPipelineImpl`` method called with ``args``.
+
+    The method runs in the thread pool of the pipeline and resolves a future of the
+    running event loop with its result through its callback, so no executor thread is
+    occupied.
+    Cancelling the awaiting task cancels the method before its next chunk, and the
+    method raises a ``TimeoutError`` after ``codec_pipeline.timeout`` seconds.
+    The ``CancelledError`` is only raised once the method has stopped, as it may use
+    the buffers of ``args`` until then.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    cancellation_token = CancellationToken()
+
+    def resolve(error: BaseException | None, result: Any) -> None:
+        loop.call_soon_threadsafe(_set_future_result, future, error, result)
+
+    method(
+        *args,
+        resolve,
+        cancellation_token=cancellation_token,
+        timeout=config.get("codec_pipeline.timeout", None),
+    )
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        cancellation_token.cancel()
+        while not future.done():
+            with contextlib.suppress(asyncio.CancelledError):
+                await asyncio.wait([future])
+        if not future.cancelled():
+            # the result or error of the cancelled method is discarded
+            future.exception()
+        raise
+
+
+async def gather_all(*aws: Awaitable[Any]) -> None:
+    """Await ``aws`` concurrently, cancelling the others once one of them raises.
+
+    Unlike ``asyncio.gather``, this only returns or raises once all of ``aws`` have
+    completed, so the buffers passed to Rust are no longer in use. Unlike a
+    ``TaskGroup``, the first exception is raised as is.
+    """
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        for task in tasks:
+            task.cancel()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+    errors = [result for result in results if isinstance(result, BaseException)]
+    for error in errors:
+        if not isinstance(error, asyncio.CancelledError):
+            raise error
+    if errors:
+        raise errors[0]
+
+
+def _set_future_result(
+    future: asyncio.Future[Any], error: BaseException | None, result: Any
+):
+    if future.cancelled():
+        return
+    if error is None:
+        future.set_result(result)
+    else:
+        future.set_exception(error)
+
+
+def as_native_contiguous(array: NDArrayLike) -> NDArrayLike | np.ndarray:
+    """Returns ``array`` in native byte order and C order, copying it if needed."""
+    if not array.dtype.isnative:
+        return np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("="))
+    if not array.flags.c_contiguous:
+        return np.ascontiguousarray(array)
+    return array
+
+
 def codecs_to_dict(codecs: Iterable[Codec]) -> Generator[dict[str, Any], None, None]:
     for codec in codecs:
         if codec.__class__.__name__ == "V2Codec":
@@ -83,6 +198,34 @@ def codecs_to_dict(codecs: Iterable[Codec]) -> Generator[dict[str, Any], None, N
             yield codec.to_dict()
 
 
+@dataclass
+class PartitionStats:
+    """Counts of the chunks read and written by the Rust and Python codec pipelines."""
+
+    max_fallback_samples: ClassVar[int] = 8
+
+    rust_chunks: int = 0
+    python_chunks: int = 0
+    # batches with chunks handled by both pipelines
+    split_batches: int = 0
+    # chunks handled by the Python pipeline by reason, see FALLBACK_REASONS
+    fallback_reasons: Counter[str] = field(default_factory=Counter)
+    # the first chunk selections handled by the Python pipeline for each reason
+    fallback_samples: dict[str, list[str]] = field(default_factory=dict)
+
+    def record(self, rust_chunks: int, python_chunks: int) -> None:
+        self.rust_chunks += rust_chunks
+        self.python_chunks += python_chunks
+        if rust_chunks and python_chunks:
+            self.split_batches += 1
+
+    def record_fallback(self, reason: str, chunk_selection: SelectorTuple) -> None:
+        self.fallback_reasons[reason] += 1
+        samples = self.fallback_samples.setdefault(reason, [])
+        if len(samples) < self.max_fallback_samples:
+            samples.append(repr(chunk_selection))
+
+
 class ZarrsCodecPipelineState(TypedDict):
     codec_metadata_json: str
     codecs: tuple[Codec, ...]
@@ -94,6 +237,9 @@ class ZarrsCodecPipeline(CodecPipeline):
     impl: CodecPipelineImpl | None
     codec_metadata_json: str
     python_impl: BatchedCodecPipeline
+    partition_stats: PartitionStats = field(
+        default_factory=PartitionStats, compare=False, repr=False
+    )
 
     def __getstate__(self) -> ZarrsCodecPipelineState:
         return {"codec_metadata_json": self.codec_metadata_json, "codecs": self.codecs}
@@ -103,6 +249,7 @@ class ZarrsCodecPipeline(CodecPipeline):
         self.codec_metadata_json = state["codec_metadata_json"]
         self.impl = get_codec_pipeline_impl(self.codec_metadata_json)
         self.python_impl = BatchedCodecPipeline.from_codecs(self.codecs)
+        self.partition_stats = PartitionStats()
 
     def evolve_from_array_spec(self, array_spec: ArraySpec) -> Self:
         raise NotImplementedError("evolve_from_array_spec")
@@ -139,19 +286,58 @@ class ZarrsCodecPipeline(CodecPipeline):
         raise NotImplementedError("validate")
 
     def compute_encoded_size(self, byte_length: int, array_spec: ArraySpec) -> int:
-        raise NotImplementedError("compute_encoded_size")
+        if not self._supports_array_specs([array_spec]):
+            return self.python_impl.compute_encoded_size(byte_length, array_spec)
+        return self.impl.compute_encoded_size(byte_length, array_spec)
 
     async def decode(
         self,
         chunk_bytes_and_specs: Iterable[tuple[Buffer | None, ArraySpec]],
     ) -> Iterable[NDBuffer | None]:
-        raise NotImplementedError("decode")
+        chunk_bytes_and_specs = list(chunk_bytes_and_specs)
+        if not self._supports_array_specs(spec for _, spec in chunk_bytes_and_specs):
+            return await self.python_impl.decode(chunk_bytes_and_specs)
+
+        chunks = []
+        chunk_arrays: list[NDBuffer | None] = []
+        for chunk_bytes, chunk_spec in chunk_bytes_and_specs:
+            if chunk_bytes is None:
+                chunk_arrays.append(None)
+                continue
+            chunk_array = chunk_spec.prototype.nd_buffer.create(
+                shape=chunk_spec.shape, dtype=chunk_spec.dtype, order="C"
+            )
+            chunks.append(
+                (
+                    np.ascontiguousarray(chunk_bytes.as_numpy_array()),
+                    chunk_spec,
+                    chunk_array.as_ndarray_like(),
+                )
+            )
+            chunk_arrays.append(chunk_array)
+        await run_in_thread_pool(self.impl.decode_async, chunks)
+        return chunk_arrays
 
     async def encode(
         self,
         chunk_arrays_and_specs: Iterable[tuple[NDBuffer | None, ArraySpec]],
     ) -> Iterable[Buffer | None]:
-        raise NotImplementedError("encode")
+        chunk_arrays_and_specs = list(chunk_arrays_and_specs)
+        if not self._supports_array_specs(spec for _, spec in chunk_arrays_and_specs):
+            return await self.python_impl.encode(chunk_arrays_and_specs)
+
+        chunks = [
+            (as_native_contiguous(chunk_array.as_ndarray_like()), chunk_spec)
+            for chunk_array, chunk_spec in chunk_arrays_and_specs
+            if chunk_array is not None
+        ]
+        encoded = iter(await run_in_thread_pool(self.impl.encode_async, chunks))
+        return [
+            None
+            if chunk_array is None
+            else chunk_spec.prototype.buffer.from_bytes(next(encoded))
+            for chunk_array, chunk_spec in chunk_arrays_and_specs
+        ]
 
     async def read(
         self,
@@ -164,30 +350,25 @@ class ZarrsCodecPipeline(CodecPipeline):
         # FIXME: Error if array is not in host memory
         if not out.dtype.isnative:
             raise RuntimeError("Non-native byte order not supported")
-        try:
-            if self.impl is None:
-                raise UnsupportedMetadataError()
-            self._raise_error_on_unsupported_batch_dtype(batch_info)
-            chunks_desc = make_chunk_info_for_rust_with_indices(
-                batch_info, drop_axes, out.shape
-            )
-        except (
-            UnsupportedMetadataError,
-            DiscontiguousArrayError,
-            CollapsedDimensionError,
-            UnsupportedDataTypeError,
-            FillValueNoneError,
-        ):
-            await self.python_impl.read(batch_info, out, drop_axes)
-            return None
-        else:
-            out: NDArrayLike = out.as_ndarray_like()
-            await asyncio.to_thread(
-                self.impl.retrieve_chunks_and_apply_index,
-                chunks_desc,
-                out,
+        chunks_desc, python_batch_info = self._partition_batch(
+            batch_info, drop_axes, out.shape, allow_index_arrays=True
+        )
+
+        # The chunks of a batch are disjoint, so both pipelines can write to out at once
+        reads = []
+        if chunks_desc:
+            out_np: NDArrayLike = out.as_ndarray_like()
+            reads.append(
+                run_in_thread_pool(
+                    self.impl.retrieve_chunks_and_apply_index_async,
+                    chunks_desc,
+                    out_np,
+                )
             )
-            return None
+        if python_batch_info:
+            reads.append(self.python_impl.read(python_batch_info, out, drop_axes))
+        await gather_all(*reads)
+        return None
 
     async def write(
         self,
@@ -197,35 +378,81 @@ class ZarrsCodecPipeline(CodecPipeline):
         value: NDBuffer,  # type: ignore
         drop_axes: tuple[int, ...] = (),
     ) -> None:
+        chunks_desc, python_batch_info = self._partition_batch(
+            batch_info, drop_axes, value.shape
+        )
+
+        # The chunks of a batch are disjoint, so both pipelines can write at once
+        writes = []
+        if chunks_desc:
+            # FIXME: Error if array is not in host memory
+            value_np = as_native_contiguous(value.as_ndarray_like())
+            writes.append(
+                run_in_thread_pool(
+                    self.impl.store_chunks_with_indices_async, chunks_desc, value_np
+                )
+            )
+        if python_batch_info:
+            writes.append(self.python_impl.write(python_batch_info, value, drop_axes))
+        await gather_all(*writes)
+        return None
+
+    def _partition_batch(
+        self,
+        batch_info: Iterable[
+            tuple[
+                ByteGetter | ByteSetter, ArraySpec, SelectorTuple, SelectorTuple, bool
+            ]
+        ],
+        drop_axes: tuple[int, ...],
+        shape: tuple[int, ...],
+        *,
+        allow_index_arrays: bool = False,
+    ) -> tuple[
+        list[WithSubset],
+        list[
+            tuple[
+                ByteGetter | ByteSetter, ArraySpec, SelectorTuple, SelectorTuple, bool
+            ]
+        ],
+    ]:
+        """Split a batch into chunks for the Rust and Python codec pipelines.
+
+        Chunks are handled by the Python pipeline if the batch or their selection is
+        not supported by Rust. In strict mode (``codec_pipeline.strict``), a
+        ``PythonFallbackError`` is raised instead.
+        """
+        fallbacks = []
         try:
             if self.impl is None:
                 raise UnsupportedMetadataError()
             self._raise_error_on_unsupported_batch_dtype(batch_info)
             chunks_desc = make_chunk_info_for_rust_with_indices(
-                batch_info, drop_axes, value.shape
+                batch_info,
+                drop_axes,
+                shape,
+                allow_index_arrays=allow_index_arrays,
+                fallback=lambda info, e: fallbacks.append((info, e)),
             )
         except (
             UnsupportedMetadataError,
-            DiscontiguousArrayError,
-            CollapsedDimensionError,
             UnsupportedDataTypeError,
             FillValueNoneError,
-        ):
-            await self.python_impl.write(batch_info, value, drop_axes)
-            return None
-        else:
-            # FIXME: Error if array is not in host memory
-            value_np: NDArrayLike | np.ndarray = value.as_ndarray_like()
-            if not value_np.dtype.isnative:
-                value_np = np.ascontiguousarray(
-                    value_np, dtype=value_np.dtype.newbyteorder("=")
-                )
-            elif not value_np.flags.c_contiguous:
-                value_np = np.ascontiguousarray(value_np)
-            await asyncio.to_thread(
-                self.impl.store_chunks_with_indices, chunks_desc, value_np
-            )
-            return None
+        ) as e:
+            chunks_desc, fallbacks = [], [(info, e) for info in batch_info]
+
+        strict = config.get("codec_pipeline.strict", False)
+        for (_, _, chunk_selection, _, _), e in fallbacks:
+            reason = FALLBACK_REASONS[type(e)]
+            if strict:
+                raise PythonFallbackError(
+                    f"chunk selection {chunk_selection!r} is not supported by the "
+                    f"zarrs codec pipeline ({reason})"
+                ) from e
+            self.partition_stats.record_fallback(reason, chunk_selection)
+        python_batch_info = [info for info, _ in fallbacks]
+        self.partition_stats.record(len(chunks_desc), len(python_batch_info))
+        return chunks_desc, python_batch_info
 
     def _raise_error_on_unsupported_batch_dtype(
         self,
@@ -233,10 +460,21 @@ class ZarrsCodecPipeline(CodecPipeline):
             tuple[ByteSetter, ArraySpec, SelectorTuple, SelectorTuple, bool]
         ],
     ):
-        # https://github.com/LDeakin/zarrs/blob/0532fe983b7b42b59dbf84e50a2fe5e6f7bad4ce/zarrs_metadata/src/v2_to_v3.rs#L289-L293 for VSUMm
-        # Further, our pipeline does not support variable-length objects due to limitations on decode_into, so object/np.dtypes.StringDType is also out
         if any(
-            info.dtype.kind in {"V", "S", "U", "M", "m", "O", "T"}
+            info.dtype.kind in UNSUPPORTED_DTYPE_KINDS
             for (_, info, _, _, _) in batch_info
         ):
             raise UnsupportedDataTypeError()
+
+    def _supports_array_specs(self, array_specs: Iterable[ArraySpec]) -> bool:
+        """Whether chunks with ``array_specs`` can be encoded and decoded in Rust.
+
+        Rust decodes chunks in native byte order, so chunks with a non-native data type
+        are handled by the Python pipeline.
+        """
+        return self.impl is not None and all(
+            spec.dtype.kind not in UNSUPPORTED_DTYPE_KINDS
+            and spec.dtype.isnative
+            and spec.fill_value is not None
+            for spec in array_specs
+        )
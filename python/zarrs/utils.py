@@ -10,10 +10,10 @@ from zarr.core.array_spec import ArraySpec
 from zarr.core.indexing import SelectorTuple, is_integer
 from zarr.core.metadata.v2 import _default_fill_value
 
-from zarrs._internal import Basic, WithSubset
+from zarrs._internal import WithSubset
 
 if TYPE_CHECKING:
-    from collections.abc import Iterable
+    from collections.abc import Callable, Iterable
     from types import EllipsisType
 
     from zarr.abc.store import ByteGetter, ByteSetter
@@ -68,6 +68,107 @@ def selector_tuple_to_slice_selection(selector_tuple: SelectorTuple) -> list[sli
     return make_slice_selection(selector_tuple)
 
 
+def is_contiguous_slice_selection(selector_tuple: SelectorTuple) -> bool:
+    if isinstance(selector_tuple, slice):
+        selector_tuple = (selector_tuple,)
+    elif isinstance(selector_tuple, np.ndarray):
+        return False
+    return all(isinstance(s, slice) and s.step in (None, 1) for s in selector_tuple)
+
+
+def is_strided_slice_selection(selector_tuple: SelectorTuple) -> bool:
+    """Whether a selection of slices and integers has a slice with a step > 1."""
+    if isinstance(selector_tuple, slice):
+        selector_tuple = (selector_tuple,)
+    elif isinstance(selector_tuple, np.ndarray):
+        return False
+    return all(isinstance(s, slice) or is_integer(s) for s in selector_tuple) and any(
+        isinstance(s, slice) and s.step is not None and s.step > 1
+        for s in selector_tuple
+    )
+
+
+def is_orthogonal_array_selection(selector_tuple: SelectorTuple) -> bool:
+    """Whether a selection is made of integer arrays broadcast like ``np.ix_``.
+
+    This is how zarr expresses orthogonal (outer) indexing with integer arrays.
+    Pointwise (vectorized) selections of more than one dimension are not orthogonal.
+    """
+    if not isinstance(selector_tuple, tuple) or not selector_tuple:
+        return False
+    ndim = len(selector_tuple)
+    return all(
+        isinstance(s, np.ndarray)
+        and s.dtype.kind in "iu"
+        and s.ndim == ndim
+        and all(length == 1 for axis, length in enumerate(s.shape) if axis != dim)
+        for dim, s in enumerate(selector_tuple)
+    )
+
+
+def make_dim_selection(dim_selection: slice | np.ndarray) -> slice | list[int]:
+    if isinstance(dim_selection, slice):
+        return dim_selection
+    dim_selection = dim_selection.ravel()
+    if len(dim_selection) > 0 and (np.diff(dim_selection) == 1).all():
+        return slice(int(dim_selection[0]), int(dim_selection[-1]) + 1, 1)
+    return dim_selection.tolist()
+
+
+def make_orthogonal_selection(
+    chunk_selection: tuple[np.ndarray, ...],
+    out_selection: SelectorTuple,
+    drop_axes: tuple[int, ...],
+    shape: tuple[int, ...],
+) -> tuple[list[slice | list[int]], list[slice | list[int]], tuple[int, ...]]:
+    """Convert an orthogonal integer array selection to per-dimension selections.
+
+    Dropped axes are reinstated in the output selection and shape with a length of 1,
+    so that chunk and output dimensions correspond.
+    """
+    if isinstance(out_selection, slice | np.ndarray):
+        out_selection = (out_selection,)
+    chunk_dim_selections = [make_dim_selection(s) for s in chunk_selection]
+    out_dim_selections = [make_dim_selection(s) for s in out_selection]
+    shape = list(shape)
+    for axis in sorted(drop_axes):
+        out_dim_selections.insert(axis, slice(0, 1, 1))
+        shape.insert(axis, 1)
+    if len(chunk_dim_selections) != len(out_dim_selections):
+        raise DiscontiguousArrayError(
+            f"{len(chunk_dim_selections)} chunk dimensions != {len(out_dim_selections)} output dimensions"
+        )
+    return chunk_dim_selections, out_dim_selections, tuple(shape)
+
+
+def make_strided_selection(
+    chunk_selection: SelectorTuple,
+    out_selection: SelectorTuple,
+    shape: tuple[int, ...],
+) -> tuple[list[slice], list[slice], tuple[int, ...]]:
+    """Convert a strided slice selection to per-dimension selections.
+
+    Axes indexed by an integer have no output dimension, so they are reinstated in the
+    output selection and shape with a length of 1.
+    """
+    if isinstance(chunk_selection, slice):
+        chunk_selection = (chunk_selection,)
+    if isinstance(out_selection, slice):
+        out_selection = (out_selection,)
+    chunk_dim_selections = make_slice_selection(chunk_selection)
+    out_dim_selections = list(out_selection)
+    shape = list(shape)
+    for axis, s in enumerate(chunk_selection):
+        if is_integer(s):
+            out_dim_selections.insert(axis, slice(0, 1, 1))
+            shape.insert(axis, 1)
+    if len(chunk_dim_selections) != len(out_dim_selections):
+        raise DiscontiguousArrayError(
+            f"{len(chunk_dim_selections)} chunk dimensions != {len(out_dim_selections)} output dimensions"
+        )
+    return chunk_dim_selections, out_dim_selections, tuple(shape)
+
+
 def resulting_shape_from_index(
     array_shape: tuple[int, ...],
     index_tuple: tuple[int | slice | EllipsisType | np.ndarray],
@@ -93,13 +194,9 @@ def resulting_shape_from_index(
             # Integer index reduces dimension, so skip this dimension in array_shape
             basic_shape_index += 1
         elif isinstance(idx, slice):
-            if idx.step is not None and idx.step > 1:
-                raise DiscontiguousArrayError(
-                    "Step size greater than 1 is not supported"
-                )
             # Slice keeps dimension, adjust size accordingly
-            start, stop, _ = idx.indices(array_shape[basic_shape_index])
-            result_shape.append(stop - start)
+            dim_range = range(*idx.indices(array_shape[basic_shape_index]))
+            result_shape.append(len(dim_range))
             basic_shape_index += 1
         elif idx is Ellipsis:
             # Calculate number of dimensions that Ellipsis should fill
@@ -145,22 +242,104 @@ def get_implicit_fill_value(dtype: np.dtype, fill_value: Any) -> Any:
     return fill_value
 
 
+class _ChunkBatch:
+    """Chunks sharing a store, chunk spec and output shape, converted in one call."""
+
+    __slots__ = ("chunk_spec", "chunk_subsets", "paths", "shape", "store", "subsets")
+
+    def __init__(
+        self, store: Any, chunk_spec: ArraySpec, shape: tuple[int, ...]
+    ) -> None:
+        self.store = store
+        self.chunk_spec = chunk_spec
+        self.shape = shape
+        self.paths: list[str] = []
+        self.chunk_subsets: list[list[slice | list[int]]] = []
+        self.subsets: list[list[slice | list[int]]] = []
+
+    def to_rust(self) -> list[WithSubset]:
+        return WithSubset.batch(
+            self.store,
+            self.chunk_spec,
+            self.paths,
+            self.chunk_subsets,
+            self.subsets,
+            self.shape,
+        )
+
+
+def make_dim_selections(
+    chunk_selection: SelectorTuple,
+    out_selection: SelectorTuple,
+    drop_axes: tuple[int, ...],
+    chunk_shape: tuple[int, ...],
+    shape: tuple[int, ...],
+    *,
+    allow_index_arrays: bool,
+) -> tuple[list[slice | list[int]], list[slice | list[int]], tuple[int, ...]]:
+    if allow_index_arrays and is_orthogonal_array_selection(chunk_selection):
+        return make_orthogonal_selection(
+            chunk_selection, out_selection, drop_axes, shape
+        )
+    if allow_index_arrays and is_strided_slice_selection(chunk_selection):
+        return make_strided_selection(chunk_selection, out_selection, shape)
+    if is_strided_slice_selection(chunk_selection):
+        raise DiscontiguousArrayError("Step size greater than 1 is not supported")
+    out_dim_selections = selector_tuple_to_slice_selection(out_selection)
+    chunk_dim_selections = selector_tuple_to_slice_selection(chunk_selection)
+    # A contiguous slice selection is passed to Rust as is, so it cannot collapse
+    if not is_contiguous_slice_selection(chunk_selection):
+        shape_chunk_selection_slices = get_shape_for_selector(
+            tuple(chunk_dim_selections),
+            chunk_shape,
+            pad=True,
+            drop_axes=drop_axes,
+        )
+        shape_chunk_selection = get_shape_for_selector(
+            chunk_selection, chunk_shape, pad=True, drop_axes=drop_axes
+        )
+        if prod_op(shape_chunk_selection) != prod_op(shape_chunk_selection_slices):
+            raise CollapsedDimensionError(
+                f"{shape_chunk_selection} != {shape_chunk_selection_slices}"
+            )
+    return chunk_dim_selections, out_dim_selections, shape
+
+
 def make_chunk_info_for_rust_with_indices(
     batch_info: Iterable[
         tuple[ByteGetter | ByteSetter, ArraySpec, SelectorTuple, SelectorTuple, bool]
     ],
     drop_axes: tuple[int, ...],
     shape: tuple[int, ...],
+    *,
+    allow_index_arrays: bool = False,
+    fallback: Callable[
+        [
+            tuple[
+                ByteGetter | ByteSetter, ArraySpec, SelectorTuple, SelectorTuple, bool
+            ],
+            Exception,
+        ],
+        None,
+    ]
+    | None = None,
 ) -> list[WithSubset]:
+    """Describe the chunks of a batch for the Rust codec pipeline.
+
+    If ``allow_index_arrays`` is set, orthogonal integer array and strided slice
+    selections are passed to Rust as per-dimension indices rather than raising a
+    ``DiscontiguousArrayError``.
+
+    If ``fallback`` is given, it is called with each chunk with a selection Rust
+    cannot handle and the ``DiscontiguousArrayError`` or ``CollapsedDimensionError``
+    that would otherwise be raised.
+    """
     shape = shape if shape else (1,)  # constant array
     chunk_info_with_indices: list[WithSubset] = []
-    for (
-        byte_getter,
-        chunk_spec,
-        chunk_selection,
-        out_selection,
-        _,
-    ) in batch_info:
+    # Consecutive chunks usually share a store and chunk spec, so they are batched
+    batch: _ChunkBatch | None = None
+    for info in batch_info:
+        byte_getter, chunk_spec, chunk_selection, out_selection, _ = info
         if chunk_spec.fill_value is None:
             chunk_spec = ArraySpec(
                 chunk_spec.shape,
@@ -169,28 +348,32 @@ def make_chunk_info_for_rust_with_indices(
                 chunk_spec.config,
                 chunk_spec.prototype,
             )
-        chunk_info = Basic(byte_getter, chunk_spec)
-        out_selection_as_slices = selector_tuple_to_slice_selection(out_selection)
-        chunk_selection_as_slices = selector_tuple_to_slice_selection(chunk_selection)
-        shape_chunk_selection_slices = get_shape_for_selector(
-            tuple(chunk_selection_as_slices),
-            chunk_spec.shape,
-            pad=True,
-            drop_axes=drop_axes,
-        )
-        shape_chunk_selection = get_shape_for_selector(
-            chunk_selection, chunk_spec.shape, pad=True, drop_axes=drop_axes
-        )
-        if prod_op(shape_chunk_selection) != prod_op(shape_chunk_selection_slices):
-            raise CollapsedDimensionError(
-                f"{shape_chunk_selection} != {shape_chunk_selection_slices}"
-            )
-        chunk_info_with_indices.append(
-            WithSubset(
-                chunk_info,
-                chunk_subset=chunk_selection_as_slices,
-                subset=out_selection_as_slices,
-                shape=shape,
+        try:
+            chunk_dim_selections, out_dim_selections, out_shape = make_dim_selections(
+                chunk_selection,
+                out_selection,
+                drop_axes,
+                chunk_spec.shape,
+                shape,
+                allow_index_arrays=allow_index_arrays,
             )
-        )
+        except (DiscontiguousArrayError, CollapsedDimensionError) as e:
+            if fallback is None:
+                raise
+            fallback(info, e)
+            continue
+        if (
+            batch is None
+            or byte_getter.store is not batch.store
+            or out_shape != batch.shape
+            or chunk_spec != batch.chunk_spec
+        ):
+            if batch is not None:
+                chunk_info_with_indices.extend(batch.to_rust())
+            batch = _ChunkBatch(byte_getter.store, chunk_spec, out_shape)
+        batch.paths.append(byte_getter.path)
+        batch.chunk_subsets.append(chunk_dim_selections)
+        batch.subsets.append(out_dim_selections)
+    if batch is not None:
+        chunk_info_with_indices.extend(batch.to_rust())
     return chunk_info_with_indices
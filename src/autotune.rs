@@ -0,0 +1,147 @@
+use std::{
+    collections::HashMap,
+    sync::{
+        atomic::{AtomicU64, Ordering},
+        Mutex,
+    },
+    time::Duration,
+};
+
+use pyo3::{exceptions::PyRuntimeError, PyResult};
+
+use crate::utils::PyErrExt as _;
+
+/// Tunes the chunk concurrency of reads by hill climbing on the measured throughput.
+///
+/// The chunk concurrency of each read is stepped in one direction while the throughput improves,
+/// and the direction is reversed with a smaller step when it worsens. The codec concurrency takes
+/// the remaining threads, so the tuner moves along the chunk/codec concurrency split.
+pub(crate) struct ConcurrencyAutotuner {
+    max_chunk_concurrent_limit: usize,
+    state: Mutex<AutotunerState>,
+    /// The cumulative time spent waiting for encoded chunks in the current batch.
+    fetch_nanos: AtomicU64,
+    /// The number of encoded chunks retrieved in the current batch.
+    fetches: AtomicU64,
+}
+
+#[derive(Default)]
+struct AutotunerState {
+    chunk_concurrent_limit: Option<usize>,
+    step: usize,
+    decreasing: bool,
+    throughput: Option<f64>,
+    best: Option<(usize, f64)>,
+    batches: u64,
+    batch_nanos: u64,
+    fetch_latency_nanos: u64,
+}
+
+impl ConcurrencyAutotuner {
+    pub(crate) fn new(max_chunk_concurrent_limit: usize) -> Self {
+        Self {
+            max_chunk_concurrent_limit: max_chunk_concurrent_limit.max(1),
+            state: Mutex::new(AutotunerState::default()),
+            fetch_nanos: AtomicU64::new(0),
+            fetches: AtomicU64::new(0),
+        }
+    }
+
+    /// Returns the tuned chunk concurrency, starting from `planned` for the first batch.
+    pub(crate) fn chunk_concurrent_limit(&self, planned: usize) -> PyResult<usize> {
+        let mut state = self.state.lock().map_py_err::<PyRuntimeError>()?;
+        let chunk_concurrent_limit = *state
+            .chunk_concurrent_limit
+            .get_or_insert(planned.clamp(1, self.max_chunk_concurrent_limit));
+        if state.step == 0 {
+            state.step = (chunk_concurrent_limit / 2).max(1);
+        }
+        Ok(chunk_concurrent_limit)
+    }
+
+    /// Record the time spent waiting for an encoded chunk.
+    pub(crate) fn record_fetch(&self, elapsed: Duration) {
+        self.fetch_nanos
+            .fetch_add(duration_nanos(elapsed), Ordering::Relaxed);
+        self.fetches.fetch_add(1, Ordering::Relaxed);
+    }
+
+    /// Record a read of `num_chunks` chunks and `num_bytes` decoded bytes with
+    /// `chunk_concurrent_limit`, and step the chunk concurrency.
+    ///
+    /// Batches with fewer chunks than the tuned chunk concurrency do not measure it, so they only
+    /// update the timing statistics.
+    #[allow(clippy::cast_precision_loss)]
+    pub(crate) fn record_batch(
+        &self,
+        chunk_concurrent_limit: usize,
+        num_chunks: usize,
+        num_bytes: usize,
+        elapsed: Duration,
+    ) -> PyResult<()> {
+        let fetch_nanos = self.fetch_nanos.swap(0, Ordering::Relaxed);
+        let fetches = self.fetches.swap(0, Ordering::Relaxed);
+        let mut state = self.state.lock().map_py_err::<PyRuntimeError>()?;
+        state.batches += 1;
+        state.batch_nanos = duration_nanos(elapsed);
+        if fetches > 0 {
+            state.fetch_latency_nanos = fetch_nanos / fetches;
+        }
+        if num_chunks < chunk_concurrent_limit
+            || state.chunk_concurrent_limit != Some(chunk_concurrent_limit)
+        {
+            return Ok(());
+        }
+
+        let throughput = num_bytes as f64 / elapsed.as_secs_f64().max(f64::EPSILON);
+        if state.best.map_or(true, |(_, best)| throughput > best) {
+            state.best = Some((chunk_concurrent_limit, throughput));
+        }
+        if state
+            .throughput
+            .is_some_and(|previous| throughput < previous)
+        {
+            state.decreasing = !state.decreasing;
+            state.step = (state.step / 2).max(1);
+        }
+        state.throughput = Some(throughput);
+        state.chunk_concurrent_limit = Some(if state.decreasing {
+            chunk_concurrent_limit.saturating_sub(state.step).max(1)
+        } else {
+            (chunk_concurrent_limit + state.step).min(self.max_chunk_concurrent_limit)
+        });
+        Ok(())
+    }
+
+    #[allow(clippy::cast_possible_truncation, clippy::cast_sign_loss)]
+    pub(crate) fn info(&self, num_threads: usize) -> PyResult<HashMap<&'static str, u64>> {
+        let state = self.state.lock().map_py_err::<PyRuntimeError>()?;
+        let chunk_concurrent_limit = state.chunk_concurrent_limit.unwrap_or_default();
+        let (best_chunk_concurrent_limit, best_throughput) = state.best.unwrap_or_default();
+        Ok(HashMap::from([
+            ("chunk_concurrent_limit", chunk_concurrent_limit as u64),
+            (
+                "codec_concurrent_limit",
+                codec_concurrent_limit(num_threads, chunk_concurrent_limit) as u64,
+            ),
+            (
+                "best_chunk_concurrent_limit",
+                best_chunk_concurrent_limit as u64,
+            ),
+            ("best_throughput", best_throughput as u64),
+            ("throughput", state.throughput.unwrap_or_default() as u64),
+            ("batches", state.batches),
+            ("batch_time_us", state.batch_nanos / 1000),
+            ("fetch_latency_us", state.fetch_latency_nanos / 1000),
+        ]))
+    }
+}
+
+/// Returns the codec concurrency that uses the threads left by `chunk_concurrent_limit`.
+pub(crate) fn codec_concurrent_limit(num_threads: usize, chunk_concurrent_limit: usize) -> usize {
+    (num_threads / chunk_concurrent_limit.max(1)).max(1)
+}
+
+fn duration_nanos(duration: Duration) -> u64 {
+    u64::try_from(duration.as_nanos()).unwrap_or(u64::MAX)
+}
@@ -0,0 +1,138 @@
+use std::{
+    future::{pending, Future},
+    sync::{
+        atomic::{AtomicBool, Ordering},
+        Arc,
+    },
+    time::{Duration, Instant},
+};
+
+use pyo3::{
+    exceptions::{asyncio::CancelledError, PyTimeoutError, PyValueError},
+    pyclass, pymethods, Bound, PyErr, PyResult,
+};
+use pyo3_stub_gen::derive::{gen_stub_pyclass, gen_stub_pymethods};
+use tokio::sync::Notify;
+
+use crate::utils::PyErrExt as _;
+
+#[derive(Default)]
+struct CancellationState {
+    cancelled: AtomicBool,
+    notify: Notify,
+}
+
+impl CancellationState {
+    fn is_cancelled(&self) -> bool {
+        self.cancelled.load(Ordering::Acquire)
+    }
+
+    async fn cancelled(&self) {
+        loop {
+            // Notified futures receive notify_waiters wakeups from creation
+            let notified = self.notify.notified();
+            if self.is_cancelled() {
+                return;
+            }
+            notified.await;
+        }
+    }
+}
+
+/// A token to cancel calls of a `CodecPipelineImpl`.
+///
+/// Calls stop cooperatively: chunks already being retrieved or stored are completed, but no
+/// further chunks are started and pending store fetches are abandoned.
+#[gen_stub_pyclass]
+#[pyclass(frozen)]
+#[derive(Default)]
+pub struct CancellationToken(Arc<CancellationState>);
+
+#[gen_stub_pymethods]
+#[pymethods]
+impl CancellationToken {
+    #[new]
+    fn new() -> Self {
+        Self::default()
+    }
+
+    fn cancel(&self) {
+        self.0.cancelled.store(true, Ordering::Release);
+        self.0.notify.notify_waiters();
+    }
+
+    fn cancelled(&self) -> bool {
+        self.0.is_cancelled()
+    }
+}
+
+/// The cancellation token and deadline of a call.
+#[derive(Clone, Default)]
+pub(crate) struct Cancellation {
+    token: Option<Arc<CancellationState>>,
+    deadline: Option<Instant>,
+}
+
+impl Cancellation {
+    /// Create the cancellation of a call with an optional `timeout` in seconds.
+    pub(crate) fn new(
+        token: Option<&Bound<'_, CancellationToken>>,
+        timeout: Option<f64>,
+    ) -> PyResult<Self> {
+        let deadline = timeout
+            .map(|timeout| Duration::try_from_secs_f64(timeout).map_py_err::<PyValueError>())
+            .transpose()?
+            .map(|timeout| Instant::now() + timeout);
+        Ok(Self {
+            token: token.map(|token| token.get().0.clone()),
+            deadline,
+        })
+    }
+
+    /// Returns an error if the call has been cancelled or its deadline has passed.
+    pub(crate) fn check(&self) -> PyResult<()> {
+        if self
+            .token
+            .as_ref()
+            .is_some_and(|token| token.is_cancelled())
+        {
+            return Err(cancelled_error());
+        }
+        if self
+            .deadline
+            .is_some_and(|deadline| Instant::now() >= deadline)
+        {
+            return Err(timeout_error());
+        }
+        Ok(())
+    }
+
+    /// Run `future` until it completes, or the call is cancelled or its deadline passes.
+    pub(crate) async fn run<F: Future>(&self, future: F) -> PyResult<F::Output> {
+        let cancelled = async {
+            match &self.token {
+                Some(token) => token.cancelled().await,
+                None => pending().await,
+            }
+        };
+        let deadline = async {
+            match self.deadline {
+                Some(deadline) => tokio::time::sleep_until(deadline.into()).await,
+                None => pending().await,
+            }
+        };
+        tokio::select! {
+            output = future => Ok(output),
+            () = cancelled => Err(cancelled_error()),
+            () = deadline => Err(timeout_error()),
+        }
+    }
+}
+
+fn cancelled_error() -> PyErr {
+    CancelledError::new_err("the call was cancelled")
+}
+
+fn timeout_error() -> PyErr {
+    PyTimeoutError::new_err("the call exceeded its timeout")
+}
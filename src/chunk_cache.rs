@@ -0,0 +1,248 @@
+use std::{
+    collections::HashMap,
+    num::NonZeroUsize,
+    sync::{
+        atomic::{AtomicU64, Ordering},
+        Arc, Mutex,
+    },
+};
+
+use lru::LruCache;
+use pyo3::{exceptions::PyRuntimeError, PyResult};
+use zarrs::{
+    array::{codec::ArrayPartialDecoderTraits, ChunkRepresentation},
+    storage::StoreKey,
+};
+
+use crate::{chunk_item::ChunksItem, store::StoreConfig, utils::PyErrExt as _};
+
+type ChunkCacheKey = (StoreConfig, StoreKey);
+
+fn chunk_cache_key<I: ChunksItem>(item: &I) -> ChunkCacheKey {
+    (item.store_config(), item.key().clone())
+}
+
+/// The maximum number of invalidated keys tracked by a [`DecodedChunkCache`].
+const MAX_INVALIDATED_KEYS: usize = 1024;
+
+/// A byte-budgeted LRU cache of decoded (fixed length) chunks.
+///
+/// A capacity of zero disables the cache. Chunks are only inserted if they have not been
+/// invalidated since the [`generation`](Self::generation) taken before they were retrieved, so a
+/// chunk retrieved concurrently with a write of it is never cached stale. Cached chunks are only
+/// returned for items with the same (interned) chunk representation as the item they were
+/// decoded for.
+pub(crate) struct DecodedChunkCache {
+    capacity: usize,
+    inner: Mutex<DecodedChunkCacheInner>,
+    hits: AtomicU64,
+    misses: AtomicU64,
+}
+
+struct DecodedChunkCacheInner {
+    chunks: LruCache<ChunkCacheKey, (Arc<ChunkRepresentation>, Arc<Vec<u8>>)>,
+    size: usize,
+    /// The number of invalidations.
+    generation: u64,
+    /// The generation of the latest invalidation of recently invalidated keys.
+    invalidated: HashMap<ChunkCacheKey, u64>,
+    /// The generation when `invalidated` was last cleared, before which chunks are not inserted.
+    cleared_generation: u64,
+}
+
+impl DecodedChunkCache {
+    pub(crate) fn new(capacity: usize) -> Self {
+        Self {
+            capacity,
+            inner: Mutex::new(DecodedChunkCacheInner {
+                chunks: LruCache::unbounded(),
+                size: 0,
+                generation: 0,
+                invalidated: HashMap::new(),
+                cleared_generation: 0,
+            }),
+            hits: AtomicU64::new(0),
+            misses: AtomicU64::new(0),
+        }
+    }
+
+    /// Returns true if the cache is enabled and the decoded chunk fits within its capacity.
+    pub(crate) fn admits<I: ChunksItem>(&self, item: &I) -> bool {
+        let representation = item.representation();
+        let decoded_size = usize::try_from(representation.num_elements())
+            .ok()
+            .zip(representation.data_type().fixed_size())
+            .map(|(num_elements, data_type_size)| num_elements * data_type_size);
+        self.capacity > 0 && decoded_size.is_some_and(|size| size <= self.capacity)
+    }
+
+    pub(crate) fn get<I: ChunksItem>(&self, item: &I) -> PyResult<Option<Arc<Vec<u8>>>> {
+        let chunk = self
+            .inner
+            .lock()
+            .map_py_err::<PyRuntimeError>()?
+            .chunks
+            .get(&chunk_cache_key(item))
+            .filter(|(representation, _)| {
+                // Holding the representation keeps it interned, so equal representations are
+                // the same allocation
+                Arc::ptr_eq(representation, item.shared_representation())
+            })
+            .map(|(_, chunk)| chunk.clone());
+        if chunk.is_some() {
+            self.hits.fetch_add(1, Ordering::Relaxed);
+        } else {
+            self.misses.fetch_add(1, Ordering::Relaxed);
+        }
+        Ok(chunk)
+    }
+
+    /// Returns the generation of the cache, to be taken before retrieving a chunk to insert.
+    pub(crate) fn generation(&self) -> PyResult<u64> {
+        Ok(self.inner.lock().map_py_err::<PyRuntimeError>()?.generation)
+    }
+
+    /// Insert a chunk retrieved after taking `generation`, unless it has been invalidated since.
+    pub(crate) fn insert<I: ChunksItem>(
+        &self,
+        item: &I,
+        chunk: Arc<Vec<u8>>,
+        generation: u64,
+    ) -> PyResult<()> {
+        let mut inner = self.inner.lock().map_py_err::<PyRuntimeError>()?;
+        let key = chunk_cache_key(item);
+        if generation < inner.cleared_generation
+            || inner
+                .invalidated
+                .get(&key)
+                .is_some_and(|&invalidated| invalidated > generation)
+        {
+            return Ok(());
+        }
+        inner.size += chunk.len();
+        let representation = item.shared_representation().clone();
+        if let Some((_, previous)) = inner.chunks.put(key, (representation, chunk)) {
+            inner.size -= previous.len();
+        }
+        while inner.size > self.capacity {
+            let Some((_, (_, evicted))) = inner.chunks.pop_lru() else {
+                break;
+            };
+            inner.size -= evicted.len();
+        }
+        Ok(())
+    }
+
+    pub(crate) fn invalidate<I: ChunksItem>(&self, item: &I) -> PyResult<()> {
+        if self.capacity == 0 {
+            return Ok(());
+        }
+        let mut inner = self.inner.lock().map_py_err::<PyRuntimeError>()?;
+        inner.generation += 1;
+        let generation = inner.generation;
+        let key = chunk_cache_key(item);
+        if let Some((_, chunk)) = inner.chunks.pop(&key) {
+            inner.size -= chunk.len();
+        }
+        if inner.invalidated.len() >= MAX_INVALIDATED_KEYS {
+            // Forget invalidated keys by not inserting any chunk retrieved before now
+            inner.invalidated.clear();
+            inner.cleared_generation = generation;
+        } else {
+            inner.invalidated.insert(key, generation);
+        }
+        Ok(())
+    }
+
+    pub(crate) fn info(&self) -> PyResult<HashMap<&'static str, u64>> {
+        let inner = self.inner.lock().map_py_err::<PyRuntimeError>()?;
+        Ok(HashMap::from([
+            ("hits", self.hits.load(Ordering::Relaxed)),
+            ("misses", self.misses.load(Ordering::Relaxed)),
+            ("entries", inner.chunks.len() as u64),
+            ("size", inner.size as u64),
+            ("capacity", self.capacity as u64),
+        ]))
+    }
+}
+
+/// An LRU cache of partial decoders with a bounded number of entries.
+///
+/// Partial decoders of sharded arrays hold the decoded shard index, so reusing them across calls
+/// avoids re-reading the index of each shard. A capacity of zero disables the cache.
+pub(crate) struct PartialDecoderCache {
+    decoders: Option<Mutex<LruCache<ChunkCacheKey, Arc<dyn ArrayPartialDecoderTraits>>>>,
+    hits: AtomicU64,
+    misses: AtomicU64,
+}
+
+impl PartialDecoderCache {
+    pub(crate) fn new(capacity: usize) -> Self {
+        Self {
+            decoders: NonZeroUsize::new(capacity)
+                .map(|capacity| Mutex::new(LruCache::new(capacity))),
+            hits: AtomicU64::new(0),
+            misses: AtomicU64::new(0),
+        }
+    }
+
+    pub(crate) fn get<I: ChunksItem>(
+        &self,
+        item: &I,
+    ) -> PyResult<Option<Arc<dyn ArrayPartialDecoderTraits>>> {
+        let Some(decoders) = &self.decoders else {
+            return Ok(None);
+        };
+        let decoder = decoders
+            .lock()
+            .map_py_err::<PyRuntimeError>()?
+            .get(&chunk_cache_key(item))
+            .cloned();
+        if decoder.is_some() {
+            self.hits.fetch_add(1, Ordering::Relaxed);
+        } else {
+            self.misses.fetch_add(1, Ordering::Relaxed);
+        }
+        Ok(decoder)
+    }
+
+    pub(crate) fn insert<I: ChunksItem>(
+        &self,
+        item: &I,
+        decoder: Arc<dyn ArrayPartialDecoderTraits>,
+    ) -> PyResult<()> {
+        if let Some(decoders) = &self.decoders {
+            decoders
+                .lock()
+                .map_py_err::<PyRuntimeError>()?
+                .put(chunk_cache_key(item), decoder);
+        }
+        Ok(())
+    }
+
+    pub(crate) fn invalidate<I: ChunksItem>(&self, item: &I) -> PyResult<()> {
+        if let Some(decoders) = &self.decoders {
+            decoders
+                .lock()
+                .map_py_err::<PyRuntimeError>()?
+                .pop(&chunk_cache_key(item));
+        }
+        Ok(())
+    }
+
+    pub(crate) fn info(&self) -> PyResult<HashMap<&'static str, u64>> {
+        let (entries, capacity) = match &self.decoders {
+            Some(decoders) => {
+                let decoders = decoders.lock().map_py_err::<PyRuntimeError>()?;
+                (decoders.len(), decoders.cap().get())
+            }
+            None => (0, 0),
+        };
+        Ok(HashMap::from([
+            ("hits", self.hits.load(Ordering::Relaxed)),
+            ("misses", self.misses.load(Ordering::Relaxed)),
+            ("entries", entries as u64),
+            ("capacity", capacity as u64),
+        ]))
+    }
+}
@@ -1,12 +1,20 @@
-use std::num::NonZeroU64;
+use std::{
+    collections::{HashMap, HashSet},
+    num::NonZeroU64,
+    sync::{Arc, Mutex, OnceLock, Weak},
+};
 
 use pyo3::{
     exceptions::{PyRuntimeError, PyValueError},
     pyclass, pymethods,
     types::{PyAnyMethods, PyBytes, PyBytesMethods, PyInt, PySlice, PySliceMethods as _},
-    Bound, PyAny, PyErr, PyResult,
+    Bound, FromPyObject, PyAny, PyErr, PyResult,
+};
+use pyo3_stub_gen::{
+    derive::{gen_stub_pyclass, gen_stub_pymethods},
+    PyStubType, TypeInfo,
 };
-use pyo3_stub_gen::derive::{gen_stub_pyclass, gen_stub_pymethods};
+use unsafe_cell_slice::UnsafeCellSlice;
 use zarrs::{
     array::{ChunkRepresentation, DataType, FillValue},
     array_subset::ArraySubset,
@@ -20,6 +28,9 @@ pub(crate) trait ChunksItem {
     fn store_config(&self) -> StoreConfig;
     fn key(&self) -> &StoreKey;
     fn representation(&self) -> &ChunkRepresentation;
+    /// The interned representation, shared by chunks with the same shape, data type and fill
+    /// value.
+    fn shared_representation(&self) -> &Arc<ChunkRepresentation>;
 }
 
 #[derive(Clone)]
@@ -28,7 +39,21 @@ pub(crate) trait ChunksItem {
 pub(crate) struct Basic {
     store: StoreConfig,
     key: StoreKey,
-    representation: ChunkRepresentation,
+    representation: Arc<ChunkRepresentation>,
+}
+
+type ChunkRepresentationKey = (Vec<u64>, String, Vec<u8>);
+
+/// Interned chunk representations, so that chunks with the same shape, data type and fill value
+/// share a single representation.
+static CHUNK_REPRESENTATIONS: OnceLock<Mutex<ChunkRepresentations>> = OnceLock::new();
+
+#[derive(Default)]
+struct ChunkRepresentations {
+    representations: HashMap<ChunkRepresentationKey, Weak<ChunkRepresentation>>,
+    /// The number of representations at which representations no longer referenced by any chunk
+    /// are next forgotten.
+    prune_len: usize,
 }
 
 fn fill_value_to_bytes(dtype: &str, fill_value: &Bound<'_, PyAny>) -> PyResult<Vec<u8>> {
@@ -57,6 +82,24 @@ fn fill_value_to_bytes(dtype: &str, fill_value: &Bound<'_, PyAny>) -> PyResult<V
     }
 }
 
+pub(crate) fn chunk_spec_to_representation(
+    chunk_spec: &Bound<'_, PyAny>,
+) -> PyResult<Arc<ChunkRepresentation>> {
+    let chunk_shape = chunk_spec.getattr("shape")?.extract()?;
+    let mut dtype: String = chunk_spec
+        .getattr("dtype")?
+        .call_method0("__str__")?
+        .extract()?;
+    if dtype == "object" {
+        // zarrs doesn't understand `object` which is the output of `np.dtype("|O").__str__()`
+        // but maps it to "string" internally https://github.com/LDeakin/zarrs/blob/0532fe983b7b42b59dbf84e50a2fe5e6f7bad4ce/zarrs_metadata/src/v2_to_v3.rs#L288
+        dtype = String::from("string");
+    }
+    let fill_value: Bound<'_, PyAny> = chunk_spec.getattr("fill_value")?;
+    let fill_value_bytes = fill_value_to_bytes(&dtype, &fill_value)?;
+    get_chunk_representation(chunk_shape, &dtype, fill_value_bytes)
+}
+
 #[gen_stub_pymethods]
 #[pymethods]
 impl Basic {
@@ -64,25 +107,164 @@ impl Basic {
     fn new(byte_interface: &Bound<'_, PyAny>, chunk_spec: &Bound<'_, PyAny>) -> PyResult<Self> {
         let store: StoreConfig = byte_interface.getattr("store")?.extract()?;
         let path: String = byte_interface.getattr("path")?.extract()?;
-
-        let chunk_shape = chunk_spec.getattr("shape")?.extract()?;
-        let mut dtype: String = chunk_spec
-            .getattr("dtype")?
-            .call_method0("__str__")?
-            .extract()?;
-        if dtype == "object" {
-            // zarrs doesn't understand `object` which is the output of `np.dtype("|O").__str__()`
-            // but maps it to "string" internally https://github.com/LDeakin/zarrs/blob/0532fe983b7b42b59dbf84e50a2fe5e6f7bad4ce/zarrs_metadata/src/v2_to_v3.rs#L288
-            dtype = String::from("string");
-        }
-        let fill_value: Bound<'_, PyAny> = chunk_spec.getattr("fill_value")?;
-        let fill_value_bytes = fill_value_to_bytes(&dtype, &fill_value)?;
         Ok(Self {
             store,
             key: StoreKey::new(path).map_py_err::<PyValueError>()?,
-            representation: get_chunk_representation(chunk_shape, &dtype, fill_value_bytes)?,
+            representation: chunk_spec_to_representation(chunk_spec)?,
+        })
+    }
+}
+
+/// The selection of a single dimension, either a slice or an array of integer indices.
+#[derive(FromPyObject)]
+pub(crate) enum DimSelection<'py> {
+    Slice(Bound<'py, PySlice>),
+    Indices(Vec<u64>),
+}
+
+impl PyStubType for DimSelection<'_> {
+    fn type_output() -> TypeInfo {
+        TypeInfo {
+            name: "slice | typing.Sequence[builtins.int]".to_string(),
+            import: HashSet::from(["builtins".into(), "typing".into()]),
+        }
+    }
+}
+
+/// The elements selected by integer index arrays or strided slices, as element offsets into the decoded chunk
+/// subset and into the output array for each dimension.
+///
+/// Selected elements form the outer product of the per-dimension offsets.
+#[derive(Clone)]
+pub(crate) struct SubsetIndices {
+    chunk_offsets: Vec<Vec<usize>>,
+    output_offsets: Vec<Vec<usize>>,
+}
+
+fn c_order_strides(shape: &[u64]) -> PyResult<Vec<usize>> {
+    let mut strides = vec![1; shape.len()];
+    for dim in (1..shape.len()).rev() {
+        strides[dim - 1] = strides[dim] * usize::try_from(shape[dim])?;
+    }
+    Ok(strides)
+}
+
+impl SubsetIndices {
+    fn new(
+        chunk_subset: &ArraySubset,
+        chunk_indices: Vec<Option<Vec<u64>>>,
+        subset: &ArraySubset,
+        indices: Vec<Option<Vec<u64>>>,
+        shape: &[u64],
+    ) -> PyResult<Self> {
+        if chunk_subset.dimensionality() != subset.dimensionality() {
+            return Err(PyErr::new::<PyValueError, _>(format!(
+                "integer array selections must have the same dimensionality in the chunk ({}) and output ({})",
+                chunk_subset.dimensionality(),
+                subset.dimensionality()
+            )));
+        }
+        let dim_indices = |subset: &ArraySubset, indices: Vec<Option<Vec<u64>>>| {
+            indices
+                .into_iter()
+                .zip(subset.shape())
+                .map(|(indices, &length)| indices.unwrap_or_else(|| (0..length).collect()))
+                .collect::<Vec<_>>()
+        };
+        let chunk_indices = dim_indices(chunk_subset, chunk_indices);
+        let indices = dim_indices(subset, indices);
+        let chunk_strides = c_order_strides(chunk_subset.shape())?;
+        let output_strides = c_order_strides(shape)?;
+
+        let mut chunk_offsets = Vec::with_capacity(chunk_indices.len());
+        let mut output_offsets = Vec::with_capacity(indices.len());
+        for (dim, (chunk_indices, indices)) in chunk_indices.iter().zip(&indices).enumerate() {
+            if chunk_indices.len() != indices.len() {
+                return Err(PyErr::new::<PyValueError, _>(format!(
+                    "dimension {dim} selects {} chunk elements but {} output elements",
+                    chunk_indices.len(),
+                    indices.len()
+                )));
+            }
+            chunk_offsets.push(
+                chunk_indices
+                    .iter()
+                    .map(|&index| Ok(usize::try_from(index)? * chunk_strides[dim]))
+                    .collect::<PyResult<Vec<_>>>()?,
+            );
+            output_offsets.push(
+                indices
+                    .iter()
+                    .map(|&index| {
+                        Ok(usize::try_from(subset.start()[dim] + index)? * output_strides[dim])
+                    })
+                    .collect::<PyResult<Vec<_>>>()?,
+            );
+        }
+        Ok(Self {
+            chunk_offsets,
+            output_offsets,
         })
     }
+
+    /// Copy the selected elements of the decoded chunk subset into the output array.
+    ///
+    /// # Safety
+    /// The selected elements of `output` must not be accessed concurrently, i.e. the output
+    /// selections of chunks must be disjoint.
+    pub(crate) unsafe fn scatter(
+        &self,
+        chunk_subset_bytes: &[u8],
+        output: UnsafeCellSlice<'_, u8>,
+        data_type_size: usize,
+    ) -> PyResult<()> {
+        let lengths: Vec<usize> = self.chunk_offsets.iter().map(Vec::len).collect();
+        if lengths.contains(&0) {
+            return Ok(());
+        }
+        let max_offset = |offsets: &[Vec<usize>]| -> usize {
+            offsets
+                .iter()
+                .map(|offsets| offsets.iter().max().copied().unwrap_or_default())
+                .sum()
+        };
+        if (max_offset(&self.chunk_offsets) + 1) * data_type_size > chunk_subset_bytes.len()
+            || (max_offset(&self.output_offsets) + 1) * data_type_size > output.len()
+        {
+            return Err(PyErr::new::<PyValueError, _>(
+                "integer array selection is out of bounds".to_string(),
+            ));
+        }
+
+        let mut position = vec![0; lengths.len()];
+        loop {
+            let chunk_offset: usize = std::iter::zip(&position, &self.chunk_offsets)
+                .map(|(&i, offsets)| offsets[i])
+                .sum();
+            let output_offset: usize = std::iter::zip(&position, &self.output_offsets)
+                .map(|(&i, offsets)| offsets[i])
+                .sum();
+            let element = &chunk_subset_bytes
+                [chunk_offset * data_type_size..(chunk_offset + 1) * data_type_size];
+            for (i, &byte) in element.iter().enumerate() {
+                *output.index_mut(output_offset * data_type_size + i) = byte;
+            }
+
+            // Advance to the next selected element in C order
+            let mut dim = lengths.len();
+            loop {
+                if dim == 0 {
+                    return Ok(());
+                }
+                dim -= 1;
+                position[dim] += 1;
+                if position[dim] < lengths[dim] {
+                    break;
+                }
+                position[dim] = 0;
+            }
+        }
+    }
 }
 
 #[derive(Clone)]
@@ -90,8 +272,41 @@ impl Basic {
 #[pyclass]
 pub(crate) struct WithSubset {
     pub item: Basic,
+    /// The chunk subset, or its bounding box for integer array selections.
     pub chunk_subset: ArraySubset,
+    /// The output subset, or its bounding box for integer array selections.
     pub subset: ArraySubset,
+    pub indices: Option<SubsetIndices>,
+}
+
+impl WithSubset {
+    fn from_selections(
+        item: Basic,
+        chunk_selection: &[DimSelection<'_>],
+        selection: &[DimSelection<'_>],
+        shape: &[u64],
+    ) -> PyResult<Self> {
+        let (chunk_subset, chunk_indices) =
+            selection_to_array_subset(chunk_selection, &item.representation.shape_u64())?;
+        let (subset, indices) = selection_to_array_subset(selection, shape)?;
+        let indices = if chunk_indices.iter().chain(&indices).any(Option::is_some) {
+            Some(SubsetIndices::new(
+                &chunk_subset,
+                chunk_indices,
+                &subset,
+                indices,
+                shape,
+            )?)
+        } else {
+            None
+        };
+        Ok(Self {
+            item,
+            chunk_subset,
+            subset,
+            indices,
+        })
+    }
 }
 
 #[gen_stub_pymethods]
@@ -101,18 +316,47 @@ impl WithSubset {
     #[allow(clippy::needless_pass_by_value)]
     fn new(
         item: Basic,
-        chunk_subset: Vec<Bound<'_, PySlice>>,
-        subset: Vec<Bound<'_, PySlice>>,
+        chunk_subset: Vec<DimSelection<'_>>,
+        subset: Vec<DimSelection<'_>>,
         shape: Vec<u64>,
     ) -> PyResult<Self> {
-        let chunk_subset =
-            selection_to_array_subset(&chunk_subset, &item.representation.shape_u64())?;
-        let subset = selection_to_array_subset(&subset, &shape)?;
-        Ok(Self {
-            item,
-            chunk_subset,
-            subset,
-        })
+        Self::from_selections(item, &chunk_subset, &subset, &shape)
+    }
+
+    #[staticmethod]
+    #[allow(clippy::needless_pass_by_value)]
+    fn batch(
+        store: &Bound<'_, PyAny>,
+        chunk_spec: &Bound<'_, PyAny>,
+        paths: Vec<String>,
+        chunk_subsets: Vec<Vec<DimSelection<'_>>>,
+        subsets: Vec<Vec<DimSelection<'_>>>,
+        shape: Vec<u64>,
+    ) -> PyResult<Vec<Self>> {
+        if paths.len() != chunk_subsets.len() || paths.len() != subsets.len() {
+            return Err(PyErr::new::<PyValueError, _>(format!(
+                "paths ({}), chunk_subsets ({}) and subsets ({}) must have the same length",
+                paths.len(),
+                chunk_subsets.len(),
+                subsets.len()
+            )));
+        }
+        // The store and chunk spec are shared by the batch, so they are only converted once
+        let store: StoreConfig = store.extract()?;
+        let representation = chunk_spec_to_representation(chunk_spec)?;
+        paths
+            .into_iter()
+            .zip(chunk_subsets)
+            .zip(subsets)
+            .map(|((path, chunk_subset), subset)| {
+                let item = Basic {
+                    store: store.clone(),
+                    key: StoreKey::new(path).map_py_err::<PyValueError>()?,
+                    representation: representation.clone(),
+                };
+                Self::from_selections(item, &chunk_subset, &subset, &shape)
+            })
+            .collect()
     }
 }
 
@@ -126,6 +370,9 @@ impl ChunksItem for Basic {
     fn representation(&self) -> &ChunkRepresentation {
         &self.representation
     }
+    fn shared_representation(&self) -> &Arc<ChunkRepresentation> {
+        &self.representation
+    }
 }
 
 impl ChunksItem for WithSubset {
@@ -138,30 +385,64 @@ impl ChunksItem for WithSubset {
     fn representation(&self) -> &ChunkRepresentation {
         &self.item.representation
     }
+    fn shared_representation(&self) -> &Arc<ChunkRepresentation> {
+        &self.item.representation
+    }
 }
 
 fn get_chunk_representation(
     chunk_shape: Vec<u64>,
     dtype: &str,
     fill_value: Vec<u8>,
-) -> PyResult<ChunkRepresentation> {
+) -> PyResult<Arc<ChunkRepresentation>> {
+    let key = (chunk_shape, dtype.to_string(), fill_value);
+    let mut representations = CHUNK_REPRESENTATIONS
+        .get_or_init(Mutex::default)
+        .lock()
+        .map_py_err::<PyRuntimeError>()?;
+    if let Some(representation) = representations
+        .representations
+        .get(&key)
+        .and_then(Weak::upgrade)
+    {
+        return Ok(representation);
+    }
+    // Forget representations no longer referenced by any chunk once the number of
+    // representations has doubled, so pruning is amortised over insertions
+    if representations.representations.len() >= representations.prune_len {
+        representations
+            .representations
+            .retain(|_, representation| representation.strong_count() > 0);
+        representations.prune_len = (representations.representations.len() * 2).max(64);
+    }
+
     // Get the chunk representation
+    let (chunk_shape, dtype, fill_value) = &key;
     let data_type = DataType::from_metadata(
         &MetadataV3::new(dtype),
         zarrs::config::global_config().data_type_aliases_v3(),
     )
     .map_py_err::<PyRuntimeError>()?;
     let chunk_shape = chunk_shape
-        .into_iter()
-        .map(|x| NonZeroU64::new(x).expect("chunk shapes should always be non-zero"))
+        .iter()
+        .map(|&x| NonZeroU64::new(x).expect("chunk shapes should always be non-zero"))
         .collect();
-    let chunk_representation =
-        ChunkRepresentation::new(chunk_shape, data_type, FillValue::new(fill_value))
-            .map_py_err::<PyValueError>()?;
+    let chunk_representation = Arc::new(
+        ChunkRepresentation::new(chunk_shape, data_type, FillValue::new(fill_value.clone()))
+            .map_py_err::<PyValueError>()?,
+    );
+    representations
+        .representations
+        .insert(key, Arc::downgrade(&chunk_representation));
     Ok(chunk_representation)
 }
 
-fn slice_to_range(slice: &Bound<'_, PySlice>, length: isize) -> PyResult<std::ops::Range<u64>> {
+/// Convert a slice to a range and, if the slice is strided, the indices relative to the start
+/// of the range.
+fn slice_to_range(
+    slice: &Bound<'_, PySlice>,
+    length: isize,
+) -> PyResult<(std::ops::Range<u64>, Option<Vec<u64>>)> {
     let indices = slice.indices(length)?;
     if indices.start < 0 {
         Err(PyErr::new::<PyValueError, _>(
@@ -171,27 +452,68 @@ fn slice_to_range(slice: &Bound<'_, PySlice>, length: isize) -> PyResult<std::op
         Err(PyErr::new::<PyValueError, _>(
             "slice stop must be greater than or equal to 0".to_string(),
         ))
-    } else if indices.step != 1 {
+    } else if indices.step < 1 {
         Err(PyErr::new::<PyValueError, _>(
-            "slice step must be equal to 1".to_string(),
+            "slice step must be greater than or equal to 1".to_string(),
+        ))
+    } else if indices.step == 1 {
+        Ok((
+            u64::try_from(indices.start)?..u64::try_from(indices.stop)?,
+            None,
         ))
     } else {
-        Ok(u64::try_from(indices.start)?..u64::try_from(indices.stop)?)
+        let start = u64::try_from(indices.start)?;
+        let step = u64::try_from(indices.step)?;
+        let strided_indices: Vec<u64> = (0..u64::try_from(indices.slicelength)?)
+            .map(|i| i * step)
+            .collect();
+        let end = strided_indices
+            .last()
+            .map_or(start, |&last| start + last + 1);
+        Ok((start..end, Some(strided_indices)))
     }
 }
 
+/// Convert a selection to an array subset and, for dimensions selected by an integer array or a
+/// strided slice, the indices relative to the start of the subset.
+///
+/// The subset of an integer array or strided slice selection is its bounding box.
 fn selection_to_array_subset(
-    selection: &[Bound<'_, PySlice>],
+    selection: &[DimSelection<'_>],
     shape: &[u64],
-) -> PyResult<ArraySubset> {
+) -> PyResult<(ArraySubset, Vec<Option<Vec<u64>>>)> {
     if selection.is_empty() {
-        Ok(ArraySubset::new_with_shape(vec![1; shape.len()]))
+        Ok((
+            ArraySubset::new_with_shape(vec![1; shape.len()]),
+            vec![None; shape.len()],
+        ))
     } else {
-        let chunk_ranges = selection
+        let (ranges, indices): (Vec<_>, Vec<_>) = selection
             .iter()
             .zip(shape)
-            .map(|(selection, &shape)| slice_to_range(selection, isize::try_from(shape)?))
-            .collect::<PyResult<Vec<_>>>()?;
-        Ok(ArraySubset::new_with_ranges(&chunk_ranges))
+            .map(|(selection, &shape)| match selection {
+                DimSelection::Slice(slice) => slice_to_range(slice, isize::try_from(shape)?),
+                DimSelection::Indices(indices) => indices_to_range(indices, shape),
+            })
+            .collect::<PyResult<Vec<_>>>()?
+            .into_iter()
+            .unzip();
+        Ok((ArraySubset::new_with_ranges(&ranges), indices))
+    }
+}
+
+fn indices_to_range(
+    indices: &[u64],
+    length: u64,
+) -> PyResult<(std::ops::Range<u64>, Option<Vec<u64>>)> {
+    let (Some(&start), Some(&end)) = (indices.iter().min(), indices.iter().max()) else {
+        return Ok((0..0, Some(vec![])));
+    };
+    if end >= length {
+        return Err(PyErr::new::<PyValueError, _>(format!(
+            "index {end} is out of bounds for dimension with length {length}"
+        )));
     }
+    let indices = indices.iter().map(|index| index - start).collect();
+    Ok((start..end + 1, Some(indices)))
 }
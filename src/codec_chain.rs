@@ -0,0 +1,33 @@
+use std::{
+    collections::HashMap,
+    sync::{Arc, Mutex, OnceLock, Weak},
+};
+
+use pyo3::{
+    exceptions::{PyRuntimeError, PyTypeError},
+    PyResult,
+};
+use zarrs::{array::CodecChain, metadata::v3::MetadataV3};
+
+use crate::utils::PyErrExt as _;
+
+/// Codec chains shared by codec pipelines with the same codec metadata JSON.
+///
+/// Codec chains are immutable, so pipelines share them regardless of their configuration and
+/// the stores they access. A codec chain is kept alive by the pipelines using it.
+static CODEC_CHAINS: OnceLock<Mutex<HashMap<String, Weak<CodecChain>>>> = OnceLock::new();
+
+/// Get the codec chain of `codecs`, parsed from the codec metadata JSON `metadata`.
+pub(crate) fn get_codec_chain(metadata: &str, codecs: &[MetadataV3]) -> PyResult<Arc<CodecChain>> {
+    let mut codec_chains = CODEC_CHAINS
+        .get_or_init(Default::default)
+        .lock()
+        .map_py_err::<PyRuntimeError>()?;
+    if let Some(codec_chain) = codec_chains.get(metadata).and_then(Weak::upgrade) {
+        return Ok(codec_chain);
+    }
+    codec_chains.retain(|_, codec_chain| codec_chain.strong_count() > 0);
+    let codec_chain = Arc::new(CodecChain::from_metadata(codecs).map_py_err::<PyTypeError>()?);
+    codec_chains.insert(metadata.to_string(), Arc::downgrade(&codec_chain));
+    Ok(codec_chain)
+}
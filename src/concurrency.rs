@@ -1,16 +1,49 @@
+use std::{collections::HashMap, num::NonZeroU64};
+
 use pyo3::{exceptions::PyRuntimeError, PyErr, PyResult};
 use zarrs::array::{
     codec::CodecOptions, concurrency::calc_concurrency_outer_inner, ArrayCodecTraits,
-    RecommendedConcurrency,
+    ChunkRepresentation, RecommendedConcurrency,
 };
 
 use crate::{chunk_item::ChunksItem, CodecPipelineImpl};
 
+/// Codec options for each chunk shape of a batch of chunks.
+///
+/// The codec concurrency of the options differs between chunk shapes, such that small chunks are
+/// not split across threads while large chunks are.
+pub struct ChunkCodecOptions {
+    codec_options: HashMap<Vec<NonZeroU64>, CodecOptions>,
+    default: CodecOptions,
+}
+
+impl ChunkCodecOptions {
+    /// Use `codec_options` for all chunk shapes.
+    pub fn new(codec_options: CodecOptions) -> Self {
+        Self {
+            codec_options: HashMap::new(),
+            default: codec_options,
+        }
+    }
+
+    /// Returns the codec concurrency of the chunk shape with the most elements.
+    pub fn concurrent_target(&self) -> usize {
+        self.default.concurrent_target()
+    }
+
+    /// Returns the codec options for a chunk with `chunk_representation`.
+    pub fn get(&self, chunk_representation: &ChunkRepresentation) -> &CodecOptions {
+        self.codec_options
+            .get(chunk_representation.shape())
+            .unwrap_or(&self.default)
+    }
+}
+
 pub trait ChunkConcurrentLimitAndCodecOptions {
     fn get_chunk_concurrent_limit_and_codec_options(
         &self,
         codec_pipeline_impl: &CodecPipelineImpl,
-    ) -> PyResult<Option<(usize, CodecOptions)>>;
+    ) -> PyResult<Option<(usize, ChunkCodecOptions)>>;
 }
 
 impl<T> ChunkConcurrentLimitAndCodecOptions for Vec<T>
@@ -20,32 +53,97 @@ where
     fn get_chunk_concurrent_limit_and_codec_options(
         &self,
         codec_pipeline_impl: &CodecPipelineImpl,
-    ) -> PyResult<Option<(usize, CodecOptions)>> {
-        let num_chunks = self.len();
-        let Some(chunk_descriptions0) = self.first() else {
-            return Ok(None);
-        };
-        let chunk_representation = chunk_descriptions0.representation();
-
-        let codec_concurrency = codec_pipeline_impl
-            .codec_chain
-            .recommended_concurrency(chunk_representation)
-            .map_err(|err| PyErr::new::<PyRuntimeError, _>(err.to_string()))?;
-
-        let min_concurrent_chunks =
-            std::cmp::min(codec_pipeline_impl.chunk_concurrent_minimum, num_chunks);
-        let max_concurrent_chunks =
-            std::cmp::max(codec_pipeline_impl.chunk_concurrent_maximum, num_chunks);
-        let (chunk_concurrent_limit, codec_concurrent_limit) = calc_concurrency_outer_inner(
-            codec_pipeline_impl.num_threads,
-            &RecommendedConcurrency::new(min_concurrent_chunks..max_concurrent_chunks),
-            &codec_concurrency,
-        );
-        let codec_options = codec_pipeline_impl
+    ) -> PyResult<Option<(usize, ChunkCodecOptions)>> {
+        chunk_concurrent_limit_and_codec_options(
+            self.iter().map(|item| item.representation()),
+            codec_pipeline_impl,
+        )
+    }
+}
+
+/// Returns the chunk concurrency and codec options of a batch of chunks with
+/// `chunk_representations`, or [`None`] if the batch is empty.
+pub(crate) fn chunk_concurrent_limit_and_codec_options<'a>(
+    chunk_representations: impl IntoIterator<Item = &'a ChunkRepresentation>,
+    codec_pipeline_impl: &CodecPipelineImpl,
+) -> PyResult<Option<(usize, ChunkCodecOptions)>> {
+    // Group the chunks by shape, chunks of the same shape have the same codec concurrency
+    let mut num_chunks = 0;
+    let mut chunk_shapes: HashMap<&[NonZeroU64], (&ChunkRepresentation, usize)> = HashMap::new();
+    for chunk_representation in chunk_representations {
+        num_chunks += 1;
+        chunk_shapes
+            .entry(chunk_representation.shape())
+            .or_insert((chunk_representation, 0))
+            .1 += 1;
+    }
+    if num_chunks == 0 {
+        return Ok(None);
+    }
+    let mut chunk_shapes = chunk_shapes
+        .into_values()
+        .map(|(chunk_representation, num_chunks)| {
+            let codec_concurrency = codec_pipeline_impl
+                .codec_chain
+                .recommended_concurrency(chunk_representation)
+                .map_err(|err| PyErr::new::<PyRuntimeError, _>(err.to_string()))?;
+            Ok((chunk_representation, num_chunks, codec_concurrency))
+        })
+        .collect::<PyResult<Vec<_>>>()?;
+
+    // The chunk concurrency is chosen for the chunk shape with the most elements in the batch,
+    // which dominates the work
+    chunk_shapes.sort_by_key(|(chunk_representation, num_chunks, _)| {
+        std::cmp::Reverse(
+            chunk_representation
+                .num_elements()
+                .saturating_mul(*num_chunks as u64),
+        )
+    });
+    let (_, _, dominant_codec_concurrency) = &chunk_shapes[0];
+    let min_concurrent_chunks =
+        std::cmp::min(codec_pipeline_impl.chunk_concurrent_minimum, num_chunks);
+    let max_concurrent_chunks =
+        std::cmp::max(codec_pipeline_impl.chunk_concurrent_maximum, num_chunks);
+    let (chunk_concurrent_limit, codec_concurrent_limit) = calc_concurrency_outer_inner(
+        codec_pipeline_impl.num_threads,
+        &RecommendedConcurrency::new(min_concurrent_chunks..max_concurrent_chunks),
+        dominant_codec_concurrency,
+    );
+
+    // Other chunk shapes use the threads left by the chunk concurrency, within the
+    // recommended codec concurrency of their codecs
+    let threads_per_chunk = std::cmp::max(
+        codec_pipeline_impl.num_threads / chunk_concurrent_limit.max(1),
+        1,
+    );
+    let with_codec_concurrency = |codec_concurrent_limit: usize| {
+        codec_pipeline_impl
             .codec_options
             .into_builder()
             .concurrent_target(codec_concurrent_limit)
-            .build();
-        Ok(Some((chunk_concurrent_limit, codec_options)))
-    }
+            .build()
+    };
+    let codec_options = chunk_shapes
+        .iter()
+        .enumerate()
+        .map(|(i, (chunk_representation, _, codec_concurrency))| {
+            let codec_concurrent_limit = if i == 0 {
+                codec_concurrent_limit
+            } else {
+                std::cmp::min(threads_per_chunk, codec_concurrency.max()).max(1)
+            };
+            (
+                chunk_representation.shape().to_vec(),
+                with_codec_concurrency(codec_concurrent_limit),
+            )
+        })
+        .collect();
+    Ok(Some((
+        chunk_concurrent_limit,
+        ChunkCodecOptions {
+            codec_options,
+            default: with_codec_concurrency(codec_concurrent_limit),
+        },
+    )))
 }
@@ -1,20 +1,26 @@
 #![warn(clippy::pedantic)]
 #![allow(clippy::module_name_repetitions)]
 
+use std::any::Any;
 use std::borrow::Cow;
 use std::collections::HashMap;
+use std::panic::{catch_unwind, AssertUnwindSafe};
 use std::ptr::NonNull;
-use std::sync::Arc;
+use std::sync::{Arc, Mutex};
+use std::time::Instant;
 
 use chunk_item::WithSubset;
-use itertools::Itertools;
 use numpy::npyffi::PyArrayObject;
 use numpy::{PyArrayDescrMethods, PyUntypedArray, PyUntypedArrayMethods};
-use pyo3::exceptions::{PyRuntimeError, PyTypeError, PyValueError};
+use pyo3::exceptions::{PyNotImplementedError, PyRuntimeError, PyTypeError, PyValueError};
+use pyo3::panic::PanicException;
 use pyo3::prelude::*;
+use pyo3::types::PyBytes;
+use pyo3::IntoPyObjectExt;
 use pyo3_stub_gen::define_stub_info_gatherer;
 use pyo3_stub_gen::derive::{gen_stub_pyclass, gen_stub_pymethods};
 use rayon::iter::{IntoParallelIterator, ParallelIterator};
+use rayon::ThreadPool;
 use rayon_iter_concurrent_limit::iter_concurrent_limit;
 use unsafe_cell_slice::UnsafeCellSlice;
 use utils::is_whole_chunk;
@@ -23,30 +29,45 @@ use zarrs::array::codec::{
 };
 use zarrs::array::{
     copy_fill_value_into, update_array_bytes, ArrayBytes, ArrayBytesFixedDisjointView, ArraySize,
-    CodecChain, FillValue,
+    BytesRepresentation, ChunkRepresentation, CodecChain, FillValue,
 };
 use zarrs::array_subset::ArraySubset;
 use zarrs::metadata::v3::MetadataV3;
-use zarrs::storage::StoreKey;
+use zarrs::storage::Bytes;
 
+mod autotune;
+mod cancellation;
+mod chunk_cache;
 mod chunk_item;
+mod codec_chain;
 mod concurrency;
 mod metadata_v2;
 mod runtime;
+mod stats;
 mod store;
 #[cfg(test)]
 mod tests;
+mod thread_pool;
 mod utils;
 
-use crate::chunk_item::ChunksItem;
-use crate::concurrency::ChunkConcurrentLimitAndCodecOptions;
+use crate::autotune::{codec_concurrent_limit, ConcurrencyAutotuner};
+use crate::cancellation::{Cancellation, CancellationToken};
+use crate::chunk_cache::{DecodedChunkCache, PartialDecoderCache};
+use crate::chunk_item::{chunk_spec_to_representation, ChunksItem};
+use crate::codec_chain::get_codec_chain;
+use crate::concurrency::{
+    chunk_concurrent_limit_and_codec_options, ChunkCodecOptions,
+    ChunkConcurrentLimitAndCodecOptions,
+};
 use crate::metadata_v2::codec_metadata_v2_to_v3;
-use crate::store::StoreManager;
+use crate::stats::StatsCollector;
+use crate::store::{PrefetchedValue, StoreManager};
+use crate::thread_pool::get_thread_pool;
 use crate::utils::{PyErrExt as _, PyUntypedArrayExt as _};
 
 // TODO: Use a OnceLock for store with get_or_try_init when stabilised?
 #[gen_stub_pyclass]
-#[pyclass]
+#[pyclass(frozen)]
 pub struct CodecPipelineImpl {
     pub(crate) stores: StoreManager,
     pub(crate) codec_chain: Arc<CodecChain>,
@@ -54,22 +75,99 @@ pub struct CodecPipelineImpl {
     pub(crate) chunk_concurrent_minimum: usize,
     pub(crate) chunk_concurrent_maximum: usize,
     pub(crate) num_threads: usize,
+    pub(crate) thread_pool: Option<Arc<ThreadPool>>,
+    pub(crate) io_concurrency: usize,
+    pub(crate) decoded_chunk_cache: DecodedChunkCache,
+    pub(crate) partial_decoder_cache: PartialDecoderCache,
+    pub(crate) partial_encoding: bool,
+    pub(crate) autotuner: Option<ConcurrencyAutotuner>,
+    pub(crate) stats: StatsCollector,
+}
+
+/// The input of a write, either an array or a constant.
+enum InputValue<'a> {
+    Array(ArrayBytes<'a>),
+    Constant(FillValue),
+}
+
+impl<'a> InputValue<'a> {
+    fn new(input_slice: &'a [u8], ndim: usize) -> Self {
+        if ndim > 0 {
+            // FIXME: Handle variable length data types, convert value to bytes and offsets
+            Self::Array(ArrayBytes::new_flen(Cow::Borrowed(input_slice)))
+        } else {
+            Self::Constant(FillValue::new(input_slice.to_vec()))
+        }
+    }
 }
 
 impl CodecPipelineImpl {
+    /// Run `op` in the thread pool of the pipeline, or the global `rayon` thread pool otherwise.
+    fn install<R: Send>(&self, op: impl FnOnce() -> R + Send) -> R {
+        match &self.thread_pool {
+            Some(thread_pool) => thread_pool.install(op),
+            None => op(),
+        }
+    }
+
+    /// Run `op` in the thread pool of the pipeline without blocking, then call `callback` with
+    /// `None` and the value returned by `op`, or the exception raised by `op` and `None`.
+    ///
+    /// A panic in `op` is raised as a `PanicException`.
+    fn spawn<T>(
+        slf: &Bound<'_, Self>,
+        callback: PyObject,
+        op: impl FnOnce(&Self) -> PyResult<T> + Send + 'static,
+    ) where
+        T: for<'py> IntoPyObject<'py> + Send + 'static,
+    {
+        let pipeline = slf.clone().unbind();
+        let task = move || {
+            let result = catch_unwind(AssertUnwindSafe(|| op(pipeline.get())))
+                .unwrap_or_else(|payload| Err(panic_exception(payload.as_ref())));
+            Python::with_gil(|py| {
+                let args = match result.and_then(|value| value.into_py_any(py)) {
+                    Ok(value) => (None, Some(value)),
+                    Err(err) => (Some(err.into_value(py)), None),
+                };
+                if let Err(err) = callback.call1(py, args) {
+                    err.write_unraisable(py, None);
+                }
+            });
+        };
+        match &slf.get().thread_pool {
+            Some(thread_pool) => thread_pool.spawn(task),
+            None => rayon::spawn(task),
+        }
+    }
+
     fn retrieve_chunk_bytes<'a, I: ChunksItem>(
         &self,
         item: &I,
         codec_chain: &CodecChain,
         codec_options: &CodecOptions,
     ) -> PyResult<ArrayBytes<'a>> {
-        let value_encoded = self.stores.get(item)?;
+        let value_encoded = self
+            .stats
+            .time(|stats| &stats.store_get_ns, || self.stores.get(item))?;
         let value_decoded = if let Some(value_encoded) = value_encoded {
+            self.stats
+                .add(|stats| &stats.bytes_fetched, value_encoded.len());
             let value_encoded: Vec<u8> = value_encoded.into(); // zero-copy in this case
-            codec_chain
-                .decode(value_encoded.into(), item.representation(), codec_options)
+            self.stats
+                .time(
+                    |stats| &stats.decode_ns,
+                    || {
+                        codec_chain.decode(
+                            value_encoded.into(),
+                            item.representation(),
+                            codec_options,
+                        )
+                    },
+                )
                 .map_py_err::<PyRuntimeError>()?
         } else {
+            self.stats.add(|stats| &stats.missing_chunks, 1);
             let array_size = ArraySize::new(
                 item.representation().data_type().size(),
                 item.representation().num_elements(),
@@ -79,6 +177,51 @@ impl CodecPipelineImpl {
         Ok(value_decoded)
     }
 
+    /// Retrieve a decoded chunk through the decoded chunk cache.
+    ///
+    /// Returns [`None`] if the cache is disabled or the chunk is too large to be cached.
+    fn retrieve_chunk_bytes_cached<I: ChunksItem>(
+        &self,
+        item: &I,
+        codec_options: &CodecOptions,
+    ) -> PyResult<Option<Arc<Vec<u8>>>> {
+        if !self.decoded_chunk_cache.admits(item) {
+            return Ok(None);
+        }
+        if let Some(chunk) = self.decoded_chunk_cache.get(item)? {
+            return Ok(Some(chunk));
+        }
+        let generation = self.decoded_chunk_cache.generation()?;
+        let chunk = self
+            .retrieve_chunk_bytes(item, &self.codec_chain, codec_options)?
+            .into_fixed()
+            .map_py_err::<PyRuntimeError>()?
+            .into_owned();
+        let chunk = Arc::new(chunk);
+        self.decoded_chunk_cache
+            .insert(item, chunk.clone(), generation)?;
+        Ok(Some(chunk))
+    }
+
+    fn partial_decoder<I: ChunksItem>(
+        &self,
+        item: &I,
+        codec_options: &CodecOptions,
+    ) -> PyResult<Arc<dyn ArrayPartialDecoderTraits>> {
+        if let Some(partial_decoder) = self.partial_decoder_cache.get(item)? {
+            return Ok(partial_decoder);
+        }
+        let input_handle = self.stores.decoder(item)?;
+        let partial_decoder = self
+            .codec_chain
+            .clone()
+            .partial_decoder(Arc::new(input_handle), item.representation(), codec_options)
+            .map_py_err::<PyValueError>()?;
+        self.partial_decoder_cache
+            .insert(item, partial_decoder.clone())?;
+        Ok(partial_decoder)
+    }
+
     fn store_chunk_bytes<I: ChunksItem>(
         &self,
         item: &I,
@@ -94,59 +237,732 @@ impl CodecPipelineImpl {
             .map_py_err::<PyValueError>()?;
 
         if value_decoded.is_fill_value(item.representation().fill_value()) {
-            self.stores.erase(item)
+            self.stores.erase(item)?;
         } else {
-            let value_encoded = codec_chain
-                .encode(value_decoded, item.representation(), codec_options)
+            let value_encoded = self
+                .stats
+                .time(
+                    |stats| &stats.encode_ns,
+                    || codec_chain.encode(value_decoded, item.representation(), codec_options),
+                )
                 .map(Cow::into_owned)
                 .map_py_err::<PyRuntimeError>()?;
 
             // Store the encoded chunk
-            self.stores.set(item, value_encoded.into())
+            self.stats
+                .add(|stats| &stats.bytes_stored, value_encoded.len());
+            self.stats.time(
+                |stats| &stats.store_set_ns,
+                || self.stores.set(item, value_encoded.into()),
+            )?;
         }
+        self.decoded_chunk_cache.invalidate(item)?;
+        self.partial_decoder_cache.invalidate(item)
     }
 
-    fn store_chunk_subset_bytes<I: ChunksItem>(
+    /// Update the subsets of a chunk, with a single retrieve and store of the chunk.
+    ///
+    /// Subsets are applied in order, so later subsets take precedence where they overlap.
+    fn store_chunk_subsets_bytes<I: ChunksItem>(
         &self,
         item: &I,
         codec_chain: &CodecChain,
-        chunk_subset_bytes: ArrayBytes,
-        chunk_subset: &ArraySubset,
+        chunk_subsets_bytes: Vec<(&ArraySubset, ArrayBytes)>,
         codec_options: &CodecOptions,
     ) -> PyResult<()> {
         let array_shape = item.representation().shape_u64();
-        if !chunk_subset.inbounds_shape(&array_shape) {
-            return Err(PyErr::new::<PyValueError, _>(format!(
-                "chunk subset ({chunk_subset}) is out of bounds for array shape ({array_shape:?})"
-            )));
-        }
         let data_type_size = item.representation().data_type().size();
-
-        if chunk_subset.start().iter().all(|&o| o == 0) && chunk_subset.shape() == array_shape {
-            // Fast path if the chunk subset spans the entire chunk, no read required
-            self.store_chunk_bytes(item, codec_chain, chunk_subset_bytes, codec_options)
-        } else {
+        for (chunk_subset, chunk_subset_bytes) in &chunk_subsets_bytes {
+            if !chunk_subset.inbounds_shape(&array_shape) {
+                return Err(PyErr::new::<PyValueError, _>(format!(
+                    "chunk subset ({chunk_subset}) is out of bounds for array shape ({array_shape:?})"
+                )));
+            }
             // Validate the chunk subset bytes
             chunk_subset_bytes
                 .validate(chunk_subset.num_elements(), data_type_size)
                 .map_py_err::<PyValueError>()?;
+        }
+
+        // Subsets preceding the last subset spanning the entire chunk are overwritten by it
+        let whole_chunk = chunk_subsets_bytes.iter().rposition(|(chunk_subset, _)| {
+            chunk_subset.start().iter().all(|&o| o == 0) && chunk_subset.shape() == array_shape
+        });
 
-            // Retrieve the chunk
-            let chunk_bytes_old = self.retrieve_chunk_bytes(item, codec_chain, codec_options)?;
+        if self.partial_encoding && whole_chunk.is_none() {
+            // Only re-encode the inner chunks of a shard intersecting the subsets
+            let input_handle = Arc::new(self.stores.decoder(item)?);
+            let output_handle = Arc::new(self.stores.encoder(item)?);
+            let partial_encoder = self
+                .codec_chain
+                .clone()
+                .partial_encoder(
+                    input_handle,
+                    output_handle,
+                    item.representation(),
+                    codec_options,
+                )
+                .map_py_err::<PyValueError>()?;
+            self.stats.add(|stats| &stats.partial_encodes, 1);
+            self.stats
+                .time(
+                    |stats| &stats.encode_ns,
+                    || partial_encoder.partial_encode(&chunk_subsets_bytes, codec_options),
+                )
+                .map_py_err::<PyRuntimeError>()?;
+            self.decoded_chunk_cache.invalidate(item)?;
+            return self.partial_decoder_cache.invalidate(item);
+        }
+        let mut chunk_subsets_bytes = chunk_subsets_bytes
+            .into_iter()
+            .skip(whole_chunk.unwrap_or_default());
+        let mut chunk_bytes = match (whole_chunk, chunk_subsets_bytes.next()) {
+            // Fast path if a chunk subset spans the entire chunk, no read required
+            (Some(_), Some((_, chunk_subset_bytes))) => chunk_subset_bytes,
+            (None, Some((chunk_subset, chunk_subset_bytes))) => {
+                // Retrieve the chunk
+                let chunk_bytes_old =
+                    self.retrieve_chunk_bytes(item, codec_chain, codec_options)?;
+                update_array_bytes(
+                    chunk_bytes_old,
+                    &array_shape,
+                    chunk_subset,
+                    &chunk_subset_bytes,
+                    data_type_size,
+                )
+                .map_py_err::<PyRuntimeError>()?
+            }
+            (_, None) => return Ok(()),
+        };
 
-            // Update the chunk
-            let chunk_bytes_new = update_array_bytes(
-                chunk_bytes_old,
+        // Update the chunk
+        for (chunk_subset, chunk_subset_bytes) in chunk_subsets_bytes {
+            chunk_bytes = update_array_bytes(
+                chunk_bytes,
                 &array_shape,
                 chunk_subset,
                 &chunk_subset_bytes,
                 data_type_size,
             )
             .map_py_err::<PyRuntimeError>()?;
+        }
+
+        // Store the updated chunk
+        self.store_chunk_bytes(item, codec_chain, chunk_bytes, codec_options)
+    }
+
+    /// Store a chunk filled with a constant value.
+    ///
+    /// The chunk is erased if the constant is the fill value. Otherwise, the encoded chunk is
+    /// reused for all chunks with the same shape in `encoded_chunks`.
+    fn store_chunk_constant<I: ChunksItem>(
+        &self,
+        item: &I,
+        constant_value: &FillValue,
+        encoded_chunks: &Mutex<HashMap<Vec<u64>, Bytes>>,
+        codec_options: &CodecOptions,
+    ) -> PyResult<()> {
+        if constant_value.as_ne_bytes() == item.representation().fill_value().as_ne_bytes() {
+            self.stores.erase(item)?;
+        } else {
+            let chunk_shape = item.representation().shape_u64();
+            let value_encoded = encoded_chunks
+                .lock()
+                .map_py_err::<PyRuntimeError>()?
+                .get(&chunk_shape)
+                .cloned();
+            let value_encoded = if let Some(value_encoded) = value_encoded {
+                value_encoded
+            } else {
+                // Encode without holding the lock, so other chunks are not blocked meanwhile.
+                // Chunks of the same shape encoded concurrently keep the first encoded value.
+                let value_decoded = ArrayBytes::new_fill_value(
+                    ArraySize::new(
+                        item.representation().data_type().size(),
+                        item.representation().num_elements(),
+                    ),
+                    constant_value,
+                );
+                let value_encoded: Bytes = self
+                    .stats
+                    .time(
+                        |stats| &stats.encode_ns,
+                        || {
+                            self.codec_chain.encode(
+                                value_decoded,
+                                item.representation(),
+                                codec_options,
+                            )
+                        },
+                    )
+                    .map(Cow::into_owned)
+                    .map_py_err::<PyRuntimeError>()?
+                    .into();
+                encoded_chunks
+                    .lock()
+                    .map_py_err::<PyRuntimeError>()?
+                    .entry(chunk_shape)
+                    .or_insert(value_encoded)
+                    .clone()
+            };
+            self.stats
+                .add(|stats| &stats.bytes_stored, value_encoded.len());
+            self.stats.time(
+                |stats| &stats.store_set_ns,
+                || self.stores.set(item, value_encoded),
+            )?;
+        }
+        self.decoded_chunk_cache.invalidate(item)?;
+        self.partial_decoder_cache.invalidate(item)
+    }
+
+    /// Retrieve chunks and decode them into `output`, an array with shape `output_shape`.
+    ///
+    /// `cancellation` is checked before each chunk and while waiting for prefetched chunks.
+    fn retrieve_chunks(
+        &self,
+        chunk_descriptions: Vec<chunk_item::WithSubset>,
+        output: UnsafeCellSlice<'_, u8>,
+        output_shape: &[u64],
+        cancellation: &Cancellation,
+    ) -> PyResult<()> {
+        // Adjust the concurrency based on the codec chain and the chunk descriptions
+        let Some((chunk_concurrent_limit, chunk_codec_options)) =
+            chunk_descriptions.get_chunk_concurrent_limit_and_codec_options(self)?
+        else {
+            return Ok(());
+        };
+        let (chunk_concurrent_limit, chunk_codec_options) = match &self.autotuner {
+            Some(autotuner) => {
+                let chunk_concurrent_limit =
+                    autotuner.chunk_concurrent_limit(chunk_concurrent_limit)?;
+                let codec_options = self
+                    .codec_options
+                    .into_builder()
+                    .concurrent_target(codec_concurrent_limit(
+                        self.num_threads,
+                        chunk_concurrent_limit,
+                    ))
+                    .build();
+                (
+                    chunk_concurrent_limit,
+                    ChunkCodecOptions::new(codec_options),
+                )
+            }
+            None => (chunk_concurrent_limit, chunk_codec_options),
+        };
+        self.record_call(chunk_concurrent_limit, &chunk_codec_options);
+        let num_chunks = chunk_descriptions.len();
+        let num_bytes = chunk_descriptions
+            .iter()
+            .map(|item| {
+                item.subset.num_elements_usize()
+                    * item.representation().data_type().fixed_size().unwrap_or(0)
+            })
+            .sum();
+
+        // Partial decoders are created on first use by any item with the same key. Creating a
+        // partial decoder can involve store I/O (e.g. reading a shard index), so this happens
+        // without the GIL and overlaps with the decoding of other chunks.
+        let partial_decoders: HashMap<_, Mutex<Option<Arc<dyn ArrayPartialDecoderTraits>>>> =
+            chunk_descriptions
+                .iter()
+                .filter(|item| !(is_whole_chunk(item) || self.decoded_chunk_cache.admits(*item)))
+                .map(|item| (item.key().clone(), Mutex::new(None)))
+                .collect();
+        let start = Instant::now();
+        // Whole chunks of stores backed by asynchronous I/O are retrieved concurrently on the
+        // tokio runtime, so the number of requests in flight is not limited by the number of
+        // threads decoding chunks. Whole chunks of memory stores are retrieved up front with a
+        // single acquisition of the GIL. Other chunks are retrieved by the threads decoding them.
+        let mut prefetched_items = Vec::new();
+        let mut other_items = Vec::new();
+        for item in &chunk_descriptions {
+            if is_whole_chunk(item)
+                && !self.decoded_chunk_cache.admits(item)
+                && self.stores.prefetches(item, self.io_concurrency)?
+            {
+                prefetched_items.push(item);
+            } else {
+                other_items.push(item);
+            }
+        }
+        let prefetched = self.stores.prefetch(
+            prefetched_items.iter().copied(),
+            self.io_concurrency,
+            cancellation,
+        )?;
+
+        let get_partial_decoder =
+            |item: &chunk_item::Basic| -> PyResult<Arc<dyn ArrayPartialDecoderTraits>> {
+                let codec_options = chunk_codec_options.get(item.representation());
+                let key = item.key();
+                let mut partial_decoder = partial_decoders
+                    .get(key)
+                    .ok_or_else(|| {
+                        PyRuntimeError::new_err(format!("Partial decoder not found for key: {key}"))
+                    })?
+                    .lock()
+                    .map_py_err::<PyRuntimeError>()?;
+                if let Some(partial_decoder) = partial_decoder.as_ref() {
+                    Ok(partial_decoder.clone())
+                } else {
+                    let new_partial_decoder = self.partial_decoder(item, codec_options)?;
+                    *partial_decoder = Some(new_partial_decoder.clone());
+                    Ok(new_partial_decoder)
+                }
+            };
+
+        let decode_chunk_subset_into = |item: &chunk_item::Basic,
+                                        chunk_subset: &ArraySubset,
+                                        output_view: &mut ArrayBytesFixedDisjointView<'_>,
+                                        prefetched: Option<PrefetchedValue>|
+         -> PyResult<()> {
+            let codec_options = chunk_codec_options.get(item.representation());
+            if let Some(chunk) = self.retrieve_chunk_bytes_cached(item, codec_options)? {
+                // Copy from the cached decoded chunk
+                let chunk_shape = item.representation().shape_u64();
+                let chunk_subset_bytes = if chunk_subset.start().iter().all(|&o| o == 0)
+                    && chunk_subset.shape() == chunk_shape
+                {
+                    Cow::Borrowed(chunk.as_slice())
+                } else {
+                    ArrayBytes::new_flen(Cow::Borrowed(chunk.as_slice()))
+                        .extract_array_subset(
+                            chunk_subset,
+                            &chunk_shape,
+                            item.representation().data_type(),
+                        )
+                        .map_py_err::<PyRuntimeError>()?
+                        .into_fixed()
+                        .map_py_err::<PyRuntimeError>()?
+                        .into_owned()
+                        .into()
+                };
+                return output_view
+                    .copy_from_slice(&chunk_subset_bytes)
+                    .map_py_err::<PyValueError>();
+            }
+
+            // See zarrs::array::Array::retrieve_chunk_subset_into
+            if chunk_subset.start().iter().all(|&o| o == 0)
+                && chunk_subset.shape() == item.representation().shape_u64()
+            {
+                // See zarrs::array::Array::retrieve_chunk_into
+                let chunk_encoded = match prefetched {
+                    Some(prefetched) => {
+                        self.stats.add(|stats| &stats.prefetched_chunks, 1);
+                        self.stats
+                            .add_duration(|stats| &stats.store_get_ns, prefetched.elapsed);
+                        if let Some(autotuner) = &self.autotuner {
+                            autotuner.record_fetch(prefetched.elapsed);
+                        }
+                        prefetched.value.map_py_err::<PyRuntimeError>()?
+                    }
+                    None => {
+                        let fetch_start = Instant::now();
+                        let chunk_encoded = self
+                            .stats
+                            .time(|stats| &stats.store_get_ns, || self.stores.get(item))?;
+                        if let Some(autotuner) = &self.autotuner {
+                            autotuner.record_fetch(fetch_start.elapsed());
+                        }
+                        chunk_encoded
+                    }
+                };
+                if let Some(chunk_encoded) = chunk_encoded {
+                    // Decode the encoded data into the output buffer
+                    self.stats
+                        .add(|stats| &stats.bytes_fetched, chunk_encoded.len());
+                    self.stats.time(
+                        |stats| &stats.decode_ns,
+                        || {
+                            self.codec_chain.decode_into(
+                                Cow::Borrowed(&chunk_encoded[..]),
+                                item.representation(),
+                                output_view,
+                                codec_options,
+                            )
+                        },
+                    )
+                } else {
+                    self.stats.add(|stats| &stats.missing_chunks, 1);
+                    // The chunk is missing, write the fill value
+                    copy_fill_value_into(
+                        item.representation().data_type(),
+                        item.representation().fill_value(),
+                        output_view,
+                    )
+                }
+            } else {
+                let partial_decoder = get_partial_decoder(item)?;
+                self.stats.add(|stats| &stats.partial_decodes, 1);
+                self.stats.time(
+                    |stats| &stats.decode_ns,
+                    || {
+                        partial_decoder.partial_decode_into(
+                            chunk_subset,
+                            output_view,
+                            codec_options,
+                        )
+                    },
+                )
+            }
+            .map_py_err::<PyValueError>()
+        };
+
+        // FIXME: the `decode_into` methods only support fixed length data types.
+        // For variable length data types, need a codepath with non `_into` methods.
+        // Collect all the subsets and copy into value on the Python side?
+        let update_chunk_subset = |item: &WithSubset, prefetched: Option<PrefetchedValue>| {
+            cancellation.check()?;
+            let chunk_item::WithSubset {
+                item,
+                subset,
+                chunk_subset,
+                indices,
+            } = item;
+            // TODO: why is data_type in `item`, it should be derived from `output`, no?
+            let data_type_size = item
+                .representation()
+                .data_type()
+                .fixed_size()
+                .ok_or("variable length data type not supported")
+                .map_py_err::<PyTypeError>()?;
+            self.stats.add(|stats| &stats.chunks, 1);
+            self.stats.add(
+                |stats| &stats.bytes_decoded,
+                subset.num_elements_usize() * data_type_size,
+            );
+
+            if let Some(indices) = indices {
+                // Decode the bounding box of an integer array or strided slice selection
+                // once, then scatter the selected elements into the output
+                let chunk_subset_shape = chunk_subset.shape().to_vec();
+                let mut chunk_subset_bytes =
+                    vec![0; chunk_subset.num_elements_usize() * data_type_size];
+                {
+                    let mut chunk_subset_view = unsafe {
+                        // SAFETY: the view spans the entire buffer, which is not shared
+                        ArrayBytesFixedDisjointView::new(
+                            UnsafeCellSlice::new(&mut chunk_subset_bytes),
+                            data_type_size,
+                            &chunk_subset_shape,
+                            ArraySubset::new_with_shape(chunk_subset_shape.clone()),
+                        )
+                        .map_py_err::<PyRuntimeError>()?
+                    };
+                    decode_chunk_subset_into(
+                        item,
+                        chunk_subset,
+                        &mut chunk_subset_view,
+                        prefetched,
+                    )?;
+                }
+                return unsafe {
+                    // SAFETY: the output selections of chunks are disjoint
+                    indices.scatter(&chunk_subset_bytes, output, data_type_size)
+                };
+            }
+
+            let mut output_view = unsafe {
+                // TODO: Is the following correct?
+                //       can we guarantee that when this function is called from Python with arbitrary arguments?
+                // SAFETY: chunks represent disjoint array subsets
+                ArrayBytesFixedDisjointView::new(
+                    output,
+                    data_type_size,
+                    output_shape,
+                    subset.clone(),
+                )
+                .map_py_err::<PyRuntimeError>()?
+            };
+            decode_chunk_subset_into(item, chunk_subset, &mut output_view, prefetched)
+        };
+
+        // Prefetched chunks are decoded in the order their retrieval completes by up to
+        // `chunk_concurrent_limit` threads, alongside the other chunks
+        let decode_prefetched_chunks = || -> PyResult<()> {
+            while let Some(value) = prefetched.next()? {
+                update_chunk_subset(prefetched_items[value.index], Some(value))?;
+            }
+            Ok(())
+        };
+        let (other_result, prefetched_result) = rayon::join(
+            || {
+                iter_concurrent_limit!(chunk_concurrent_limit, other_items, try_for_each, |item| {
+                    update_chunk_subset(item, None)
+                })
+                .inspect_err(|_| prefetched.abort())
+            },
+            || {
+                (0..chunk_concurrent_limit.min(prefetched_items.len()))
+                    .into_par_iter()
+                    .try_for_each(|_| {
+                        decode_prefetched_chunks().inspect_err(|_| prefetched.abort())
+                    })
+            },
+        );
+        other_result?;
+        prefetched_result?;
+
+        if let Some(autotuner) = &self.autotuner {
+            autotuner.record_batch(
+                chunk_concurrent_limit,
+                num_chunks,
+                num_bytes,
+                start.elapsed(),
+            )?;
+        }
+
+        Ok(())
+    }
+
+    /// Encode and store the chunks of `input`, an array with shape `input_shape`.
+    ///
+    /// `cancellation` is checked before each chunk, so chunks stored before a cancellation are
+    /// kept.
+    fn store_chunks(
+        &self,
+        chunk_descriptions: Vec<chunk_item::WithSubset>,
+        input: InputValue<'_>,
+        input_shape: &[u64],
+        cancellation: &Cancellation,
+    ) -> PyResult<()> {
+        // Adjust the concurrency based on the codec chain and the chunk descriptions
+        let Some((chunk_concurrent_limit, chunk_codec_options)) =
+            chunk_descriptions.get_chunk_concurrent_limit_and_codec_options(self)?
+        else {
+            return Ok(());
+        };
+        self.record_call(chunk_concurrent_limit, &chunk_codec_options);
+
+        if chunk_descriptions.iter().any(|item| item.indices.is_some()) {
+            return Err(PyErr::new::<PyValueError, _>(
+                "integer array and strided slice selections are not supported for writes"
+                    .to_string(),
+            ));
+        }
 
-            // Store the updated chunk
-            self.store_chunk_bytes(item, codec_chain, chunk_bytes_new, codec_options)
+        // Items updating the same chunk are grouped, so that each chunk is only retrieved and
+        // stored once. Otherwise, concurrent read-modify-writes of a chunk would race.
+        let mut chunk_groups: HashMap<_, Vec<chunk_item::WithSubset>> = HashMap::new();
+        for item in chunk_descriptions {
+            chunk_groups
+                .entry((item.store_config(), item.key().clone()))
+                .or_default()
+                .push(item);
         }
+        let chunk_groups: Vec<Vec<chunk_item::WithSubset>> = chunk_groups.into_values().collect();
+
+        let chunk_subset_bytes = |item: &chunk_item::WithSubset| match &input {
+            InputValue::Array(input) => input
+                .extract_array_subset(
+                    &item.subset,
+                    input_shape,
+                    item.item.representation().data_type(),
+                )
+                .map_py_err::<PyRuntimeError>(),
+            InputValue::Constant(constant_value) => Ok(ArrayBytes::new_fill_value(
+                ArraySize::new(
+                    item.representation().data_type().size(),
+                    item.chunk_subset.num_elements(),
+                ),
+                constant_value,
+            )),
+        };
+
+        // Constant chunks are only encoded once per chunk shape
+        let encoded_chunks = Mutex::new(HashMap::new());
+        let store_chunk = |items: Vec<chunk_item::WithSubset>| {
+            cancellation.check()?;
+            self.stats.add(|stats| &stats.chunks, 1);
+            let codec_options = chunk_codec_options.get(items[0].representation());
+            if let InputValue::Constant(constant_value) = &input {
+                if items.last().is_some_and(is_whole_chunk) {
+                    return self.store_chunk_constant(
+                        &items[0],
+                        constant_value,
+                        &encoded_chunks,
+                        codec_options,
+                    );
+                }
+            }
+            let chunk_subsets_bytes = items
+                .iter()
+                .map(|item| Ok((&item.chunk_subset, chunk_subset_bytes(item)?)))
+                .collect::<PyResult<Vec<_>>>()?;
+            self.store_chunk_subsets_bytes(
+                &items[0],
+                &self.codec_chain,
+                chunk_subsets_bytes,
+                codec_options,
+            )
+        };
+
+        iter_concurrent_limit!(
+            chunk_concurrent_limit,
+            chunk_groups,
+            try_for_each,
+            store_chunk
+        )?;
+
+        Ok(())
+    }
+
+    /// Decode encoded chunks into their outputs.
+    ///
+    /// `cancellation` is checked before each chunk.
+    fn decode_chunks(
+        &self,
+        chunks: Vec<(&[u8], Arc<ChunkRepresentation>, UnsafeCellSlice<'_, u8>)>,
+        cancellation: &Cancellation,
+    ) -> PyResult<()> {
+        let Some((chunk_concurrent_limit, chunk_codec_options)) =
+            chunk_concurrent_limit_and_codec_options(
+                chunks
+                    .iter()
+                    .map(|(_, representation, _)| representation.as_ref()),
+                self,
+            )?
+        else {
+            return Ok(());
+        };
+        self.record_call(chunk_concurrent_limit, &chunk_codec_options);
+
+        let decode_chunk = |(encoded, representation, output): (
+            &[u8],
+            Arc<ChunkRepresentation>,
+            UnsafeCellSlice<'_, u8>,
+        )| {
+            cancellation.check()?;
+            let data_type_size = representation
+                .data_type()
+                .fixed_size()
+                .ok_or("variable length data type not supported")
+                .map_py_err::<PyTypeError>()?;
+            let chunk_shape = representation.shape_u64();
+            let mut output_view = unsafe {
+                // SAFETY: the view spans the entire output, which is not shared with other chunks
+                ArrayBytesFixedDisjointView::new(
+                    output,
+                    data_type_size,
+                    &chunk_shape,
+                    ArraySubset::new_with_shape(chunk_shape.clone()),
+                )
+                .map_py_err::<PyValueError>()?
+            };
+            self.stats.add(|stats| &stats.chunks, 1);
+            self.stats.time(
+                |stats| &stats.decode_ns,
+                || {
+                    self.codec_chain
+                        .decode_into(
+                            Cow::Borrowed(encoded),
+                            &representation,
+                            &mut output_view,
+                            chunk_codec_options.get(&representation),
+                        )
+                        .map_py_err::<PyValueError>()
+                },
+            )
+        };
+        iter_concurrent_limit!(chunk_concurrent_limit, chunks, try_for_each, decode_chunk)
+    }
+
+    /// Encode chunks, returning their encoded bytes.
+    ///
+    /// `cancellation` is checked before each chunk.
+    fn encode_chunks(
+        &self,
+        chunks: Vec<(&[u8], Arc<ChunkRepresentation>)>,
+        cancellation: &Cancellation,
+    ) -> PyResult<Vec<Vec<u8>>> {
+        let Some((chunk_concurrent_limit, chunk_codec_options)) =
+            chunk_concurrent_limit_and_codec_options(
+                chunks
+                    .iter()
+                    .map(|(_, representation)| representation.as_ref()),
+                self,
+            )?
+        else {
+            return Ok(Vec::new());
+        };
+        self.record_call(chunk_concurrent_limit, &chunk_codec_options);
+
+        let encode_chunk = |(decoded, representation): (&[u8], Arc<ChunkRepresentation>)| {
+            cancellation.check()?;
+            let decoded = ArrayBytes::new_flen(Cow::Borrowed(decoded));
+            decoded
+                .validate(
+                    representation.num_elements(),
+                    representation.data_type().size(),
+                )
+                .map_py_err::<PyValueError>()?;
+            self.stats.add(|stats| &stats.chunks, 1);
+            self.stats
+                .time(
+                    |stats| &stats.encode_ns,
+                    || {
+                        self.codec_chain.encode(
+                            decoded,
+                            &representation,
+                            chunk_codec_options.get(&representation),
+                        )
+                    },
+                )
+                .map(Cow::into_owned)
+                .map_py_err::<PyRuntimeError>()
+        };
+        iter_concurrent_limit!(chunk_concurrent_limit, chunks, map, encode_chunk)
+            .collect::<PyResult<Vec<_>>>()
+    }
+
+    /// Returns the encoded bytes, representation and output of the chunks passed to `decode`.
+    fn decode_chunks_args<'a>(
+        chunks: &'a [(
+            Bound<'_, PyUntypedArray>,
+            Bound<'_, PyAny>,
+            Bound<'_, PyUntypedArray>,
+        )],
+    ) -> PyResult<Vec<(&'a [u8], Arc<ChunkRepresentation>, UnsafeCellSlice<'a, u8>)>> {
+        chunks
+            .iter()
+            .map(|(encoded, chunk_spec, output)| {
+                Ok((
+                    Self::nparray_to_slice(encoded)?,
+                    chunk_spec_to_representation(chunk_spec)?,
+                    Self::nparray_to_unsafe_cell_slice(output)?,
+                ))
+            })
+            .collect()
+    }
+
+    /// Returns the decoded bytes and representation of the chunks passed to `encode`.
+    fn encode_chunks_args<'a>(
+        chunks: &'a [(Bound<'_, PyUntypedArray>, Bound<'_, PyAny>)],
+    ) -> PyResult<Vec<(&'a [u8], Arc<ChunkRepresentation>)>> {
+        chunks
+            .iter()
+            .map(|(decoded, chunk_spec)| {
+                Ok((
+                    Self::nparray_to_slice(decoded)?,
+                    chunk_spec_to_representation(chunk_spec)?,
+                ))
+            })
+            .collect()
+    }
+
+    fn record_call(&self, chunk_concurrent_limit: usize, chunk_codec_options: &ChunkCodecOptions) {
+        self.stats.add(|stats| &stats.calls, 1);
+        self.stats.set(
+            |stats| &stats.chunk_concurrent_limit,
+            chunk_concurrent_limit,
+        );
+        self.stats.set(
+            |stats| &stats.codec_concurrent_limit,
+            chunk_codec_options.concurrent_target(),
+        );
     }
 
     fn py_untyped_array_to_array_object<'a>(
@@ -211,6 +1027,14 @@ impl CodecPipelineImpl {
         chunk_concurrent_minimum=None,
         chunk_concurrent_maximum=None,
         num_threads=None,
+        thread_pool_group=None,
+        private_thread_pool=None,
+        io_concurrency=None,
+        decoded_chunk_cache_size=None,
+        partial_decoder_cache_size=None,
+        partial_encoding=None,
+        autotune_concurrency=None,
+        collect_stats=None,
     ))]
     #[new]
     fn new(
@@ -220,11 +1044,23 @@ impl CodecPipelineImpl {
         chunk_concurrent_minimum: Option<usize>,
         chunk_concurrent_maximum: Option<usize>,
         num_threads: Option<usize>,
+        thread_pool_group: Option<String>,
+        private_thread_pool: Option<bool>,
+        io_concurrency: Option<usize>,
+        decoded_chunk_cache_size: Option<usize>,
+        partial_decoder_cache_size: Option<usize>,
+        partial_encoding: Option<bool>,
+        autotune_concurrency: Option<bool>,
+        collect_stats: Option<bool>,
     ) -> PyResult<Self> {
-        let metadata: Vec<MetadataV3> =
-            serde_json::from_str(metadata).map_py_err::<PyTypeError>()?;
-        let codec_chain =
-            Arc::new(CodecChain::from_metadata(&metadata).map_py_err::<PyTypeError>()?);
+        let codecs: Vec<MetadataV3> = serde_json::from_str(metadata).map_py_err::<PyTypeError>()?;
+        let codec_chain = get_codec_chain(metadata, &codecs)?;
+        // Partial encoding is only beneficial for sharded arrays, other codecs re-encode the
+        // entire chunk regardless
+        let partial_encoding = partial_encoding.unwrap_or(false)
+            && codecs
+                .iter()
+                .any(|codec| codec.name() == "sharding_indexed");
         let mut codec_options = CodecOptionsBuilder::new();
         if let Some(validate_checksums) = validate_checksums {
             codec_options = codec_options.validate_checksums(validate_checksums);
@@ -236,9 +1072,16 @@ impl CodecPipelineImpl {
 
         let chunk_concurrent_minimum = chunk_concurrent_minimum
             .unwrap_or(zarrs::config::global_config().chunk_concurrent_minimum());
-        let chunk_concurrent_maximum =
-            chunk_concurrent_maximum.unwrap_or(rayon::current_num_threads());
-        let num_threads = num_threads.unwrap_or(rayon::current_num_threads());
+        let thread_pool = get_thread_pool(
+            num_threads,
+            thread_pool_group,
+            private_thread_pool.unwrap_or(false),
+        )?;
+        let num_threads = thread_pool.as_ref().map_or_else(
+            || num_threads.unwrap_or(rayon::current_num_threads()),
+            |thread_pool| thread_pool.current_num_threads(),
+        );
+        let chunk_concurrent_maximum = chunk_concurrent_maximum.unwrap_or(num_threads);
 
         Ok(Self {
             stores: StoreManager::default(),
@@ -247,207 +1090,335 @@ impl CodecPipelineImpl {
             chunk_concurrent_minimum,
             chunk_concurrent_maximum,
             num_threads,
+            thread_pool,
+            io_concurrency: io_concurrency.unwrap_or(0),
+            decoded_chunk_cache: DecodedChunkCache::new(decoded_chunk_cache_size.unwrap_or(0)),
+            partial_decoder_cache: PartialDecoderCache::new(
+                partial_decoder_cache_size.unwrap_or(0),
+            ),
+            partial_encoding,
+            autotuner: autotune_concurrency
+                .unwrap_or(false)
+                .then(|| ConcurrencyAutotuner::new(chunk_concurrent_maximum)),
+            stats: StatsCollector::new(collect_stats.unwrap_or(false)),
         })
     }
 
+    /// Retrieve chunks and decode them into `value`.
+    ///
+    /// The call stops before its next chunk once `cancellation_token` is cancelled or `timeout`
+    /// seconds have passed, raising an `asyncio.CancelledError` or a `TimeoutError`.
+    #[pyo3(signature = (chunk_descriptions, value, *, cancellation_token=None, timeout=None))]
     fn retrieve_chunks_and_apply_index(
         &self,
         py: Python,
         chunk_descriptions: Vec<chunk_item::WithSubset>, // FIXME: Ref / iterable?
         value: &Bound<'_, PyUntypedArray>,
+        cancellation_token: Option<&Bound<'_, CancellationToken>>,
+        timeout: Option<f64>,
     ) -> PyResult<()> {
+        let cancellation = Cancellation::new(cancellation_token, timeout)?;
         // Get input array
         let output = Self::nparray_to_unsafe_cell_slice(value)?;
         let output_shape: Vec<u64> = value.shape_zarr()?;
 
-        // Adjust the concurrency based on the codec chain and the first chunk description
-        let Some((chunk_concurrent_limit, codec_options)) =
-            chunk_descriptions.get_chunk_concurrent_limit_and_codec_options(self)?
-        else {
-            return Ok(());
-        };
+        py.allow_threads(move || {
+            self.install(|| {
+                self.retrieve_chunks(chunk_descriptions, output, &output_shape, &cancellation)
+            })
+        })
+    }
 
-        // Assemble partial decoders ahead of time and in parallel
-        let partial_chunk_descriptions = chunk_descriptions
-            .iter()
-            .filter(|item| !(is_whole_chunk(item)))
-            .unique_by(|item| item.key())
-            .collect::<Vec<_>>();
-        let mut partial_decoder_cache: HashMap<StoreKey, Arc<dyn ArrayPartialDecoderTraits>> =
-            HashMap::new();
-        if !partial_chunk_descriptions.is_empty() {
-            let key_decoder_pairs = iter_concurrent_limit!(
-                chunk_concurrent_limit,
-                partial_chunk_descriptions,
-                map,
-                |item| {
-                    let input_handle = self.stores.decoder(item)?;
-                    let partial_decoder = self
-                        .codec_chain
-                        .clone()
-                        .partial_decoder(
-                            Arc::new(input_handle),
-                            item.representation(),
-                            &codec_options,
-                        )
-                        .map_py_err::<PyValueError>()?;
-                    Ok((item.key().clone(), partial_decoder))
-                }
+    /// Like `retrieve_chunks_and_apply_index`, without blocking the calling thread.
+    ///
+    /// The chunks are retrieved in the thread pool of the pipeline, which calls `callback` with
+    /// `None` or the raised exception, and an unused result, once done. `value` must not be used until then.
+    #[pyo3(signature = (
+        chunk_descriptions,
+        value,
+        callback,
+        *,
+        cancellation_token=None,
+        timeout=None,
+    ))]
+    fn retrieve_chunks_and_apply_index_async(
+        slf: &Bound<'_, Self>,
+        chunk_descriptions: Vec<chunk_item::WithSubset>,
+        value: &Bound<'_, PyUntypedArray>,
+        callback: PyObject,
+        cancellation_token: Option<&Bound<'_, CancellationToken>>,
+        timeout: Option<f64>,
+    ) -> PyResult<()> {
+        let cancellation = Cancellation::new(cancellation_token, timeout)?;
+        let output = unsafe {
+            // SAFETY: the array is kept alive by `array` until the chunks are retrieved
+            std::mem::transmute::<UnsafeCellSlice<'_, u8>, UnsafeCellSlice<'static, u8>>(
+                Self::nparray_to_unsafe_cell_slice(value)?,
             )
-            .collect::<PyResult<Vec<_>>>()?;
-            partial_decoder_cache.extend(key_decoder_pairs);
+        };
+        let output_shape: Vec<u64> = value.shape_zarr()?;
+        let array = value.clone().unbind();
+        Self::spawn(slf, callback, move |pipeline| {
+            let _array = array;
+            pipeline.retrieve_chunks(chunk_descriptions, output, &output_shape, &cancellation)
+        });
+        Ok(())
+    }
+
+    fn decoded_chunk_cache_info(&self) -> PyResult<HashMap<&'static str, u64>> {
+        self.decoded_chunk_cache.info()
+    }
+
+    fn partial_decoder_cache_info(&self) -> PyResult<HashMap<&'static str, u64>> {
+        self.partial_decoder_cache.info()
+    }
+
+    fn stats(&self) -> Option<HashMap<&'static str, u64>> {
+        self.stats.info()
+    }
+
+    fn reset_stats(&self) {
+        self.stats.reset();
+    }
+
+    /// Returns true if this pipeline runs in the same thread pool as `other`.
+    fn shares_thread_pool(&self, other: &Bound<'_, Self>) -> bool {
+        match (&self.thread_pool, &other.get().thread_pool) {
+            (Some(thread_pool), Some(other)) => Arc::ptr_eq(thread_pool, other),
+            // Both run in the global rayon thread pool
+            (None, None) => true,
+            _ => false,
         }
+    }
 
-        py.allow_threads(move || {
-            // FIXME: the `decode_into` methods only support fixed length data types.
-            // For variable length data types, need a codepath with non `_into` methods.
-            // Collect all the subsets and copy into value on the Python side?
-            let update_chunk_subset = |item: chunk_item::WithSubset| {
-                let chunk_item::WithSubset {
-                    item,
-                    subset,
-                    chunk_subset,
-                } = item;
-                let mut output_view = unsafe {
-                    // TODO: Is the following correct?
-                    //       can we guarantee that when this function is called from Python with arbitrary arguments?
-                    // SAFETY: chunks represent disjoint array subsets
-                    ArrayBytesFixedDisjointView::new(
-                        output,
-                        // TODO: why is data_type in `item`, it should be derived from `output`, no?
-                        item.representation()
-                            .data_type()
-                            .fixed_size()
-                            .ok_or("variable length data type not supported")
-                            .map_py_err::<PyTypeError>()?,
-                        &output_shape,
-                        subset,
-                    )
-                    .map_py_err::<PyRuntimeError>()?
-                };
+    fn autotune_concurrency_info(&self) -> PyResult<Option<HashMap<&'static str, u64>>> {
+        self.autotuner
+            .as_ref()
+            .map(|autotuner| autotuner.info(self.num_threads))
+            .transpose()
+    }
 
-                // See zarrs::array::Array::retrieve_chunk_subset_into
-                if chunk_subset.start().iter().all(|&o| o == 0)
-                    && chunk_subset.shape() == item.representation().shape_u64()
-                {
-                    // See zarrs::array::Array::retrieve_chunk_into
-                    if let Some(chunk_encoded) = self.stores.get(&item)? {
-                        // Decode the encoded data into the output buffer
-                        let chunk_encoded: Vec<u8> = chunk_encoded.into();
-                        self.codec_chain.decode_into(
-                            Cow::Owned(chunk_encoded),
-                            item.representation(),
-                            &mut output_view,
-                            &codec_options,
-                        )
-                    } else {
-                        // The chunk is missing, write the fill value
-                        copy_fill_value_into(
-                            item.representation().data_type(),
-                            item.representation().fill_value(),
-                            &mut output_view,
-                        )
-                    }
-                } else {
-                    let key = item.key();
-                    let partial_decoder = partial_decoder_cache.get(key).ok_or_else(|| {
-                        PyRuntimeError::new_err(format!("Partial decoder not found for key: {key}"))
-                    })?;
-                    partial_decoder.partial_decode_into(
-                        &chunk_subset,
-                        &mut output_view,
-                        &codec_options,
-                    )
-                }
-                .map_py_err::<PyValueError>()
-            };
+    /// Returns the size of a chunk with `chunk_spec` and `byte_length` decoded bytes once encoded.
+    ///
+    /// Raises a `ValueError` if `byte_length` is not the size of a decoded chunk with
+    /// `chunk_spec`, and a `NotImplementedError` if the encoded size depends on the chunk data,
+    /// e.g. with compression codecs.
+    fn compute_encoded_size(
+        &self,
+        byte_length: u64,
+        chunk_spec: &Bound<'_, PyAny>,
+    ) -> PyResult<u64> {
+        let chunk_representation = chunk_spec_to_representation(chunk_spec)?;
+        let decoded_size = chunk_representation
+            .data_type()
+            .fixed_size()
+            .map(|size| chunk_representation.num_elements() * size as u64);
+        if decoded_size.is_some_and(|decoded_size| decoded_size != byte_length) {
+            return Err(PyValueError::new_err(format!(
+                "byte length {byte_length} does not match the decoded chunk size"
+            )));
+        }
+        match self
+            .codec_chain
+            .compute_encoded_size(&chunk_representation)
+            .map_py_err::<PyValueError>()?
+        {
+            BytesRepresentation::FixedSize(size) => Ok(size),
+            BytesRepresentation::BoundedSize(_) | BytesRepresentation::UnboundedSize => Err(
+                PyNotImplementedError::new_err("the encoded size of the codecs is not fixed"),
+            ),
+        }
+    }
 
-            iter_concurrent_limit!(
-                chunk_concurrent_limit,
-                chunk_descriptions,
-                try_for_each,
-                update_chunk_subset
-            )?;
+    /// Decode encoded chunks into outputs.
+    ///
+    /// Each chunk is a tuple of its encoded bytes, its chunk spec, and a distinct C contiguous
+    /// output array with the shape and data type of the chunk spec. Cancellation and `timeout`
+    /// are handled as in `retrieve_chunks_and_apply_index`.
+    #[pyo3(signature = (chunks, *, cancellation_token=None, timeout=None))]
+    fn decode(
+        &self,
+        py: Python,
+        chunks: Vec<(
+            Bound<'_, PyUntypedArray>,
+            Bound<'_, PyAny>,
+            Bound<'_, PyUntypedArray>,
+        )>,
+        cancellation_token: Option<&Bound<'_, CancellationToken>>,
+        timeout: Option<f64>,
+    ) -> PyResult<()> {
+        let cancellation = Cancellation::new(cancellation_token, timeout)?;
+        let chunks = Self::decode_chunks_args(&chunks)?;
+        py.allow_threads(move || self.install(|| self.decode_chunks(chunks, &cancellation)))
+    }
 
-            Ok(())
-        })
+    /// Like `decode`, without blocking the calling thread.
+    ///
+    /// The chunks are decoded in the thread pool of the pipeline, which calls `callback` with
+    /// `None` or the raised exception, and an unused result, once done. The outputs must not be used until then.
+    #[pyo3(signature = (chunks, callback, *, cancellation_token=None, timeout=None))]
+    fn decode_async(
+        slf: &Bound<'_, Self>,
+        chunks: Vec<(
+            Bound<'_, PyUntypedArray>,
+            Bound<'_, PyAny>,
+            Bound<'_, PyUntypedArray>,
+        )>,
+        callback: PyObject,
+        cancellation_token: Option<&Bound<'_, CancellationToken>>,
+        timeout: Option<f64>,
+    ) -> PyResult<()> {
+        let cancellation = Cancellation::new(cancellation_token, timeout)?;
+        let decode_args = Self::decode_chunks_args(&chunks)?
+            .into_iter()
+            .map(|(encoded, representation, output)| unsafe {
+                // SAFETY: the arrays are kept alive by `arrays` until the chunks are decoded
+                (
+                    std::mem::transmute::<&[u8], &'static [u8]>(encoded),
+                    representation,
+                    std::mem::transmute::<UnsafeCellSlice<'_, u8>, UnsafeCellSlice<'static, u8>>(
+                        output,
+                    ),
+                )
+            })
+            .collect::<Vec<_>>();
+        let arrays: Vec<_> = chunks
+            .into_iter()
+            .map(|(encoded, _, output)| (encoded.unbind(), output.unbind()))
+            .collect();
+        Self::spawn(slf, callback, move |pipeline| {
+            let _arrays = arrays;
+            pipeline.decode_chunks(decode_args, &cancellation)
+        });
+        Ok(())
+    }
+
+    /// Encode chunks, returning their encoded bytes.
+    ///
+    /// Each chunk is a tuple of a C contiguous array with the shape and data type of its chunk
+    /// spec, and the chunk spec. Cancellation and `timeout` are handled as in
+    /// `retrieve_chunks_and_apply_index`.
+    #[pyo3(signature = (chunks, *, cancellation_token=None, timeout=None))]
+    fn encode(
+        &self,
+        py: Python,
+        chunks: Vec<(Bound<'_, PyUntypedArray>, Bound<'_, PyAny>)>,
+        cancellation_token: Option<&Bound<'_, CancellationToken>>,
+        timeout: Option<f64>,
+    ) -> PyResult<Vec<Py<PyBytes>>> {
+        let cancellation = Cancellation::new(cancellation_token, timeout)?;
+        let chunks = Self::encode_chunks_args(&chunks)?;
+        let encoded =
+            py.allow_threads(move || self.install(|| self.encode_chunks(chunks, &cancellation)))?;
+        Ok(encoded
+            .into_iter()
+            .map(|encoded| PyBytes::new(py, &encoded).unbind())
+            .collect())
     }
 
+    /// Like `encode`, without blocking the calling thread.
+    ///
+    /// The chunks are encoded in the thread pool of the pipeline, which calls `callback` with
+    /// `None` and the list of encoded bytes, or the raised exception and `None`, once done.
+    #[pyo3(signature = (chunks, callback, *, cancellation_token=None, timeout=None))]
+    fn encode_async(
+        slf: &Bound<'_, Self>,
+        chunks: Vec<(Bound<'_, PyUntypedArray>, Bound<'_, PyAny>)>,
+        callback: PyObject,
+        cancellation_token: Option<&Bound<'_, CancellationToken>>,
+        timeout: Option<f64>,
+    ) -> PyResult<()> {
+        let cancellation = Cancellation::new(cancellation_token, timeout)?;
+        let encode_args = Self::encode_chunks_args(&chunks)?
+            .into_iter()
+            .map(|(decoded, representation)| unsafe {
+                // SAFETY: the arrays are kept alive by `arrays` until the chunks are encoded
+                (
+                    std::mem::transmute::<&[u8], &'static [u8]>(decoded),
+                    representation,
+                )
+            })
+            .collect::<Vec<_>>();
+        let arrays: Vec<_> = chunks
+            .into_iter()
+            .map(|(decoded, _)| decoded.unbind())
+            .collect();
+        Self::spawn(slf, callback, move |pipeline| {
+            let _arrays = arrays;
+            // The encoded chunks are passed to `callback` as a list of bytes
+            pipeline.encode_chunks(encode_args, &cancellation)
+        });
+        Ok(())
+    }
+
+    /// Encode and store the chunks of `value`.
+    ///
+    /// Cancellation and `timeout` are handled as in `retrieve_chunks_and_apply_index`. Chunks
+    /// stored before the call stops are kept.
+    #[pyo3(signature = (chunk_descriptions, value, *, cancellation_token=None, timeout=None))]
     fn store_chunks_with_indices(
         &self,
         py: Python,
         chunk_descriptions: Vec<chunk_item::WithSubset>,
         value: &Bound<'_, PyUntypedArray>,
+        cancellation_token: Option<&Bound<'_, CancellationToken>>,
+        timeout: Option<f64>,
     ) -> PyResult<()> {
-        enum InputValue<'a> {
-            Array(ArrayBytes<'a>),
-            Constant(FillValue),
-        }
-
+        let cancellation = Cancellation::new(cancellation_token, timeout)?;
         // Get input array
-        let input_slice = Self::nparray_to_slice(value)?;
-        let input = if value.ndim() > 0 {
-            // FIXME: Handle variable length data types, convert value to bytes and offsets
-            InputValue::Array(ArrayBytes::new_flen(Cow::Borrowed(input_slice)))
-        } else {
-            InputValue::Constant(FillValue::new(input_slice.to_vec()))
-        };
+        let input = InputValue::new(Self::nparray_to_slice(value)?, value.ndim());
         let input_shape: Vec<u64> = value.shape_zarr()?;
 
-        // Adjust the concurrency based on the codec chain and the first chunk description
-        let Some((chunk_concurrent_limit, codec_options)) =
-            chunk_descriptions.get_chunk_concurrent_limit_and_codec_options(self)?
-        else {
-            return Ok(());
-        };
-
         py.allow_threads(move || {
-            let store_chunk = |item: chunk_item::WithSubset| match &input {
-                InputValue::Array(input) => {
-                    let chunk_subset_bytes = input
-                        .extract_array_subset(
-                            &item.subset,
-                            &input_shape,
-                            item.item.representation().data_type(),
-                        )
-                        .map_py_err::<PyRuntimeError>()?;
-                    self.store_chunk_subset_bytes(
-                        &item,
-                        &self.codec_chain,
-                        chunk_subset_bytes,
-                        &item.chunk_subset,
-                        &codec_options,
-                    )
-                }
-                InputValue::Constant(constant_value) => {
-                    let chunk_subset_bytes = ArrayBytes::new_fill_value(
-                        ArraySize::new(
-                            item.representation().data_type().size(),
-                            item.chunk_subset.num_elements(),
-                        ),
-                        constant_value,
-                    );
-
-                    self.store_chunk_subset_bytes(
-                        &item,
-                        &self.codec_chain,
-                        chunk_subset_bytes,
-                        &item.chunk_subset,
-                        &codec_options,
-                    )
-                }
-            };
-
-            iter_concurrent_limit!(
-                chunk_concurrent_limit,
-                chunk_descriptions,
-                try_for_each,
-                store_chunk
-            )?;
-
-            Ok(())
+            self.install(|| {
+                self.store_chunks(chunk_descriptions, input, &input_shape, &cancellation)
+            })
         })
     }
+
+    /// Like `store_chunks_with_indices`, without blocking the calling thread.
+    ///
+    /// The chunks are stored in the thread pool of the pipeline, which calls `callback` with
+    /// `None` or the raised exception, and an unused result, once done. `value` must not be modified until then.
+    #[pyo3(signature = (
+        chunk_descriptions,
+        value,
+        callback,
+        *,
+        cancellation_token=None,
+        timeout=None,
+    ))]
+    fn store_chunks_with_indices_async(
+        slf: &Bound<'_, Self>,
+        chunk_descriptions: Vec<chunk_item::WithSubset>,
+        value: &Bound<'_, PyUntypedArray>,
+        callback: PyObject,
+        cancellation_token: Option<&Bound<'_, CancellationToken>>,
+        timeout: Option<f64>,
+    ) -> PyResult<()> {
+        let cancellation = Cancellation::new(cancellation_token, timeout)?;
+        let input_slice = unsafe {
+            // SAFETY: the array is kept alive by `array` until the chunks are stored
+            std::mem::transmute::<&[u8], &'static [u8]>(Self::nparray_to_slice(value)?)
+        };
+        let input = InputValue::new(input_slice, value.ndim());
+        let input_shape: Vec<u64> = value.shape_zarr()?;
+        let array = value.clone().unbind();
+        Self::spawn(slf, callback, move |pipeline| {
+            let _array = array;
+            pipeline.store_chunks(chunk_descriptions, input, &input_shape, &cancellation)
+        });
+        Ok(())
+    }
+}
+
+fn panic_exception(payload: &(dyn Any + Send)) -> PyErr {
+    let message = payload
+        .downcast_ref::<&str>()
+        .map(ToString::to_string)
+        .or_else(|| payload.downcast_ref::<String>().cloned())
+        .unwrap_or_else(|| "panic in the codec pipeline".to_string());
+    PanicException::new_err(message)
 }
 
 /// A Python module implemented in Rust.
@@ -455,6 +1426,7 @@ impl CodecPipelineImpl {
 fn _internal(m: &Bound<'_, PyModule>) -> PyResult<()> {
     m.add("__version__", env!("CARGO_PKG_VERSION"))?;
     m.add_class::<CodecPipelineImpl>()?;
+    m.add_class::<CancellationToken>()?;
     m.add_class::<chunk_item::Basic>()?;
     m.add_class::<chunk_item::WithSubset>()?;
     m.add_function(wrap_pyfunction!(codec_metadata_v2_to_v3, m)?)?;
@@ -12,7 +12,10 @@ impl AsyncToSyncBlockOn for TokioBlockOn {
     }
 }
 
+pub fn tokio_runtime() -> &'static Runtime {
+    RUNTIME.get_or_init(|| Runtime::new().expect("Failed to create Tokio runtime"))
+}
+
 pub fn tokio_block_on() -> TokioBlockOn {
-    let runtime = RUNTIME.get_or_init(|| Runtime::new().expect("Failed to create Tokio runtime"));
-    TokioBlockOn(runtime.handle().clone())
+    TokioBlockOn(tokio_runtime().handle().clone())
 }
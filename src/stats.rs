@@ -0,0 +1,115 @@
+use std::{
+    collections::HashMap,
+    sync::atomic::{AtomicU64, Ordering},
+    time::{Duration, Instant},
+};
+
+/// Counters of the work done by a codec pipeline.
+///
+/// Times are cumulative over all threads, so they can exceed the wall time of a call.
+#[derive(Default)]
+pub(crate) struct PipelineStats {
+    pub(crate) calls: AtomicU64,
+    pub(crate) chunks: AtomicU64,
+    pub(crate) missing_chunks: AtomicU64,
+    pub(crate) partial_decodes: AtomicU64,
+    pub(crate) partial_encodes: AtomicU64,
+    /// Chunks retrieved concurrently on the tokio runtime before being decoded.
+    pub(crate) prefetched_chunks: AtomicU64,
+    pub(crate) bytes_fetched: AtomicU64,
+    pub(crate) bytes_decoded: AtomicU64,
+    pub(crate) bytes_stored: AtomicU64,
+    pub(crate) store_get_ns: AtomicU64,
+    pub(crate) store_set_ns: AtomicU64,
+    pub(crate) decode_ns: AtomicU64,
+    pub(crate) encode_ns: AtomicU64,
+    /// The chunk concurrency of the latest call.
+    pub(crate) chunk_concurrent_limit: AtomicU64,
+    /// The codec concurrency of the latest call.
+    pub(crate) codec_concurrent_limit: AtomicU64,
+}
+
+pub(crate) type Counter = fn(&PipelineStats) -> &AtomicU64;
+
+/// An optional [`PipelineStats`] collector.
+///
+/// All counters are updated with relaxed atomics, and nothing is measured if disabled.
+pub(crate) struct StatsCollector(Option<PipelineStats>);
+
+impl StatsCollector {
+    pub(crate) fn new(enabled: bool) -> Self {
+        Self(enabled.then(PipelineStats::default))
+    }
+
+    pub(crate) fn add(&self, counter: Counter, value: usize) {
+        if let Some(stats) = &self.0 {
+            counter(stats).fetch_add(value as u64, Ordering::Relaxed);
+        }
+    }
+
+    pub(crate) fn set(&self, counter: Counter, value: usize) {
+        if let Some(stats) = &self.0 {
+            counter(stats).store(value as u64, Ordering::Relaxed);
+        }
+    }
+
+    /// Add `duration` in nanoseconds to `counter`.
+    pub(crate) fn add_duration(&self, counter: Counter, duration: Duration) {
+        if let Some(stats) = &self.0 {
+            let duration = u64::try_from(duration.as_nanos()).unwrap_or(u64::MAX);
+            counter(stats).fetch_add(duration, Ordering::Relaxed);
+        }
+    }
+
+    /// Run `op`, adding its duration to `counter`.
+    pub(crate) fn time<R>(&self, counter: Counter, op: impl FnOnce() -> R) -> R {
+        let Some(stats) = &self.0 else {
+            return op();
+        };
+        let start = Instant::now();
+        let result = op();
+        let elapsed = u64::try_from(start.elapsed().as_nanos()).unwrap_or(u64::MAX);
+        counter(stats).fetch_add(elapsed, Ordering::Relaxed);
+        result
+    }
+
+    pub(crate) fn info(&self) -> Option<HashMap<&'static str, u64>> {
+        let stats = self.0.as_ref()?;
+        Some(
+            Self::COUNTERS
+                .iter()
+                .map(|(name, counter)| (*name, counter(stats).load(Ordering::Relaxed)))
+                .collect(),
+        )
+    }
+
+    pub(crate) fn reset(&self) {
+        if let Some(stats) = &self.0 {
+            for (_, counter) in Self::COUNTERS {
+                counter(stats).store(0, Ordering::Relaxed);
+            }
+        }
+    }
+
+    const COUNTERS: [(&'static str, Counter); 15] = [
+        ("calls", |stats| &stats.calls),
+        ("chunks", |stats| &stats.chunks),
+        ("missing_chunks", |stats| &stats.missing_chunks),
+        ("partial_decodes", |stats| &stats.partial_decodes),
+        ("partial_encodes", |stats| &stats.partial_encodes),
+        ("prefetched_chunks", |stats| &stats.prefetched_chunks),
+        ("bytes_fetched", |stats| &stats.bytes_fetched),
+        ("bytes_decoded", |stats| &stats.bytes_decoded),
+        ("bytes_stored", |stats| &stats.bytes_stored),
+        ("store_get_ns", |stats| &stats.store_get_ns),
+        ("store_set_ns", |stats| &stats.store_set_ns),
+        ("decode_ns", |stats| &stats.decode_ns),
+        ("encode_ns", |stats| &stats.encode_ns),
+        ("chunk_concurrent_limit", |stats| {
+            &stats.chunk_concurrent_limit
+        }),
+        ("codec_concurrent_limit", |stats| {
+            &stats.codec_concurrent_limit
+        }),
+    ];
+}
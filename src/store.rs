@@ -8,7 +8,9 @@ use pyo3::{
 };
 use pyo3_stub_gen::derive::gen_stub_pyclass_enum;
 use zarrs::storage::{
-    storage_adapter::async_to_sync::AsyncToSyncStorageAdapter, ReadableWritableListableStorage,
+    byte_range::ByteRange, storage_adapter::async_to_sync::AsyncToSyncStorageAdapter,
+    AsyncReadableWritableListableStorage, Bytes, ReadableWritableListableStorage, StorageError,
+    StoreKeys, StoreKeysPrefixes, StorePrefix,
 };
 
 use crate::{runtime::tokio_block_on, utils::PyErrExt};
@@ -16,16 +18,25 @@ use crate::{runtime::tokio_block_on, utils::PyErrExt};
 mod filesystem;
 mod http;
 mod manager;
+mod memory;
+mod s3;
+mod zip;
 
 pub use self::filesystem::FilesystemStoreConfig;
 pub use self::http::HttpStoreConfig;
-pub(crate) use self::manager::StoreManager;
+pub(crate) use self::manager::{PrefetchedValue, StoreManager};
+pub use self::memory::MemoryStoreConfig;
+pub use self::s3::S3StoreConfig;
+pub use self::zip::ZipStoreConfig;
 
 #[derive(Debug, Clone, Hash, PartialEq, Eq, PartialOrd, Ord)]
 #[gen_stub_pyclass_enum]
 pub enum StoreConfig {
     Filesystem(FilesystemStoreConfig),
     Http(HttpStoreConfig),
+    Memory(MemoryStoreConfig),
+    S3(S3StoreConfig),
+    Zip(ZipStoreConfig),
     // TODO: Add support for more stores
 }
 
@@ -38,6 +49,16 @@ impl<'py> FromPyObject<'py> for StoreConfig {
                 let root: String = store.getattr("root")?.call_method0("__str__")?.extract()?;
                 Ok(StoreConfig::Filesystem(FilesystemStoreConfig::new(root)))
             }
+            "MemoryStore" => Ok(StoreConfig::Memory(MemoryStoreConfig::new(store)?)),
+            "ZipStore" => {
+                if !store.getattr("read_only")?.extract::<bool>()? {
+                    return Err(PyErr::new::<PyNotImplementedError, _>(
+                        "zarrs-python only supports ZipStore stores opened in read mode",
+                    ));
+                }
+                let path: String = store.getattr("path")?.call_method0("__str__")?.extract()?;
+                Ok(StoreConfig::Zip(ZipStoreConfig::new(path)))
+            }
             "FsspecStore" => {
                 let fs = store.getattr("fs")?;
                 let fs_name = fs.get_type().name()?;
@@ -50,6 +71,10 @@ impl<'py> FromPyObject<'py> for StoreConfig {
                         &path,
                         &storage_options,
                     )?)),
+                    "S3FileSystem" => Ok(StoreConfig::S3(S3StoreConfig::new(
+                        &path,
+                        &storage_options,
+                    )?)),
                     _ => Err(PyErr::new::<PyNotImplementedError, _>(format!(
                         "zarrs-python does not support {fs_name} (FsspecStore) stores"
                     ))),
@@ -62,24 +87,84 @@ impl<'py> FromPyObject<'py> for StoreConfig {
     }
 }
 
+impl StoreConfig {
+    /// Returns the asynchronous store of stores backed by asynchronous I/O.
+    fn async_store(&self) -> PyResult<Option<AsyncReadableWritableListableStorage>> {
+        match self {
+            StoreConfig::Http(config) => config.try_into().map(Some),
+            StoreConfig::S3(config) => config.try_into().map(Some),
+            StoreConfig::Filesystem(_) | StoreConfig::Memory(_) | StoreConfig::Zip(_) => Ok(None),
+        }
+    }
+}
+
 impl TryFrom<&StoreConfig> for ReadableWritableListableStorage {
     type Error = PyErr;
 
     fn try_from(value: &StoreConfig) -> Result<Self, Self::Error> {
         match value {
             StoreConfig::Filesystem(config) => config.try_into(),
-            StoreConfig::Http(config) => config.try_into(),
+            StoreConfig::Http(config) => Ok(async_to_sync_store(config.try_into()?)),
+            StoreConfig::Memory(config) => config.try_into(),
+            StoreConfig::S3(config) => Ok(async_to_sync_store(config.try_into()?)),
+            StoreConfig::Zip(config) => config.try_into(),
         }
     }
 }
 
-fn opendal_builder_to_sync_store<B: Builder>(
+fn opendal_builder_to_async_store<B: Builder>(
     builder: B,
-) -> PyResult<ReadableWritableListableStorage> {
+) -> PyResult<AsyncReadableWritableListableStorage> {
     let operator = opendal::Operator::new(builder)
         .map_py_err::<PyValueError>()?
         .finish();
-    let store = Arc::new(zarrs_opendal::AsyncOpendalStore::new(operator));
-    let store = Arc::new(AsyncToSyncStorageAdapter::new(store, tokio_block_on()));
-    Ok(store)
+    Ok(Arc::new(zarrs_opendal::AsyncOpendalStore::new(operator)))
+}
+
+fn async_to_sync_store(
+    store: AsyncReadableWritableListableStorage,
+) -> ReadableWritableListableStorage {
+    Arc::new(AsyncToSyncStorageAdapter::new(store, tokio_block_on()))
+}
+
+#[allow(clippy::cast_possible_truncation)]
+fn slice_byte_ranges(value: &Bytes, byte_ranges: &[ByteRange]) -> Result<Vec<Bytes>, StorageError> {
+    let size = value.len() as u64;
+    byte_ranges
+        .iter()
+        .map(|byte_range| {
+            let (start, end) = (byte_range.start(size), byte_range.end(size));
+            if start > end || end > size {
+                Err(StorageError::Other(format!(
+                    "byte range {byte_range:?} is out of bounds for a value of {size} bytes"
+                )))
+            } else {
+                // start and end are bounded by the value length, so they fit in a usize
+                Ok(value.slice(start as usize..end as usize))
+            }
+        })
+        .collect()
+}
+
+fn list_dir_from_keys(
+    keys: StoreKeys,
+    prefix: &StorePrefix,
+) -> Result<StoreKeysPrefixes, StorageError> {
+    let mut child_keys = Vec::new();
+    let mut child_prefixes = Vec::new();
+    for key in keys {
+        let Some(relative) = key.as_str().strip_prefix(prefix.as_str()) else {
+            continue;
+        };
+        if let Some((child, _)) = relative.split_once('/') {
+            let child_prefix = StorePrefix::new(format!("{}{child}/", prefix.as_str()))
+                .map_err(|err| StorageError::Other(err.to_string()))?;
+            if !child_prefixes.contains(&child_prefix) {
+                child_prefixes.push(child_prefix);
+            }
+        } else {
+            child_keys.push(key);
+        }
+    }
+    Ok(StoreKeysPrefixes::new(child_keys, child_prefixes))
 }
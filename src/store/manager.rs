@@ -1,23 +1,74 @@
 use std::{
     collections::BTreeMap,
-    sync::{Arc, Mutex},
+    sync::{
+        atomic::{AtomicBool, Ordering},
+        Arc, Mutex,
+    },
+    time::{Duration, Instant},
 };
 
 use pyo3::{exceptions::PyRuntimeError, PyResult};
+use tokio::{
+    sync::{
+        mpsc::{self, UnboundedReceiver},
+        OwnedSemaphorePermit, Semaphore,
+    },
+    task::{JoinHandle, JoinSet},
+};
 use zarrs::{
-    array::codec::StoragePartialDecoder,
-    storage::{Bytes, MaybeBytes, ReadableWritableListableStorage, StorageHandle},
+    array::codec::{StoragePartialDecoder, StoragePartialEncoder},
+    storage::{
+        AsyncReadableStorageTraits as _, AsyncReadableWritableListableStorage, Bytes, MaybeBytes,
+        ReadableWritableListableStorage, StorageError, StorageHandle, StoreKey,
+    },
+};
+
+use crate::{
+    cancellation::Cancellation, chunk_item::ChunksItem, runtime::tokio_runtime,
+    store::PyErrExt as _,
 };
 
-use crate::{chunk_item::ChunksItem, store::PyErrExt as _};
+use super::{async_to_sync_store, memory::PyMemoryStore, StoreConfig};
+
+#[derive(Clone)]
+struct Stores {
+    sync: ReadableWritableListableStorage,
+    /// The asynchronous store of stores backed by asynchronous I/O, shared with `sync`.
+    r#async: Option<AsyncReadableWritableListableStorage>,
+    /// The store of zarr-python `MemoryStore`s, shared with `sync`.
+    memory: Option<Arc<PyMemoryStore>>,
+}
+
+impl TryFrom<&StoreConfig> for Stores {
+    type Error = pyo3::PyErr;
 
-use super::StoreConfig;
+    fn try_from(value: &StoreConfig) -> Result<Self, Self::Error> {
+        if let StoreConfig::Memory(config) = value {
+            let memory = config.store();
+            return Ok(Self {
+                sync: memory.clone(),
+                r#async: None,
+                memory: Some(memory),
+            });
+        }
+        let r#async = value.async_store()?;
+        let sync = match &r#async {
+            Some(store) => async_to_sync_store(store.clone()),
+            None => value.try_into()?,
+        };
+        Ok(Self {
+            sync,
+            r#async,
+            memory: None,
+        })
+    }
+}
 
 #[derive(Default)]
-pub(crate) struct StoreManager(Mutex<BTreeMap<StoreConfig, ReadableWritableListableStorage>>);
+pub(crate) struct StoreManager(Mutex<BTreeMap<StoreConfig, Stores>>);
 
 impl StoreManager {
-    fn store<I: ChunksItem>(&self, item: &I) -> PyResult<ReadableWritableListableStorage> {
+    fn stores<I: ChunksItem>(&self, item: &I) -> PyResult<Stores> {
         use std::collections::btree_map::Entry::{Occupied, Vacant};
         match self
             .0
@@ -30,12 +81,124 @@ impl StoreManager {
         }
     }
 
+    fn store<I: ChunksItem>(&self, item: &I) -> PyResult<ReadableWritableListableStorage> {
+        Ok(self.stores(item)?.sync)
+    }
+
     pub(crate) fn get<I: ChunksItem>(&self, item: &I) -> PyResult<MaybeBytes> {
         self.store(item)?
             .get(item.key())
             .map_py_err::<PyRuntimeError>()
     }
 
+    /// Returns true if the value of `item` can be retrieved by [`StoreManager::prefetch`].
+    ///
+    /// Values of stores backed by asynchronous I/O are prefetched if `io_concurrency` is not
+    /// zero. Values of zarr-python `MemoryStore`s are always prefetched, so that they are
+    /// retrieved with a single acquisition of the GIL.
+    pub(crate) fn prefetches<I: ChunksItem>(
+        &self,
+        item: &I,
+        io_concurrency: usize,
+    ) -> PyResult<bool> {
+        let stores = self.stores(item)?;
+        Ok(stores.memory.is_some() || (io_concurrency > 0 && stores.r#async.is_some()))
+    }
+
+    /// Start retrieving the values of `items` on the tokio runtime, with at most `io_concurrency`
+    /// values being retrieved or retrieved but not yet taken.
+    ///
+    /// Values are taken from the returned [`Prefetched`] in the order their retrieval completes,
+    /// so the threads decoding them never wait on a value while others are ready. Values of
+    /// `MemoryStore`s are retrieved before this returns, acquiring the GIL once per store. All
+    /// `items` must be prefetchable, see [`StoreManager::prefetches`].
+    pub(crate) fn prefetch<'a, I: ChunksItem + 'a>(
+        &self,
+        items: impl IntoIterator<Item = &'a I>,
+        io_concurrency: usize,
+        cancellation: &Cancellation,
+    ) -> PyResult<Prefetched> {
+        let mut memory_items: BTreeMap<StoreConfig, (Arc<PyMemoryStore>, Vec<_>)> = BTreeMap::new();
+        let mut async_items = Vec::new();
+        for (index, item) in items.into_iter().enumerate() {
+            let stores = self.stores(item)?;
+            if let Some(store) = stores.memory {
+                memory_items
+                    .entry(item.store_config())
+                    .or_insert_with(|| (store, Vec::new()))
+                    .1
+                    .push((index, item.key().clone()));
+            } else {
+                let store = stores.r#async.ok_or_else(|| {
+                    PyRuntimeError::new_err("the store is not backed by asynchronous I/O")
+                })?;
+                async_items.push((index, store, item.key().clone()));
+            }
+        }
+        let (sender, receiver) = mpsc::unbounded_channel();
+        for (store, items) in memory_items.into_values() {
+            let start = Instant::now();
+            let values = store.get_many(items.iter().map(|(_, key)| key));
+            let elapsed = start.elapsed() / u32::try_from(items.len()).unwrap_or(u32::MAX);
+            match values {
+                Ok(values) => {
+                    for ((index, _), value) in items.into_iter().zip(values) {
+                        let _ = sender.send(PrefetchedValue {
+                            index,
+                            value: Ok(value),
+                            elapsed,
+                            _permit: None,
+                        });
+                    }
+                }
+                Err(err) => {
+                    for (index, _) in items {
+                        let _ = sender.send(PrefetchedValue {
+                            index,
+                            value: Err(StorageError::Other(err.to_string())),
+                            elapsed,
+                            _permit: None,
+                        });
+                    }
+                }
+            }
+        }
+        let driver = tokio_runtime().spawn(async move {
+            let semaphore = Arc::new(Semaphore::new(io_concurrency.max(1)));
+            let mut fetches = JoinSet::new();
+            for (index, store, key) in async_items {
+                // The permit is released once the value has been taken and dropped
+                let Ok(permit) = semaphore.clone().acquire_owned().await else {
+                    break;
+                };
+                if sender.is_closed() {
+                    break;
+                }
+                let sender = sender.clone();
+                fetches.spawn(async move {
+                    let start = Instant::now();
+                    let value = store.get(&key).await;
+                    // The receiver is dropped if the call has stopped
+                    let _ = sender.send(PrefetchedValue {
+                        index,
+                        value,
+                        elapsed: start.elapsed(),
+                        _permit: Some(permit),
+                    });
+                });
+                while fetches.try_join_next().is_some() {}
+            }
+            drop(sender);
+            while fetches.join_next().await.is_some() {}
+        });
+        Ok(Prefetched {
+            receiver: Mutex::new(receiver),
+            driver,
+            aborted: AtomicBool::new(false),
+            cancellation: cancellation.clone(),
+        })
+    }
+
     pub(crate) fn set<I: ChunksItem>(&self, item: &I, value: Bytes) -> PyResult<()> {
         self.store(item)?
             .set(item.key(), value)
@@ -58,4 +221,56 @@ impl StoreManager {
             item.key().clone(),
         ))
     }
+
+    pub(crate) fn encoder<I: ChunksItem>(&self, item: &I) -> PyResult<StoragePartialEncoder> {
+        let storage_handle = Arc::new(StorageHandle::new(self.store(item)?));
+        Ok(StoragePartialEncoder::new(
+            storage_handle,
+            item.key().clone(),
+        ))
+    }
+}
+
+/// A value retrieved by [`StoreManager::prefetch`].
+pub(crate) struct PrefetchedValue {
+    /// The index of the item of the value.
+    pub(crate) index: usize,
+    pub(crate) value: Result<MaybeBytes, StorageError>,
+    /// The duration of the retrieval.
+    pub(crate) elapsed: Duration,
+    /// Released once the value has been taken and dropped, if it was retrieved asynchronously.
+    _permit: Option<OwnedSemaphorePermit>,
+}
+
+/// Values being retrieved concurrently by [`StoreManager::prefetch`].
+pub(crate) struct Prefetched {
+    receiver: Mutex<UnboundedReceiver<PrefetchedValue>>,
+    driver: JoinHandle<()>,
+    aborted: AtomicBool,
+    cancellation: Cancellation,
+}
+
+impl Prefetched {
+    /// Wait for the next retrieved value.
+    ///
+    /// Returns [`None`] once all values have been taken or retrieval has been aborted.
+    pub(crate) fn next(&self) -> PyResult<Option<PrefetchedValue>> {
+        let mut receiver = self.receiver.lock().map_py_err::<PyRuntimeError>()?;
+        if self.aborted.load(Ordering::Acquire) {
+            return Ok(None);
+        }
+        tokio_runtime().block_on(self.cancellation.run(receiver.recv()))
+    }
+
+    /// Abort the retrieval of values that were not taken, e.g. if the call failed.
+    pub(crate) fn abort(&self) {
+        self.aborted.store(true, Ordering::Release);
+        self.driver.abort();
+    }
+}
+
+impl Drop for Prefetched {
+    fn drop(&mut self) {
+        self.abort();
+    }
 }
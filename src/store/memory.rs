@@ -0,0 +1,341 @@
+use std::{
+    collections::HashMap,
+    hash::{Hash, Hasher},
+    sync::{Arc, Mutex, OnceLock},
+};
+
+use numpy::{IntoPyArray as _, PyUntypedArray};
+use pyo3::{
+    exceptions::{PyKeyError, PyRuntimeError, PyValueError},
+    pyclass,
+    types::PyAnyMethods,
+    Bound, Py, PyAny, PyErr, PyResult, Python,
+};
+use pyo3_stub_gen::derive::gen_stub_pyclass;
+use zarrs::storage::{
+    byte_range::ByteRange, store_set_partial_values, Bytes, ListableStorageTraits, MaybeBytes,
+    ReadableStorageTraits, ReadableWritableListableStorage, StorageError, StoreKey,
+    StoreKeyOffsetValue, StoreKeys, StoreKeysPrefixes, StorePrefix, WritableStorageTraits,
+};
+
+use crate::{utils::PyErrExt as _, CodecPipelineImpl};
+
+use super::{list_dir_from_keys, slice_byte_ranges};
+
+/// A zarr-python `MemoryStore`, held by a weak reference.
+///
+/// Configs of the same store are equal. Each store is identified by a process-unique id rather
+/// than its address, so a config never refers to another store allocated at the same address
+/// once its store has been dropped.
+#[derive(Debug, Clone)]
+#[gen_stub_pyclass]
+#[pyclass]
+pub struct MemoryStoreConfig {
+    /// A `weakref.ref` to the store.
+    store: Arc<Py<PyAny>>,
+    id: u64,
+}
+
+/// The ids of `MemoryStore`s, by their address.
+static MEMORY_STORE_IDS: OnceLock<Mutex<MemoryStoreIds>> = OnceLock::new();
+
+#[derive(Default)]
+struct MemoryStoreIds {
+    /// The id and a weak reference of the store at each address.
+    ids: HashMap<usize, (u64, Py<PyAny>)>,
+    next_id: u64,
+    /// The number of ids at which the ids of dropped stores are next forgotten.
+    prune_len: usize,
+}
+
+impl MemoryStoreConfig {
+    pub fn new(store: &Bound<'_, PyAny>) -> PyResult<Self> {
+        let py = store.py();
+        let address = store.as_ptr() as usize;
+        let mut ids = MEMORY_STORE_IDS
+            .get_or_init(Mutex::default)
+            .lock()
+            .map_py_err::<PyRuntimeError>()?;
+        if let Some((id, weakref)) = ids.ids.get(&address) {
+            if weakref.bind(py).call0()?.is(store) {
+                return Ok(Self {
+                    store: Arc::new(weakref.clone_ref(py)),
+                    id: *id,
+                });
+            }
+        }
+        // Forget the ids of dropped stores once the number of ids has doubled
+        if ids.ids.len() >= ids.prune_len {
+            let mut alive = HashMap::new();
+            for (address, (id, weakref)) in ids.ids.drain() {
+                if !weakref.bind(py).call0()?.is_none() {
+                    alive.insert(address, (id, weakref));
+                }
+            }
+            ids.prune_len = (alive.len() * 2).max(64);
+            ids.ids = alive;
+        }
+        let weakref = py
+            .import("weakref")?
+            .getattr("ref")?
+            .call1((store,))?
+            .unbind();
+        let id = ids.next_id;
+        ids.next_id += 1;
+        ids.ids.insert(address, (id, weakref.clone_ref(py)));
+        Ok(Self {
+            store: Arc::new(weakref),
+            id,
+        })
+    }
+
+    pub(super) fn store(&self) -> Arc<PyMemoryStore> {
+        Arc::new(PyMemoryStore {
+            store: self.store.clone(),
+        })
+    }
+}
+
+impl PartialEq for MemoryStoreConfig {
+    fn eq(&self, other: &Self) -> bool {
+        self.id == other.id
+    }
+}
+
+impl Eq for MemoryStoreConfig {}
+
+impl Hash for MemoryStoreConfig {
+    fn hash<H: Hasher>(&self, state: &mut H) {
+        self.id.hash(state);
+    }
+}
+
+impl PartialOrd for MemoryStoreConfig {
+    fn partial_cmp(&self, other: &Self) -> Option<std::cmp::Ordering> {
+        Some(self.cmp(other))
+    }
+}
+
+impl Ord for MemoryStoreConfig {
+    fn cmp(&self, other: &Self) -> std::cmp::Ordering {
+        self.id.cmp(&other.id)
+    }
+}
+
+impl TryInto<ReadableWritableListableStorage> for &MemoryStoreConfig {
+    type Error = PyErr;
+
+    fn try_into(self) -> Result<ReadableWritableListableStorage, Self::Error> {
+        Ok(self.store())
+    }
+}
+
+/// A store that reads and writes the buffers of a zarr-python `MemoryStore` in place.
+///
+/// Values are borrowed from the numpy array backing each `Buffer` on reads, and stored values
+/// are moved into a new numpy array on writes, so values are not copied through Python `bytes`.
+pub(crate) struct PyMemoryStore {
+    /// A `weakref.ref` to the store.
+    store: Arc<Py<PyAny>>,
+}
+
+/// The data of a numpy array backing a `Buffer`, borrowed by [`Bytes`].
+struct BufferData {
+    /// Keeps the array, and therefore its data, alive.
+    _array: Py<PyUntypedArray>,
+    data: *const u8,
+    len: usize,
+}
+
+// SAFETY: the data is owned by the array, which can be sent between threads, and is only read
+unsafe impl Send for BufferData {}
+
+impl AsRef<[u8]> for BufferData {
+    fn as_ref(&self) -> &[u8] {
+        // SAFETY: the array keeps its data alive. Buffers of a `MemoryStore` are replaced rather
+        // than modified in place on writes, so the data is not mutated while borrowed
+        unsafe { std::slice::from_raw_parts(self.data, self.len) }
+    }
+}
+
+fn py_err_to_storage_error(err: PyErr) -> StorageError {
+    StorageError::Other(err.to_string())
+}
+
+impl PyMemoryStore {
+    /// Returns the store, or an error if it has been dropped.
+    fn bind<'py>(&self, py: Python<'py>) -> PyResult<Bound<'py, PyAny>> {
+        let store = self.store.bind(py).call0()?;
+        if store.is_none() {
+            return Err(PyRuntimeError::new_err("the MemoryStore has been dropped"));
+        }
+        Ok(store)
+    }
+
+    /// Returns the dict of the store, or an error if it is read-only and `writable` is set.
+    fn store_dict<'py>(&self, py: Python<'py>, writable: bool) -> PyResult<Bound<'py, PyAny>> {
+        let store = self.bind(py)?;
+        if writable && store.getattr("read_only")?.extract::<bool>()? {
+            return Err(PyValueError::new_err(
+                "store was opened in read-only mode and does not support writing",
+            ));
+        }
+        store.getattr("_store_dict")
+    }
+
+    fn value_to_bytes(value: &Bound<'_, PyAny>) -> PyResult<MaybeBytes> {
+        if value.is_none() {
+            return Ok(None);
+        }
+        let array = value
+            .call_method0("as_numpy_array")?
+            .downcast_into::<PyUntypedArray>()?;
+        let (data, len) = {
+            let bytes = CodecPipelineImpl::nparray_to_slice(&array)?;
+            (bytes.as_ptr(), bytes.len())
+        };
+        if len == 0 {
+            return Ok(Some(Bytes::new()));
+        }
+        Ok(Some(Bytes::from_owner(BufferData {
+            _array: array.unbind(),
+            data,
+            len,
+        })))
+    }
+
+    fn get_impl(&self, key: &StoreKey) -> PyResult<MaybeBytes> {
+        Python::with_gil(|py| {
+            let value = self
+                .store_dict(py, false)?
+                .call_method1("get", (key.as_str(),))?;
+            Self::value_to_bytes(&value)
+        })
+    }
+
+    /// Get the values of `keys`, acquiring the GIL once.
+    pub(crate) fn get_many<'a>(
+        &self,
+        keys: impl IntoIterator<Item = &'a StoreKey>,
+    ) -> Result<Vec<MaybeBytes>, StorageError> {
+        Python::with_gil(|py| {
+            let store_dict = self.store_dict(py, false)?;
+            keys.into_iter()
+                .map(|key| Self::value_to_bytes(&store_dict.call_method1("get", (key.as_str(),))?))
+                .collect()
+        })
+        .map_err(py_err_to_storage_error)
+    }
+
+    fn set_impl(&self, key: &StoreKey, value: Bytes) -> PyResult<()> {
+        // Zero-copy if the value is not shared, e.g. if it was just encoded
+        let value = Vec::from(value);
+        Python::with_gil(|py| {
+            let store_dict = self.store_dict(py, true)?;
+            // Buffers hold arrays of signed bytes
+            let array = value.into_pyarray(py).call_method1("view", ("b",))?;
+            let buffer = py
+                .import("zarr.core.buffer.cpu")?
+                .getattr("Buffer")?
+                .call_method1("from_array_like", (array,))?;
+            store_dict.set_item(key.as_str(), buffer)
+        })
+    }
+
+    fn erase_impl(&self, key: &StoreKey) -> PyResult<()> {
+        Python::with_gil(
+            |py| match self.store_dict(py, true)?.del_item(key.as_str()) {
+                Err(err) if err.is_instance_of::<PyKeyError>(py) => Ok(()),
+                result => result,
+            },
+        )
+    }
+
+    fn keys_impl(&self) -> PyResult<StoreKeys> {
+        Python::with_gil(|py| {
+            let keys = self
+                .store_dict(py, false)?
+                .call_method0("keys")?
+                .try_iter()?
+                .map(|key| key?.extract::<String>())
+                .collect::<PyResult<Vec<_>>>()?;
+            keys.into_iter()
+                .map(|key| StoreKey::new(key).map_err(|err| PyKeyError::new_err(err.to_string())))
+                .collect()
+        })
+    }
+}
+
+impl ReadableStorageTraits for PyMemoryStore {
+    fn get(&self, key: &StoreKey) -> Result<MaybeBytes, StorageError> {
+        self.get_impl(key).map_err(py_err_to_storage_error)
+    }
+
+    fn get_partial_values_key(
+        &self,
+        key: &StoreKey,
+        byte_ranges: &[ByteRange],
+    ) -> Result<Option<Vec<Bytes>>, StorageError> {
+        self.get(key)?
+            .map(|value| slice_byte_ranges(&value, byte_ranges))
+            .transpose()
+    }
+
+    fn size_key(&self, key: &StoreKey) -> Result<Option<u64>, StorageError> {
+        Ok(self.get(key)?.map(|value| value.len() as u64))
+    }
+}
+
+impl WritableStorageTraits for PyMemoryStore {
+    fn set(&self, key: &StoreKey, value: Bytes) -> Result<(), StorageError> {
+        self.set_impl(key, value).map_err(py_err_to_storage_error)
+    }
+
+    fn set_partial_values(
+        &self,
+        key_offset_values: &[StoreKeyOffsetValue],
+    ) -> Result<(), StorageError> {
+        store_set_partial_values(self, key_offset_values)
+    }
+
+    fn erase(&self, key: &StoreKey) -> Result<(), StorageError> {
+        self.erase_impl(key).map_err(py_err_to_storage_error)
+    }
+
+    fn erase_prefix(&self, prefix: &StorePrefix) -> Result<(), StorageError> {
+        for key in self.list_prefix(prefix)? {
+            self.erase(&key)?;
+        }
+        Ok(())
+    }
+}
+
+impl ListableStorageTraits for PyMemoryStore {
+    fn list(&self) -> Result<StoreKeys, StorageError> {
+        self.keys_impl().map_err(py_err_to_storage_error)
+    }
+
+    fn list_prefix(&self, prefix: &StorePrefix) -> Result<StoreKeys, StorageError> {
+        Ok(self
+            .list()?
+            .into_iter()
+            .filter(|key| key.has_prefix(prefix))
+            .collect())
+    }
+
+    fn list_dir(&self, prefix: &StorePrefix) -> Result<StoreKeysPrefixes, StorageError> {
+        list_dir_from_keys(self.list_prefix(prefix)?, prefix)
+    }
+
+    fn size_prefix(&self, prefix: &StorePrefix) -> Result<u64, StorageError> {
+        let mut size = 0;
+        for key in self.list_prefix(prefix)? {
+            size += self.size_key(&key)?.unwrap_or_default();
+        }
+        Ok(size)
+    }
+
+    fn size(&self) -> Result<u64, StorageError> {
+        self.size_prefix(&StorePrefix::root())
+    }
+}
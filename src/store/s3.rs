@@ -0,0 +1,134 @@
+use std::{collections::HashMap, fmt};
+
+use pyo3::{
+    exceptions::PyValueError,
+    pyclass,
+    types::{PyAnyMethods, PyDict, PyDictMethods},
+    Bound, PyAny, PyErr, PyResult,
+};
+use pyo3_stub_gen::derive::gen_stub_pyclass;
+use zarrs::storage::AsyncReadableWritableListableStorage;
+
+use super::opendal_builder_to_async_store;
+
+#[derive(Clone, Hash, PartialEq, Eq, PartialOrd, Ord)]
+#[gen_stub_pyclass]
+#[pyclass]
+pub struct S3StoreConfig {
+    #[pyo3(get, set)]
+    pub bucket: String,
+    #[pyo3(get, set)]
+    pub root: String,
+    #[pyo3(get, set)]
+    pub endpoint: Option<String>,
+    #[pyo3(get, set)]
+    pub region: Option<String>,
+    #[pyo3(get, set)]
+    pub anonymous: bool,
+    access_key_id: Option<String>,
+    secret_access_key: Option<String>,
+    session_token: Option<String>,
+}
+
+// Debug is implemented manually so that credentials are not leaked into logs and error messages
+impl fmt::Debug for S3StoreConfig {
+    fn fmt(&self, f: &mut fmt::Formatter<'_>) -> fmt::Result {
+        let redacted = |secret: &Option<String>| secret.as_ref().map(|_| "<redacted>");
+        f.debug_struct("S3StoreConfig")
+            .field("bucket", &self.bucket)
+            .field("root", &self.root)
+            .field("endpoint", &self.endpoint)
+            .field("region", &self.region)
+            .field("anonymous", &self.anonymous)
+            .field("access_key_id", &redacted(&self.access_key_id))
+            .field("secret_access_key", &redacted(&self.secret_access_key))
+            .field("session_token", &redacted(&self.session_token))
+            .finish()
+    }
+}
+
+impl S3StoreConfig {
+    pub fn new(path: &str, storage_options: &HashMap<String, Bound<'_, PyAny>>) -> PyResult<Self> {
+        let (bucket, root) = path.split_once('/').unwrap_or((path, ""));
+        let mut config = Self {
+            bucket: bucket.to_string(),
+            root: format!("/{root}"),
+            endpoint: None,
+            region: None,
+            anonymous: false,
+            access_key_id: None,
+            secret_access_key: None,
+            session_token: None,
+        };
+
+        for (storage_option, value) in storage_options {
+            match storage_option.as_str() {
+                "key" => config.access_key_id = value.extract()?,
+                "secret" => config.secret_access_key = value.extract()?,
+                "token" => config.session_token = value.extract()?,
+                "anon" => config.anonymous = value.extract()?,
+                "endpoint_url" => config.endpoint = value.extract()?,
+                "client_kwargs" => {
+                    for (client_kwarg, value) in value.downcast::<PyDict>()?.iter() {
+                        let client_kwarg: String = client_kwarg.extract()?;
+                        match client_kwarg.as_str() {
+                            "endpoint_url" => config.endpoint = value.extract()?,
+                            "region_name" => config.region = value.extract()?,
+                            _ => {
+                                return Err(PyValueError::new_err(format!(
+                                    "Unsupported client_kwargs option for S3FileSystem: {client_kwarg}"
+                                )));
+                            }
+                        }
+                    }
+                }
+                // TODO: Add support for other storage options
+                "asynchronous" | "skip_instance_cache" | "use_listings_cache" => {}
+                _ => {
+                    return Err(PyValueError::new_err(format!(
+                        "Unsupported storage option for S3FileSystem: {storage_option}"
+                    )));
+                }
+            }
+        }
+
+        Ok(config)
+    }
+}
+
+impl TryInto<AsyncReadableWritableListableStorage> for &S3StoreConfig {
+    type Error = PyErr;
+
+    fn try_into(self) -> Result<AsyncReadableWritableListableStorage, Self::Error> {
+        let mut builder = opendal::services::S3::default()
+            .bucket(&self.bucket)
+            .root(&self.root);
+        if let Some(endpoint) = &self.endpoint {
+            builder = builder.endpoint(endpoint);
+        }
+        // opendal requires a region, s3fs (via botocore) falls back to us-east-1
+        let region_in_env = std::env::var_os("AWS_REGION").is_some()
+            || std::env::var_os("AWS_DEFAULT_REGION").is_some();
+        match &self.region {
+            Some(region) => builder = builder.region(region),
+            None if !region_in_env => builder = builder.region("us-east-1"),
+            None => {}
+        }
+        if self.anonymous {
+            builder = builder
+                .allow_anonymous()
+                .disable_config_load()
+                .disable_ec2_metadata();
+        }
+        if let Some(access_key_id) = &self.access_key_id {
+            builder = builder.access_key_id(access_key_id);
+        }
+        if let Some(secret_access_key) = &self.secret_access_key {
+            builder = builder.secret_access_key(secret_access_key);
+        }
+        if let Some(session_token) = &self.session_token {
+            builder = builder.session_token(session_token);
+        }
+        opendal_builder_to_async_store(builder)
+    }
+}
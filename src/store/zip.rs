@@ -0,0 +1,196 @@
+use std::{collections::HashMap, fs::File, io::Cursor, io::Read, ops::Range, sync::Arc};
+
+use ::zip::{CompressionMethod, ZipArchive};
+use pyo3::{exceptions::PyRuntimeError, pyclass, PyErr};
+use pyo3_stub_gen::derive::gen_stub_pyclass;
+use zarrs::storage::{
+    byte_range::ByteRange, Bytes, ListableStorageTraits, MaybeBytes, ReadableStorageTraits,
+    ReadableWritableListableStorage, StorageError, StoreKey, StoreKeyOffsetValue, StoreKeys,
+    StoreKeysPrefixes, StorePrefix, WritableStorageTraits,
+};
+
+use crate::utils::PyErrExt;
+
+use super::{list_dir_from_keys, slice_byte_ranges};
+
+#[derive(Debug, Clone, Hash, PartialEq, Eq, PartialOrd, Ord)]
+#[gen_stub_pyclass]
+#[pyclass]
+pub struct ZipStoreConfig {
+    #[pyo3(get, set)]
+    pub path: String,
+}
+
+impl ZipStoreConfig {
+    pub fn new(path: String) -> Self {
+        Self { path }
+    }
+}
+
+impl TryInto<ReadableWritableListableStorage> for &ZipStoreConfig {
+    type Error = PyErr;
+
+    fn try_into(self) -> Result<ReadableWritableListableStorage, Self::Error> {
+        let store = MmapZipStore::open(&self.path).map_py_err::<PyRuntimeError>()?;
+        Ok(Arc::new(store))
+    }
+}
+
+struct ZipEntry {
+    index: usize,
+    /// The byte range of the entry in the archive if it is stored without compression.
+    stored: Option<Range<usize>>,
+    size: u64,
+}
+
+/// A read-only store over a memory-mapped zip archive.
+///
+/// Entries stored without compression (the zarr-python `ZipStore` default) are served as
+/// zero-copy slices of the memory map, including byte ranges requested by partial decoders.
+struct MmapZipStore {
+    archive: ZipArchive<Cursor<Bytes>>,
+    data: Bytes,
+    entries: HashMap<String, ZipEntry>,
+}
+
+impl MmapZipStore {
+    fn open(path: &str) -> Result<Self, StorageError> {
+        let file = File::open(path)?;
+        let mmap = unsafe {
+            // SAFETY: the archive is opened read-only, zarr-python must not modify it while in use
+            memmap2::Mmap::map(&file)?
+        };
+        let data = Bytes::from_owner(mmap);
+        let mut archive = ZipArchive::new(Cursor::new(data.clone()))
+            .map_err(|err| StorageError::Other(err.to_string()))?;
+
+        let mut entries = HashMap::with_capacity(archive.len());
+        for index in 0..archive.len() {
+            let file = archive
+                .by_index_raw(index)
+                .map_err(|err| StorageError::Other(err.to_string()))?;
+            if file.is_dir() {
+                continue;
+            }
+            let stored = if file.compression() == CompressionMethod::Stored {
+                let start = usize::try_from(file.data_start())
+                    .map_err(|err| StorageError::Other(err.to_string()))?;
+                let end = usize::try_from(file.compressed_size())
+                    .map_err(|err| StorageError::Other(err.to_string()))?
+                    + start;
+                Some(start..end)
+            } else {
+                None
+            };
+            entries.insert(
+                file.name().to_string(),
+                ZipEntry {
+                    index,
+                    stored,
+                    size: file.size(),
+                },
+            );
+        }
+
+        Ok(Self {
+            archive,
+            data,
+            entries,
+        })
+    }
+
+    fn read_only_error() -> StorageError {
+        StorageError::Other("zarrs-python only supports reading from ZipStore stores".to_string())
+    }
+}
+
+impl ReadableStorageTraits for MmapZipStore {
+    fn get(&self, key: &StoreKey) -> Result<MaybeBytes, StorageError> {
+        let Some(entry) = self.entries.get(key.as_str()) else {
+            return Ok(None);
+        };
+        if let Some(stored) = &entry.stored {
+            Ok(Some(self.data.slice(stored.clone())))
+        } else {
+            // ZipArchive clones share the central directory, only the reader cursor is copied
+            let mut archive = self.archive.clone();
+            let mut file = archive
+                .by_index(entry.index)
+                .map_err(|err| StorageError::Other(err.to_string()))?;
+            let mut value = Vec::with_capacity(usize::try_from(entry.size).unwrap_or_default());
+            file.read_to_end(&mut value)?;
+            Ok(Some(value.into()))
+        }
+    }
+
+    fn get_partial_values_key(
+        &self,
+        key: &StoreKey,
+        byte_ranges: &[ByteRange],
+    ) -> Result<Option<Vec<Bytes>>, StorageError> {
+        self.get(key)?
+            .map(|value| slice_byte_ranges(&value, byte_ranges))
+            .transpose()
+    }
+
+    fn size_key(&self, key: &StoreKey) -> Result<Option<u64>, StorageError> {
+        Ok(self.entries.get(key.as_str()).map(|entry| entry.size))
+    }
+}
+
+impl WritableStorageTraits for MmapZipStore {
+    fn set(&self, _key: &StoreKey, _value: Bytes) -> Result<(), StorageError> {
+        Err(Self::read_only_error())
+    }
+
+    fn set_partial_values(
+        &self,
+        _key_offset_values: &[StoreKeyOffsetValue],
+    ) -> Result<(), StorageError> {
+        Err(Self::read_only_error())
+    }
+
+    fn erase(&self, _key: &StoreKey) -> Result<(), StorageError> {
+        Err(Self::read_only_error())
+    }
+
+    fn erase_prefix(&self, _prefix: &StorePrefix) -> Result<(), StorageError> {
+        Err(Self::read_only_error())
+    }
+}
+
+impl ListableStorageTraits for MmapZipStore {
+    fn list(&self) -> Result<StoreKeys, StorageError> {
+        self.entries
+            .keys()
+            .map(|key| {
+                StoreKey::new(key.clone()).map_err(|err| StorageError::Other(err.to_string()))
+            })
+            .collect()
+    }
+
+    fn list_prefix(&self, prefix: &StorePrefix) -> Result<StoreKeys, StorageError> {
+        Ok(self
+            .list()?
+            .into_iter()
+            .filter(|key| key.has_prefix(prefix))
+            .collect())
+    }
+
+    fn list_dir(&self, prefix: &StorePrefix) -> Result<StoreKeysPrefixes, StorageError> {
+        list_dir_from_keys(self.list_prefix(prefix)?, prefix)
+    }
+
+    fn size_prefix(&self, prefix: &StorePrefix) -> Result<u64, StorageError> {
+        Ok(self
+            .entries
+            .iter()
+            .filter(|(key, _)| key.starts_with(prefix.as_str()))
+            .map(|(_, entry)| entry.size)
+            .sum())
+    }
+
+    fn size(&self) -> Result<u64, StorageError> {
+        self.size_prefix(&StorePrefix::root())
+    }
+}
@@ -1,12 +1,19 @@
+use std::{collections::HashMap, num::NonZeroU64, sync::Arc};
+
 use pyo3::ffi::c_str;
 
 use numpy::PyUntypedArray;
 use pyo3::{
-    types::{PyAnyMethods, PyModule},
-    Bound, PyResult, Python,
+    types::{PyAnyMethods, PyModule, PyString},
+    Bound, PyAny, PyResult, Python,
 };
 
-use crate::CodecPipelineImpl;
+use zarrs::array::{ChunkRepresentation, DataType, FillValue};
+
+use crate::{
+    concurrency::chunk_concurrent_limit_and_codec_options, store::S3StoreConfig,
+    thread_pool::get_thread_pool, CodecPipelineImpl,
+};
 
 #[test]
 fn test_nparray_to_unsafe_cell_slice_empty() -> PyResult<()> {
@@ -31,3 +38,154 @@ fn test_nparray_to_unsafe_cell_slice_empty() -> PyResult<()> {
         Ok(())
     })
 }
+
+#[test]
+fn test_thread_pool_group() -> PyResult<()> {
+    let thread_pool = get_thread_pool(Some(2), Some("test".to_string()), false)?.unwrap();
+    assert_eq!(thread_pool.current_num_threads(), 2);
+    // pipelines of the same group share a thread pool
+    let shared = get_thread_pool(Some(2), Some("test".to_string()), false)?.unwrap();
+    assert!(Arc::ptr_eq(&thread_pool, &shared));
+    let shared = get_thread_pool(None, Some("test".to_string()), false)?.unwrap();
+    assert!(Arc::ptr_eq(&thread_pool, &shared));
+    // the number of threads of a group is fixed by the pipeline creating it
+    assert!(get_thread_pool(Some(3), Some("test".to_string()), false).is_err());
+    let other = get_thread_pool(Some(2), Some("other".to_string()), false)?.unwrap();
+    assert!(!Arc::ptr_eq(&thread_pool, &other));
+    assert!(get_thread_pool(None, None, false)?.is_none());
+    Ok(())
+}
+
+#[test]
+fn test_thread_pool_num_threads() -> PyResult<()> {
+    // pipelines without a group share a thread pool per number of threads
+    let thread_pool = get_thread_pool(Some(5), None, false)?.unwrap();
+    assert_eq!(thread_pool.current_num_threads(), 5);
+    let shared = get_thread_pool(Some(5), None, false)?.unwrap();
+    assert!(Arc::ptr_eq(&thread_pool, &shared));
+    let other = get_thread_pool(Some(6), None, false)?.unwrap();
+    assert!(!Arc::ptr_eq(&thread_pool, &other));
+    // the implicit group of a number of threads is distinct from named groups
+    let named = get_thread_pool(Some(5), Some("5".to_string()), false)?.unwrap();
+    assert!(!Arc::ptr_eq(&thread_pool, &named));
+    // private thread pools are never shared
+    let private = get_thread_pool(Some(5), None, true)?.unwrap();
+    assert!(!Arc::ptr_eq(&thread_pool, &private));
+    assert_eq!(private.current_num_threads(), 5);
+    Ok(())
+}
+
+#[test]
+fn test_s3_store_config_debug_redacts_credentials() -> PyResult<()> {
+    pyo3::prepare_freethreaded_python();
+    Python::with_gil(|py| {
+        let storage_options: HashMap<String, Bound<'_, PyAny>> = [
+            ("key", "access-key-id"),
+            ("secret", "secret-access-key"),
+            ("token", "session-token"),
+        ]
+        .into_iter()
+        .map(|(option, value)| (option.to_string(), PyString::new(py, value).into_any()))
+        .collect();
+        let config = S3StoreConfig::new("bucket/root", &storage_options)?;
+        let debug = format!("{config:?}");
+        assert!(debug.contains("bucket"));
+        assert!(!debug.contains("access-key-id"));
+        assert!(!debug.contains("secret-access-key"));
+        assert!(!debug.contains("session-token"));
+        Ok(())
+    })
+}
+
+fn sharded_codec_pipeline_impl(num_threads: usize) -> PyResult<CodecPipelineImpl> {
+    let metadata = r#"[{
+        "name": "sharding_indexed",
+        "configuration": {
+            "chunk_shape": [2, 2],
+            "codecs": [{"name": "bytes", "configuration": {"endian": "little"}}],
+            "index_codecs": [{"name": "bytes", "configuration": {"endian": "little"}}],
+            "index_location": "end"
+        }
+    }]"#;
+    CodecPipelineImpl::new(
+        metadata,
+        None,
+        None,
+        Some(1),
+        Some(num_threads),
+        Some(num_threads),
+        None,
+        None,
+        None,
+        None,
+        None,
+        None,
+        None,
+        None,
+    )
+}
+
+fn chunk_representation(shape: &[u64]) -> ChunkRepresentation {
+    ChunkRepresentation::new(
+        shape
+            .iter()
+            .map(|&size| NonZeroU64::new(size).unwrap())
+            .collect(),
+        DataType::UInt8,
+        FillValue::from(0u8),
+    )
+    .unwrap()
+}
+
+#[test]
+fn test_shared_codec_chain() -> PyResult<()> {
+    let codec_pipeline_impl = sharded_codec_pipeline_impl(8)?;
+    let other = sharded_codec_pipeline_impl(2)?;
+    assert!(Arc::ptr_eq(
+        &codec_pipeline_impl.codec_chain,
+        &other.codec_chain
+    ));
+    Ok(())
+}
+
+#[test]
+fn test_chunk_concurrent_limit_and_codec_options_single_shape() -> PyResult<()> {
+    let codec_pipeline_impl = sharded_codec_pipeline_impl(8)?;
+    // Shards of 4 inner chunks: 4 threads decode the inner chunks of each of 2 shards
+    let chunks = vec![chunk_representation(&[4, 4]); 16];
+    let (chunk_concurrent_limit, codec_options) =
+        chunk_concurrent_limit_and_codec_options(&chunks, &codec_pipeline_impl)?.unwrap();
+    assert_eq!(chunk_concurrent_limit, 2);
+    assert_eq!(codec_options.concurrent_target(), 4);
+    assert_eq!(codec_options.get(&chunks[0]).concurrent_target(), 4);
+
+    assert!(
+        chunk_concurrent_limit_and_codec_options(&chunks[..0], &codec_pipeline_impl)?.is_none()
+    );
+    Ok(())
+}
+
+#[test]
+fn test_chunk_concurrent_limit_and_codec_options_mixed_shapes() -> PyResult<()> {
+    let codec_pipeline_impl = sharded_codec_pipeline_impl(8)?;
+    // Full shards of 16 inner chunks dominate the batch, edge shards have 4 inner chunks
+    let full = chunk_representation(&[8, 8]);
+    let edge = chunk_representation(&[8, 2]);
+    let chunks = [
+        full.clone(),
+        edge.clone(),
+        full.clone(),
+        edge.clone(),
+        full.clone(),
+        edge.clone(),
+    ];
+    let (chunk_concurrent_limit, codec_options) =
+        chunk_concurrent_limit_and_codec_options(&chunks, &codec_pipeline_impl)?.unwrap();
+    // All threads decode the inner chunks of one full shard at a time
+    assert_eq!(chunk_concurrent_limit, 1);
+    assert_eq!(codec_options.concurrent_target(), 8);
+    assert_eq!(codec_options.get(&full).concurrent_target(), 8);
+    // Edge shards are limited to their number of inner chunks
+    assert_eq!(codec_options.get(&edge).concurrent_target(), 4);
+    Ok(())
+}
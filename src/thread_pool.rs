@@ -0,0 +1,88 @@
+use std::{
+    collections::HashMap,
+    sync::{Arc, Mutex, OnceLock, Weak},
+};
+
+use pyo3::{
+    exceptions::{PyRuntimeError, PyValueError},
+    PyResult,
+};
+use rayon::{ThreadPool, ThreadPoolBuilder};
+
+use crate::utils::PyErrExt as _;
+
+/// A group of codec pipelines sharing a thread pool.
+#[derive(Clone, PartialEq, Eq, Hash)]
+enum ThreadPoolGroup {
+    /// A group configured by name.
+    Named(String),
+    /// The pipelines with a number of threads but no group.
+    NumThreads(usize),
+}
+
+/// Thread pools shared by codec pipelines with the same thread pool group.
+///
+/// A group is kept alive by the pipelines using it, and is recreated on next use once they are
+/// all dropped.
+static THREAD_POOL_GROUPS: OnceLock<Mutex<HashMap<ThreadPoolGroup, Weak<ThreadPool>>>> =
+    OnceLock::new();
+
+/// Get a thread pool for a codec pipeline.
+///
+/// Returns [`None`] if neither the number of threads nor a group is configured, in which case the
+/// global `rayon` thread pool is used. Pipelines with a number of threads but no group share a
+/// thread pool with that number of threads, unless `private` is set, in which case the pipeline
+/// gets a thread pool of its own regardless of its group. The number of threads of a named group
+/// is set by the pipeline that creates it, and later pipelines requesting a different number of
+/// threads raise a `ValueError`.
+pub(crate) fn get_thread_pool(
+    num_threads: Option<usize>,
+    group: Option<String>,
+    private: bool,
+) -> PyResult<Option<Arc<ThreadPool>>> {
+    let group = match (group, num_threads) {
+        _ if private => {
+            return build_thread_pool(num_threads.unwrap_or(rayon::current_num_threads()), "zarrs")
+                .map(Some);
+        }
+        (Some(group), _) => ThreadPoolGroup::Named(group),
+        (None, Some(num_threads)) => ThreadPoolGroup::NumThreads(num_threads),
+        (None, None) => return Ok(None),
+    };
+    let mut groups = THREAD_POOL_GROUPS
+        .get_or_init(Default::default)
+        .lock()
+        .map_py_err::<PyRuntimeError>()?;
+    if let Some(thread_pool) = groups.get(&group).and_then(Weak::upgrade) {
+        if let (ThreadPoolGroup::Named(name), Some(num_threads)) = (&group, num_threads) {
+            if num_threads != thread_pool.current_num_threads() {
+                return Err(PyValueError::new_err(format!(
+                    "thread pool group {name} has {} threads, but {num_threads} were requested",
+                    thread_pool.current_num_threads()
+                )));
+            }
+        }
+        return Ok(Some(thread_pool));
+    }
+    groups.retain(|_, thread_pool| thread_pool.strong_count() > 0);
+    let (num_threads, thread_name) = match &group {
+        ThreadPoolGroup::Named(name) => (
+            num_threads.unwrap_or(rayon::current_num_threads()),
+            format!("zarrs-{name}"),
+        ),
+        ThreadPoolGroup::NumThreads(num_threads) => (*num_threads, "zarrs".to_string()),
+    };
+    let thread_pool = build_thread_pool(num_threads, &thread_name)?;
+    groups.insert(group, Arc::downgrade(&thread_pool));
+    Ok(Some(thread_pool))
+}
+
+fn build_thread_pool(num_threads: usize, thread_name: &str) -> PyResult<Arc<ThreadPool>> {
+    let thread_name = thread_name.to_string();
+    let thread_pool = ThreadPoolBuilder::new()
+        .num_threads(num_threads)
+        .thread_name(move |index| format!("{thread_name}-{index}"))
+        .build()
+        .map_py_err::<PyRuntimeError>()?;
+    Ok(Arc::new(thread_pool))
+}
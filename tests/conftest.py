@@ -50,7 +50,7 @@ async def parse_store(
     raise AssertionError
 
 
-@pytest.fixture(params=["local"])
+@pytest.fixture(params=["local", "memory"])
 async def store(request: pytest.FixtureRequest, tmpdir) -> Store:
     param = request.param
     return await parse_store(param, str(tmpdir))
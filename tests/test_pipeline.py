@@ -1,8 +1,11 @@
 #!/usr/bin/env python3
 
+import asyncio
 import operator
 import pickle
 import tempfile
+import threading
+import time
 from collections.abc import Callable
 from contextlib import contextmanager
 from functools import reduce
@@ -13,9 +16,13 @@ from types import EllipsisType
 import numpy as np
 import pytest
 import zarr
-from zarr.storage import LocalStore
+from zarr.core.buffer import default_buffer_prototype
+from zarr.core.codec_pipeline import BatchedCodecPipeline
+from zarr.storage import LocalStore, MemoryStore
 
-import zarrs  # noqa: F401
+import zarrs
+from zarrs._internal import CancellationToken, WithSubset
+from zarrs.pipeline import run_in_thread_pool
 
 axis_size_ = 10
 chunk_size_ = axis_size_ // 2
@@ -185,6 +192,20 @@ def test_constant(arr: zarr.Array):
     assert np.all(arr[:] == 42)
 
 
+def test_constant_chunks(tmp_path: Path):
+    arr = gen_arr(fill_value_, tmp_path, 2, 3)
+    chunk_dir = tmp_path / ".zarr" / "c"
+    arr[:] = 42
+    chunks = sorted(chunk_dir.rglob("*"))
+    chunks = [chunk.read_bytes() for chunk in chunks if chunk.is_file()]
+    assert len(chunks) == 4
+    # every chunk has the same encoded bytes
+    assert all(chunk == chunks[0] for chunk in chunks)
+    arr[:] = fill_value_
+    assert not any(chunk.is_file() for chunk in chunk_dir.rglob("*"))
+    assert np.all(arr[:] == fill_value_)
+
+
 def test_singleton(arr: zarr.Array):
     singleton_index = (1,) * len(arr.shape)
     non_singleton_index = (0,) * len(arr.shape)
@@ -234,6 +255,362 @@ def test_pickle(arr: zarr.Array, tmp_path: Path):
     assert (arr[:] == expected).all()
 
 
+def test_impl_not_shared(tmp_path: Path):
+    with zarr.config.set({"codec_pipeline.collect_stats": True}):
+        arr = gen_arr(fill_value_, tmp_path, 2, 3)
+        pipeline = arr._async_array.codec_pipeline
+        unpickled = pickle.loads(pickle.dumps(pipeline))
+    # pipelines only share their codec chain and thread pool, not their stores, caches
+    # or statistics
+    assert unpickled.impl is not pipeline.impl
+    arr[:] = full_array(arr.shape)
+    assert pipeline.impl.stats()["calls"] == 1
+    assert unpickled.impl.stats()["calls"] == 0
+
+
+@pytest.mark.parametrize("thread_pool_group", [None, "test"])
+@pytest.mark.parametrize("private_thread_pool", [False, True])
+def test_thread_pool(
+    tmp_path: Path, *, thread_pool_group: str | None, private_thread_pool: bool
+):
+    with zarr.config.set(
+        {
+            "threading.max_workers": 2,
+            "codec_pipeline.thread_pool_group": thread_pool_group,
+            "codec_pipeline.private_thread_pool": private_thread_pool,
+        }
+    ):
+        arr = gen_arr(fill_value_, tmp_path, 2, 3)
+        other = zarr.open_array(arr.store)
+    # pipelines share a thread pool unless they have private thread pools
+    assert arr._async_array.codec_pipeline.impl.shares_thread_pool(
+        other._async_array.codec_pipeline.impl
+    ) == (not private_thread_pool)
+    stored_values = full_array(arr.shape)
+    arr[:] = stored_values
+    assert np.array_equal(arr[:], stored_values)
+
+
+async def test_concurrent_reads(tmp_path: Path):
+    arr = gen_arr(fill_value_, tmp_path, 2, 3)._async_array
+    stored_values = full_array(arr.shape)
+    await arr.setitem(slice(None), stored_values)
+    results = await asyncio.gather(*(arr.getitem(slice(None)) for _ in range(64)))
+    for result in results:
+        assert np.array_equal(result, stored_values)
+
+
+async def test_read_error(tmp_path: Path):
+    arr = gen_arr(fill_value_, tmp_path, 1, 3)._async_array
+    await arr.setitem(slice(None), full_array(arr.shape))
+    (tmp_path / ".zarr" / "c" / "0").write_bytes(b"not a blosc chunk")
+    with pytest.raises(ValueError):  # noqa: PT011
+        await arr.getitem(slice(None))
+
+
+def test_decoded_chunk_cache(tmp_path: Path):
+    with zarr.config.set({"codec_pipeline.decoded_chunk_cache_size": 2**20}):
+        arr = gen_arr(fill_value_, tmp_path, 2, 3)
+    impl = arr._async_array.codec_pipeline.impl
+    stored_values = full_array(arr.shape)
+    arr[:] = stored_values
+    assert np.all(arr[1:4, 2:9] == stored_values[1:4, 2:9])
+    assert np.all(arr[1:4, 2:9] == stored_values[1:4, 2:9])
+    info = impl.decoded_chunk_cache_info()
+    assert info["misses"] == 2
+    assert info["hits"] == 2
+    assert 0 < info["size"] <= info["capacity"]
+
+    # writes invalidate cached chunks
+    arr[1:4, 2:9] = 0
+    assert np.all(arr[1:4, 2:9] == 0)
+
+
+def test_stats(tmp_path: Path):
+    with zarr.config.set({"codec_pipeline.collect_stats": True}):
+        arr = gen_arr(fill_value_, tmp_path, 2, 3)
+    impl = arr._async_array.codec_pipeline.impl
+    stored_values = full_array(arr.shape)
+    arr[:chunk_size_] = stored_values[:chunk_size_]
+    stats = impl.stats()
+    assert stats["calls"] == 1
+    assert stats["chunks"] == 2
+    assert stats["bytes_stored"] > 0
+    assert stats["chunk_concurrent_limit"] >= 1
+
+    impl.reset_stats()
+    result = arr[:]
+    assert np.array_equal(result[:chunk_size_], stored_values[:chunk_size_])
+    assert np.all(result[chunk_size_:] == fill_value_)
+    stats = impl.stats()
+    assert stats["calls"] == 1
+    assert stats["chunks"] == 4
+    assert stats["missing_chunks"] == 2
+    assert stats["bytes_decoded"] == result.nbytes
+    assert stats["bytes_fetched"] > 0
+    assert stats["prefetched_chunks"] == 0
+
+
+def test_memory_store():
+    store = MemoryStore()
+    with zarr.config.set({"codec_pipeline.collect_stats": True}):
+        arr = zarr.create(
+            (axis_size_, axis_size_),
+            store=store,
+            chunks=(chunk_size_, chunk_size_),
+            dtype=np.int16,
+            fill_value=fill_value_,
+        )
+    impl = arr._async_array.codec_pipeline.impl
+    stored_values = full_array(arr.shape)
+    arr[:] = stored_values
+    impl.reset_stats()
+    assert np.array_equal(arr[:], stored_values)
+    # whole chunks are retrieved with a single acquisition of the GIL
+    assert impl.stats()["prefetched_chunks"] == 4
+
+    # writes respect the read-only mode of the store
+    read_only_store = MemoryStore(store_dict=store._store_dict, read_only=True)
+    read_only_arr = zarr.open_array(read_only_store)
+    assert np.array_equal(read_only_arr[:], stored_values)
+    with pytest.raises(RuntimeError, match="read-only"):
+        read_only_arr[:] = 0
+    assert np.array_equal(arr[:], stored_values)
+
+
+def test_stats_disabled(arr: zarr.Array):
+    assert arr._async_array.codec_pipeline.impl.stats() is None
+
+
+def test_autotune_concurrency(tmp_path: Path):
+    with zarr.config.set(
+        {
+            "threading.max_workers": 4,
+            "codec_pipeline.chunk_concurrent_maximum": 4,
+            "codec_pipeline.autotune_concurrency": True,
+        }
+    ):
+        arr = gen_arr(fill_value_, tmp_path, 2, 3)
+    impl = arr._async_array.codec_pipeline.impl
+    stored_values = full_array(arr.shape)
+    arr[:] = stored_values
+    for _ in range(5):
+        assert np.array_equal(arr[:], stored_values)
+    info = impl.autotune_concurrency_info()
+    assert info["batches"] == 5
+    assert 1 <= info["chunk_concurrent_limit"] <= 4
+    assert 1 <= info["best_chunk_concurrent_limit"] <= 4
+    assert info["codec_concurrent_limit"] >= 1
+
+
+def test_autotune_concurrency_disabled(arr: zarr.Array):
+    assert arr._async_array.codec_pipeline.impl.autotune_concurrency_info() is None
+
+
+@pytest.mark.parametrize(
+    ("index", "indexing_method"),
+    [
+        pytest.param(
+            (np.array([7, 1, 3, 8]), np.array([9, 0, 4])),
+            lambda x: x.oindex,
+            id="oindex_unsorted",
+        ),
+        pytest.param(
+            (np.array([6, 0, 0, 9]), slice(2, 8)),
+            lambda x: x.oindex,
+            id="oindex_duplicates_and_slice",
+        ),
+        pytest.param(
+            (np.array([8, 2, 5]), 3), lambda x: x.oindex, id="oindex_dropped_axis"
+        ),
+        pytest.param((np.array([9, 0, 4, 5, 1]),), lambda x: x.vindex, id="vindex_1d"),
+    ],
+)
+def test_integer_array_read_native(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, index, indexing_method
+):
+    arr = gen_arr(fill_value_, tmp_path, len(index), 3)
+    stored_values = full_array(arr.shape)
+    arr[:] = stored_values
+
+    async def python_read(*args, **kwargs):
+        raise AssertionError("read fell back to the Python codec pipeline")
+
+    monkeypatch.setattr(BatchedCodecPipeline, "read", python_read)
+    # a single dimension is indexed identically by oindex and vindex
+    expected = stored_values[
+        np.ix_(*(np.atleast_1d(np.arange(axis_size_)[i]) for i in index))
+    ]
+    res = indexing_method(arr)[index]
+    assert np.array_equal(res, expected.reshape(res.shape))
+
+
+@pytest.mark.parametrize(
+    "index",
+    [
+        pytest.param((slice(None, None, 3), slice(1, None, 4)), id="strided"),
+        pytest.param((2, slice(None, None, 2)), id="int_and_strided"),
+        pytest.param((slice(1, 9, 7), slice(None)), id="strided_and_full"),
+    ],
+)
+def test_strided_slice_read_native(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, index
+):
+    arr = gen_arr(fill_value_, tmp_path, len(index), 3)
+    stored_values = full_array(arr.shape)
+    arr[:] = stored_values
+
+    async def python_read(*args, **kwargs):
+        raise AssertionError("read fell back to the Python codec pipeline")
+
+    monkeypatch.setattr(BatchedCodecPipeline, "read", python_read)
+    assert np.array_equal(arr[index], stored_values[index])
+
+
+def test_strided_slice_write(arr: zarr.Array):
+    stored_values = full_array(arr.shape)
+    arr[:] = stored_values
+    index = (slice(None, None, 2),) * len(arr.shape)
+    arr[index] = 0
+    stored_values[index] = 0
+    assert np.array_equal(arr[:], stored_values)
+
+
+def test_partitioned_write(tmp_path: Path):
+    arr = gen_arr(fill_value_, tmp_path, 1, 3)
+    stats = arr._async_array.codec_pipeline.partition_stats
+    stored_values = full_array(arr.shape)
+    # the first chunk selection is contiguous, the second is not
+    index = np.array([0, 1, 2, 6, 8])
+    arr.oindex[index] = stored_values[index]
+    assert stats.rust_chunks == 1
+    assert stats.python_chunks == 1
+    assert stats.split_batches == 1
+    assert stats.fallback_reasons == {"discontiguous_array": 1}
+    assert len(stats.fallback_samples["discontiguous_array"]) == 1
+    expected = np.full(arr.shape, fill_value_)
+    expected[index] = stored_values[index]
+    assert np.array_equal(arr[:], expected)
+
+
+def test_strict(tmp_path: Path):
+    arr = gen_arr(fill_value_, tmp_path, 1, 3)
+    index = np.array([0, 1, 2, 6, 8])
+    with zarr.config.set({"codec_pipeline.strict": True}):
+        with pytest.raises(zarrs.PythonFallbackError, match="discontiguous_array"):
+            arr.oindex[index] = full_array(arr.shape)[index]
+        # supported selections are unaffected
+        arr[:] = full_array(arr.shape)
+        assert np.array_equal(arr.oindex[index], full_array(arr.shape)[index])
+
+
+def test_store_chunks_same_chunk(tmp_path: Path):
+    arr = gen_arr(fill_value_, tmp_path, 1, 3)
+    async_array = arr._async_array
+    chunk_spec = async_array.metadata.get_chunk_spec(
+        (0,), async_array._config, default_buffer_prototype()
+    )
+    # two overlapping updates of the same chunk in a single batch
+    chunks_desc = WithSubset.batch(
+        arr.store,
+        chunk_spec,
+        ["c/0", "c/0"],
+        [[slice(0, 3)], [slice(2, 5)]],
+        [[slice(0, 3)], [slice(3, 6)]],
+        (6,),
+    )
+    value = np.arange(6, dtype=arr.dtype)
+    async_array.codec_pipeline.impl.store_chunks_with_indices(chunks_desc, value)
+    assert np.array_equal(arr[:chunk_size_], [0, 1, 3, 4, 5])
+
+
+async def test_decode_encode(tmp_path: Path):
+    arr = gen_arr(fill_value_, tmp_path, 2, 3)._async_array
+    pipeline = arr.codec_pipeline
+    prototype = default_buffer_prototype()
+    chunk_spec = arr.metadata.get_chunk_spec((0, 0), arr._config, prototype)
+    chunk = full_array(chunk_spec.shape).astype(np.int16)
+    chunk_array = prototype.nd_buffer.from_numpy_array(chunk)
+    encoded = await pipeline.encode([(chunk_array, chunk_spec), (None, chunk_spec)])
+    assert encoded[1] is None
+    # the default codec pipeline decodes chunks encoded by zarrs and vice versa
+    (decoded,) = await pipeline.python_impl.decode([(encoded[0], chunk_spec)])
+    assert np.array_equal(decoded.as_numpy_array(), chunk)
+    (encoded,) = await pipeline.python_impl.encode([(chunk_array, chunk_spec)])
+    decoded = await pipeline.decode([(encoded, chunk_spec), (None, chunk_spec)])
+    assert np.array_equal(decoded[0].as_numpy_array(), chunk)
+    assert decoded[0].dtype == chunk_spec.dtype
+    assert decoded[1] is None
+    # the encoded size of compressed chunks is not fixed
+    with pytest.raises(NotImplementedError):
+        pipeline.compute_encoded_size(chunk.nbytes, chunk_spec)
+    pipeline = zarrs.ZarrsCodecPipeline.from_codecs([zarr.codecs.BytesCodec()])
+    assert pipeline.compute_encoded_size(chunk.nbytes, chunk_spec) == chunk.nbytes
+    with pytest.raises(ValueError, match="byte length"):
+        pipeline.compute_encoded_size(chunk.nbytes + 1, chunk_spec)
+
+
+def test_cancellation(tmp_path: Path):
+    arr = gen_arr(fill_value_, tmp_path, 1, 3)
+    arr[:] = full_array(arr.shape)
+    async_array = arr._async_array
+    chunk_spec = async_array.metadata.get_chunk_spec(
+        (0,), async_array._config, default_buffer_prototype()
+    )
+    chunks_desc = WithSubset.batch(
+        arr.store, chunk_spec, ["c/0"], [[slice(0, 5)]], [[slice(0, 5)]], (5,)
+    )
+    value = np.zeros(5, dtype=arr.dtype)
+    cancellation_token = CancellationToken()
+    cancellation_token.cancel()
+    assert cancellation_token.cancelled()
+    impl = async_array.codec_pipeline.impl
+    with pytest.raises(asyncio.CancelledError):
+        impl.retrieve_chunks_and_apply_index(
+            chunks_desc, value, cancellation_token=cancellation_token
+        )
+    with pytest.raises(asyncio.CancelledError):
+        impl.store_chunks_with_indices(
+            chunks_desc, value, cancellation_token=cancellation_token
+        )
+    assert np.array_equal(arr[:], full_array(arr.shape))
+    impl.retrieve_chunks_and_apply_index(chunks_desc, value, timeout=60)
+    assert np.array_equal(value, full_array(arr.shape)[:5])
+
+
+async def test_cancellation_waits_for_rust():
+    stopped = threading.Event()
+
+    def method(resolve, *, cancellation_token, timeout):
+        def run():
+            while not cancellation_token.cancelled():
+                time.sleep(0.01)
+            # the method keeps using its arguments for a while after the cancellation
+            time.sleep(0.1)
+            stopped.set()
+            resolve(asyncio.CancelledError("the call was cancelled"), None)
+
+        threading.Thread(target=run).start()
+
+    task = asyncio.create_task(run_in_thread_pool(method))
+    await asyncio.sleep(0.05)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert stopped.is_set()
+
+
+def test_timeout(tmp_path: Path):
+    arr = gen_arr(fill_value_, tmp_path, 1, 3)
+    arr[:] = full_array(arr.shape)
+    with zarr.config.set({"codec_pipeline.timeout": 0}):
+        with pytest.raises(TimeoutError):
+            arr[:]
+        with pytest.raises(TimeoutError):
+            arr[:] = 0
+    assert np.array_equal(arr[:], full_array(arr.shape))
+
+
 @contextmanager
 def use_zarr_default_codec_reader():
     zarr.config.set(
@@ -4,7 +4,7 @@ from typing import Any
 import numpy as np
 import numpy.typing as npt
 import pytest
-from zarr import Array, AsyncArray
+from zarr import Array, AsyncArray, config
 from zarr.abc.store import Store
 from zarr.codecs import (
     BloscCodec,
@@ -365,6 +365,68 @@ async def test_delete_empty_shards(store: Store) -> None:
     assert len(chunk_bytes) == 16 * 2 + 8 * 8 * 2 + 4
 
 
+def test_sharding_partial_decoder_cache(store: Store) -> None:
+    data = np.arange(0, 16 * 16, dtype="uint16").reshape((16, 16))
+    with config.set({"codec_pipeline.partial_decoder_cache_size": 4}):
+        a = Array.create(
+            StorePath(store),
+            shape=data.shape,
+            chunk_shape=(8, 8),
+            dtype=data.dtype,
+            codecs=[ShardingCodec(chunk_shape=(4, 4))],
+        )
+    impl = a._async_array.codec_pipeline.impl
+    a[:] = data
+    assert np.array_equal(a[1:3, 1:3], data[1:3, 1:3])
+    assert np.array_equal(a[5:7, 1:3], data[5:7, 1:3])
+    info = impl.partial_decoder_cache_info()
+    assert info["misses"] == 1
+    assert info["hits"] == 1
+
+    # rewriting a shard invalidates its partial decoder
+    a[:8, :8] = data[:8, :8] + 1
+    assert np.array_equal(a[1:3, 1:3], data[1:3, 1:3] + 1)
+    assert impl.partial_decoder_cache_info()["misses"] == 2
+
+
+@pytest.mark.parametrize("index_location", ["start", "end"])
+def test_sharding_partial_encoding(
+    store: Store, index_location: ShardingCodecIndexLocation
+) -> None:
+    data = np.arange(0, 16 * 16, dtype="uint16").reshape((16, 16))
+    with config.set({"codec_pipeline.partial_encoding": True}):
+        a = Array.create(
+            StorePath(store, f"partial_encoding_{index_location}"),
+            shape=data.shape,
+            chunk_shape=(8, 8),
+            dtype=data.dtype,
+            fill_value=0,
+            codecs=[
+                ShardingCodec(
+                    chunk_shape=(4, 4),
+                    codecs=[BytesCodec(), BloscCodec()],
+                    index_location=index_location,
+                )
+            ],
+        )
+    assert a._async_array.codec_pipeline.impl is not None
+    a[:] = data
+    # update a single inner chunk and parts of two others
+    a[4:8, 4:8] = 1
+    a[9:10, 2:6] = 2
+    expected = data.copy()
+    expected[4:8, 4:8] = 1
+    expected[9:10, 2:6] = 2
+    assert np.array_equal(a[:], expected)
+
+    # an empty shard is partially encoded from scratch
+    a[:8, 8:] = 0
+    a[1:3, 9:11] = 3
+    expected[:8, 8:] = 0
+    expected[1:3, 9:11] = 3
+    assert np.array_equal(a[:], expected)
+
+
 def test_pickle() -> None:
     codec = ShardingCodec(chunk_shape=(8, 8))
     assert pickle.loads(pickle.dumps(codec)) == codec
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+import socket
+
+import numpy as np
+import pytest
+import zarr
+from zarr.storage import FsspecStore
+
+s3fs = pytest.importorskip("s3fs")
+moto_server = pytest.importorskip("moto.server")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+PORT = _free_port()
+ENDPOINT_URL = f"http://127.0.0.1:{PORT}/"
+BUCKET = "zarrs-test"
+STORAGE_OPTIONS = {"endpoint_url": ENDPOINT_URL, "key": "foo", "secret": "bar"}
+
+
+@pytest.fixture(scope="module")
+def s3_bucket():
+    server = moto_server.ThreadedMotoServer(ip_address="127.0.0.1", port=PORT)
+    server.start()
+    s3fs.S3FileSystem.clear_instance_cache()
+    s3fs.S3FileSystem(**STORAGE_OPTIONS).mkdir(BUCKET)
+    yield BUCKET
+    server.stop()
+
+
+def test_zarrs_s3(s3_bucket: str):
+    store = FsspecStore.from_url(
+        f"s3://{s3_bucket}/array", storage_options=STORAGE_OPTIONS
+    )
+    data = np.arange(64, dtype="float32").reshape(8, 8)
+    arr = zarr.create(data.shape, store=store, chunks=(4, 4), dtype=data.dtype)
+    arr[:] = data
+    arr = zarr.open_array(store)
+    assert np.array_equal(arr[:], data)
+    assert np.array_equal(arr[1:6, 2:3], data[1:6, 2:3])
+
+
+def test_zarrs_s3_unsupported_option(s3_bucket: str):
+    store = FsspecStore.from_url(
+        f"s3://{s3_bucket}/array-unsupported",
+        storage_options={**STORAGE_OPTIONS, "requester_pays": True},
+    )
+    arr = zarr.create((4,), store=store, chunks=(2,), dtype="uint8")
+    with pytest.raises(ValueError, match="requester_pays"):
+        arr[:] = 1
+
+
+def test_zarrs_s3_io_concurrency(s3_bucket: str):
+    store = FsspecStore.from_url(
+        f"s3://{s3_bucket}/array-io-concurrency", storage_options=STORAGE_OPTIONS
+    )
+    data = np.arange(64, dtype="float32").reshape(8, 8)
+    arr = zarr.create(data.shape, store=store, chunks=(2, 2), dtype=data.dtype)
+    arr[:] = data
+    with zarr.config.set(
+        {"codec_pipeline.io_concurrency": 4, "codec_pipeline.collect_stats": True}
+    ):
+        arr = zarr.open_array(store)
+    impl = arr._async_array.codec_pipeline.impl
+    assert np.array_equal(arr[:], data)
+    # whole chunks are retrieved concurrently before being decoded
+    assert impl.stats()["prefetched_chunks"] == 16
+
+    impl.reset_stats()
+    assert np.array_equal(arr[1:6, 2:3], data[1:6, 2:3])
+    # partially read chunks are retrieved by the threads decoding them
+    assert impl.stats()["prefetched_chunks"] == 0
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+import zipfile
+
+import numpy as np
+import pytest
+import zarr
+from zarr.codecs import BloscCodec, BytesCodec, ShardingCodec
+from zarr.storage import ZipStore
+
+
+@pytest.fixture(params=[zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+def compression(request: pytest.FixtureRequest) -> int:
+    return request.param
+
+
+@pytest.mark.parametrize(
+    "codecs",
+    [
+        pytest.param([BytesCodec(), BloscCodec()], id="blosc"),
+        pytest.param(
+            [ShardingCodec(chunk_shape=(4, 4), codecs=[BytesCodec(), BloscCodec()])],
+            id="sharding",
+        ),
+    ],
+)
+def test_zip_read(tmp_path, compression: int, codecs) -> None:
+    path = tmp_path / "data.zarr.zip"
+    data = np.arange(16 * 16, dtype="uint16").reshape(16, 16)
+    with zarr.config.set(
+        {"codec_pipeline.path": "zarr.core.codec_pipeline.BatchedCodecPipeline"}
+    ):
+        store = ZipStore(path, mode="w", compression=compression)
+        arr = zarr.create(
+            data.shape, store=store, chunks=(8, 8), dtype=data.dtype, codecs=codecs
+        )
+        arr[:] = data
+        store.close()
+
+    store = ZipStore(path, mode="r")
+    arr = zarr.open_array(store)
+    assert np.array_equal(arr[:], data)
+    assert np.array_equal(arr[3:11, 5:7], data[3:11, 5:7])
+
+
+def test_zip_write_unsupported(tmp_path) -> None:
+    store = ZipStore(tmp_path / "data.zarr.zip", mode="w")
+    arr = zarr.create((4,), store=store, chunks=(2,), dtype="uint8")
+    with pytest.raises(NotImplementedError, match="read mode"):
+        arr[:] = 1
+    store.close()